@@ -222,7 +222,10 @@ class Alarm(object):
                      old_accept_submissions, accept_submissions)
 
             # Must invalidate the cache here becuase accept_subs served in /public has changed
-            ApiCache.invalidate()
+            ApiCache.invalidate(tags=['node'])
+
+            State.publish({'type': 'accept_submissions', 'value': State.accept_submissions})
+            State.publish({'type': 'invalidate_cache', 'tid': None, 'tags': ['node']})
 
 
 @inlineCallbacks
@@ -9,16 +9,19 @@ import traceback
 from twisted.application import service
 from twisted.internet import reactor, defer
 from twisted.python.log import ILogObserver
-from twisted.web import server
 
 # this import seems unused but it is required in order to load the mocks
 import globaleaks.mocks.twisted_mocks # pylint: disable=W0611
 
 from globaleaks.db import create_db, init_db, update_db, \
     sync_refresh_memory_variables, sync_clean_untracked_files
+from globaleaks.handlers.staticfile import get_manifest
 from globaleaks.rest.api import APIResourceWrapper
+from globaleaks.rest.site import Site
+from globaleaks.sessions import Sessions, SQLiteSessionStore
 from globaleaks.settings import Settings
 from globaleaks.state import State
+from globaleaks.utils.crypto import GCE
 from globaleaks.utils.log import log, openLogFile, timedLogFormatter, LogObserver
 from globaleaks.utils.process import disable_swap
 from globaleaks.utils.sock import listen_tcp_on_sock, reserve_port_for_ip
@@ -34,18 +37,6 @@ def fail_startup(excep):
         reactor.stop()
 
 
-class Request(server.Request):
-    current_user = None
-    log_ip_and_ua = False
-
-
-class Site(server.Site):
-    requestFactory = Request
-
-    def _openLogFile(self, path):
-        return openLogFile(path, Settings.log_file_size, Settings.num_log_files)
-
-
 class Service(service.Service):
     _shutdown = False
 
@@ -74,6 +65,12 @@ class Service(service.Service):
             else:
                 self.state.http_socks += [http_sock]
 
+        # Allocate the local port shared by the API workers
+        if Settings.api_workers:
+            self.state.api_sock, fail = reserve_port_for_ip('127.0.0.1', Settings.api_workers_port)
+            if fail is not None:
+                log.err("Could not reserve socket for %s (error: %s)", fail[0], fail[1])
+
         # Allocate remote ports
         for port in Settings.bind_remote_ports:
             sock, fail = reserve_port_for_ip(Settings.bind_address, port+mask)
@@ -108,11 +105,17 @@ class Service(service.Service):
 
             self._shutdown = True
             self.state.orm_tp.stop()
+            self.state.orm_writer_tp.stop()
+            self.state.delivery_tp.stop()
+            self.state.export_tp.stop()
+            self.state.upload_tp.stop()
+            self.state.kdf_tp.stop()
             d.callback(None)
 
         reactor.callLater(30, _shutdown, None)
 
         self.state.process_supervisor.shutdown()
+        self.state.process_supervisor.shutdown_api_workers()
 
         self.stop_jobs().addBoth(_shutdown)
 
@@ -157,7 +160,28 @@ class Service(service.Service):
         sync_clean_untracked_files()
         sync_refresh_memory_variables()
 
+        get_manifest(Settings.client_path)
+
         self.state.orm_tp.start()
+        self.state.orm_writer_tp.start()
+        self.state.delivery_tp.start()
+        self.state.export_tp.start()
+        self.state.upload_tp.start()
+        self.state.kdf_tp.start()
+
+        # the API workers share the sessions with the main process
+        if self.state.api_sock is not None:
+            Settings.sessions_store = 'sqlite'
+
+        sessions_key = GCE.generate_key()
+
+        if Settings.sessions_store == 'sqlite':
+            store = SQLiteSessionStore(Settings.sessions_db_path, sessions_key)
+
+            # the sessions of a previous run are encrypted with another key
+            store.clear()
+
+            Sessions.set_store(store)
 
         reactor.addSystemEventTrigger('before', 'shutdown', self.shutdown)
 
@@ -168,6 +192,13 @@ class Service(service.Service):
                                                           '127.0.0.1',
                                                           8082)
 
+        if self.state.api_sock is not None:
+            self.state.process_supervisor.launch_api_workers(self.state.api_sock,
+                                                             Settings.api_workers_port,
+                                                             sessions_key)
+
+            self.state.bus = self.state.process_supervisor
+
         self.state.process_supervisor.maybe_launch_https_workers()
 
         self.start_jobs()
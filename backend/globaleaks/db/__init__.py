@@ -8,7 +8,7 @@ import warnings
 
 from sqlalchemy import exc as sa_exc
 
-from globaleaks import models, DATABASE_VERSION
+from globaleaks import models, orm, DATABASE_VERSION
 from globaleaks.db.appdata import db_load_default_questionnaires, db_load_default_fields
 from globaleaks.models import Config
 from globaleaks.models.config_desc import ConfigFilters
@@ -154,8 +154,47 @@ def db_refresh_tenant_cache(session, tid_list):
     for tid, lang in models.EnabledLanguage.tid_list(session, tid_list):
         State.tenant_cache[tid].setdefault('languages_enabled', []).append(lang)
 
+    # the hash algorithms of the receipts are kept updated by the submissions
+    # and by the whistleblower logins that rehash the legacy receipts
+    for tid in tid_list:
+        State.tenant_cache[tid].receipt_hash_algs = []
 
-def db_refresh_memory_variables(session, to_refresh=None):
+    for tid, hash_alg in session.query(models.WhistleblowerTip.tid, models.WhistleblowerTip.hash_alg) \
+                                .filter(models.WhistleblowerTip.tid.in_(tid_list)).distinct():
+        State.tenant_cache[tid].receipt_hash_algs.append(hash_alg)
+
+
+def cache_receipt_hash_algs(tid, added=None, removed=None):
+    """
+    Apply to the cache of the process a change of the hash algorithms of
+    the receipts of a tenant
+    """
+    if tid not in State.tenant_cache:
+        return
+
+    receipt_hash_algs = State.tenant_cache[tid].receipt_hash_algs
+
+    if added is not None and added not in receipt_hash_algs:
+        receipt_hash_algs.append(added)
+
+    if removed is not None and removed in receipt_hash_algs:
+        receipt_hash_algs.remove(removed)
+
+
+def update_receipt_hash_algs(tid, added=None, removed=None):
+    """
+    Update the hash algorithms of the receipts cached for a tenant
+
+    The transactions changing the algorithms in use schedule the update with
+    orm.after_commit so that the cache is left untouched if they fail; the
+    change is broadcast to the other processes serving the API.
+    """
+    cache_receipt_hash_algs(tid, added, removed)
+
+    State.publish({'type': 'receipt_hash_algs', 'tid': tid, 'added': added, 'removed': removed})
+
+
+def db_load_memory_variables(session, to_refresh=None):
     tenant_map = {tenant.id:tenant for tenant in session.query(models.Tenant).filter(models.Tenant.active == True)}
 
     existing_tids = set(tenant_map.keys())
@@ -229,6 +268,18 @@ def db_refresh_memory_variables(session, to_refresh=None):
         State.tenant_hostname_id_map.update({h:tid for h in hostnames + onionnames})
 
 
+def db_refresh_memory_variables(session, to_refresh=None):
+    db_load_memory_variables(session, to_refresh)
+
+    if State.bus is not None:
+        orm.after_commit(session, State.publish, {'type': 'refresh_memory_variables', 'tids': to_refresh})
+
+
+@transact
+def load_memory_variables(session, to_refresh=None):
+    return db_load_memory_variables(session, to_refresh)
+
+
 @transact
 def refresh_memory_variables(session, to_refresh=None):
     return db_refresh_memory_variables(session, to_refresh)
@@ -0,0 +1,20 @@
+# -*- coding: UTF-8
+from globaleaks.db.migrations.update import MigrationBase
+from globaleaks.models import Model
+from globaleaks.models.properties import *
+from globaleaks.utils.utility import datetime_now
+
+
+class Mail_v_46(Model):
+    __tablename__ = 'mail'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
+    tid = Column(Integer, default=1, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    address = Column(UnicodeText, nullable=False)
+    subject = Column(UnicodeText, nullable=False)
+    body = Column(UnicodeText, nullable=False)
+    processing_attempts = Column(Integer, default=0, nullable=False)
+
+
+class MigrationScript(MigrationBase):
+    pass
@@ -0,0 +1,83 @@
+# -*- coding: UTF-8
+from globaleaks.db.migrations.update import MigrationBase
+from globaleaks.models import Model
+from globaleaks.models.properties import *
+from globaleaks.utils.utility import datetime_now, datetime_null
+
+
+class Comment_v_47(Model):
+    __tablename__ = 'comment'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    internaltip_id = Column(UnicodeText(36), nullable=False)
+    author_id = Column(UnicodeText(36))
+    content = Column(UnicodeText, nullable=False)
+    type = Column(UnicodeText, nullable=False)
+    new = Column(Integer, default=True, nullable=False)
+
+
+class Message_v_47(Model):
+    __tablename__ = 'message'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    receivertip_id = Column(UnicodeText(36), nullable=False)
+    content = Column(UnicodeText, nullable=False)
+    type = Column(UnicodeText, nullable=False)
+    new = Column(Integer, default=True, nullable=False)
+
+
+class ReceiverFile_v_47(Model):
+    __tablename__ = 'receiverfile'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
+    internalfile_id = Column(UnicodeText(36), nullable=False)
+    receivertip_id = Column(UnicodeText(36), nullable=False)
+    filename = Column(UnicodeText(255), nullable=False)
+    downloads = Column(Integer, default=0, nullable=False)
+    last_access = Column(DateTime, default=datetime_null, nullable=False)
+    new = Column(Integer, default=True, nullable=True)
+    status = Column(UnicodeText, default=u'processing', nullable=False)
+
+
+class ReceiverTip_v_47(Model):
+    __tablename__ = 'receivertip'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
+    internaltip_id = Column(UnicodeText(36), nullable=False)
+    receiver_id = Column(UnicodeText(36), nullable=False)
+    last_access = Column(DateTime, default=datetime_null, nullable=False)
+    access_counter = Column(Integer, default=0, nullable=False)
+    label = Column(UnicodeText, default=u'', nullable=False)
+    can_access_whistleblower_identity = Column(Boolean, default=False, nullable=False)
+    new = Column(Integer, default=True, nullable=False)
+    enable_notifications = Column(Boolean, default=True, nullable=False)
+    crypto_tip_prv_key = Column(LargeBinary(72), default=b'', nullable=False)
+
+
+class MigrationScript(MigrationBase):
+    def epilogue(self):
+        """
+        Convert the pending notifications, tracked until now by the new flag
+        of the notified objects, into outbox events
+        """
+        m = self.model_from
+
+        pending = [
+            ('ReceiverTip', self.session_old.query(m['ReceiverTip'].id, m['InternalTip'].tid)
+                                            .filter(m['ReceiverTip'].new == True,
+                                                    m['InternalTip'].id == m['ReceiverTip'].internaltip_id)),
+            ('Comment', self.session_old.query(m['Comment'].id, m['InternalTip'].tid)
+                                        .filter(m['Comment'].new == True,
+                                                m['InternalTip'].id == m['Comment'].internaltip_id)),
+            ('Message', self.session_old.query(m['Message'].id, m['InternalTip'].tid)
+                                        .filter(m['Message'].new == True,
+                                                m['ReceiverTip'].id == m['Message'].receivertip_id,
+                                                m['InternalTip'].id == m['ReceiverTip'].internaltip_id)),
+            ('ReceiverFile', self.session_old.query(m['ReceiverFile'].id, m['InternalTip'].tid)
+                                             .filter(m['ReceiverFile'].new == True,
+                                                     m['ReceiverTip'].id == m['ReceiverFile'].receivertip_id,
+                                                     m['InternalTip'].id == m['ReceiverTip'].internaltip_id))
+        ]
+
+        for trigger, query in pending:
+            for object_id, tid in query:
+                self.session_new.add(self.model_to['Outbox']({'tid': tid, 'type': trigger, 'object_id': object_id}))
+                self.entries_count['Outbox'] += 1
@@ -0,0 +1,38 @@
+# -*- coding: UTF-8
+import base64
+
+from globaleaks.db.migrations.update import MigrationBase
+from globaleaks.models import Model
+from globaleaks.models.properties import *
+from globaleaks.utils.security import sha256
+
+
+class ContextImg_v_48(Model):
+    __tablename__ = 'contextimg'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
+    data = Column(UnicodeText, nullable=False)
+
+
+class UserImg_v_48(Model):
+    __tablename__ = 'userimg'
+    id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
+    data = Column(UnicodeText, nullable=False)
+
+
+class MigrationScript(MigrationBase):
+    def migrate_model_img(self, model_name):
+        """
+        Store the pictures decoded together with the hash addressing them
+        """
+        for old_obj in self.session_old.query(self.model_from[model_name]):
+            new_obj = self.model_to[model_name]()
+            new_obj.id = old_obj.id
+            new_obj.data = base64.b64decode(old_obj.data)
+            new_obj.hash = sha256(new_obj.data).decode()
+            self.session_new.add(new_obj)
+
+    def migrate_ContextImg(self):
+        self.migrate_model_img('ContextImg')
+
+    def migrate_UserImg(self):
+        self.migrate_model_img('UserImg')
@@ -11,7 +11,7 @@ from globaleaks import models
 from globaleaks.handlers.admin.modelimgs import db_get_model_img
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.operation import OperationHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests, errors
 from globaleaks.models import fill_localized_keys, get_localized_values
 
@@ -55,7 +55,7 @@ def admin_serialize_context(session, context, language):
     return get_localized_values(ret_dict, context, context.localized_keys, language)
 
 
-@transact
+@transact_ro
 def get_context_list(session, tid, language):
     """
     Returns the context list.
@@ -88,7 +88,7 @@ def db_associate_context_receivers(session, tid, context, receiver_ids):
     session.flush()
 
 
-@transact
+@transact_ro
 def get_context(session, tid, context_id, language):
     """
     Returns:
@@ -200,6 +200,7 @@ class ContextsCollection(OperationHandler):
     check_roles = 'admin'
     cache_resource = True
     invalidate_cache = True
+    cache_tags = ['contexts', 'receivers']
 
     def get(self):
         """
@@ -225,6 +226,7 @@ class ContextsCollection(OperationHandler):
 class ContextInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['contexts', 'receivers']
 
     def put(self, context_id):
         """
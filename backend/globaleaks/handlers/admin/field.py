@@ -9,7 +9,7 @@ from sqlalchemy.sql.expression import not_
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.public import serialize_field
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors, requests
 from globaleaks.settings import Settings
 from globaleaks.models import fill_localized_keys
@@ -275,7 +275,7 @@ def fieldtree_ancestors(session, id):
         yield fieldtree_ancestors(session, field.fieldgroup_id)
 
 
-@transact
+@transact_ro
 def get_fieldtemplate_list(session, tid, language):
     """
     Serialize all the field templates localizing their content depending on the language.
@@ -296,6 +296,7 @@ class FieldTemplatesCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
     invalidate_cache = True
+    cache_tags = ['questionnaires']
 
     def get(self):
         """
@@ -320,6 +321,7 @@ class FieldTemplatesCollection(BaseHandler):
 class FieldTemplateInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['questionnaires']
 
     def put(self, field_id):
         """
@@ -355,6 +357,7 @@ class FieldsCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
     invalidate_cache = True
+    cache_tags = ['questionnaires']
 
     def post(self):
         """
@@ -380,6 +383,7 @@ class FieldInstance(BaseHandler):
     """
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['questionnaires']
 
     def put(self, field_id):
         """
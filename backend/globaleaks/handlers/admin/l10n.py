@@ -16,9 +16,9 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.user import can_edit_general_settings_or_raise
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 
-@transact
+@transact_ro
 def get(session, tid, lang):
     texts = session.query(models.CustomTexts).filter(models.CustomTexts.tid == tid, models.CustomTexts.lang == lang).one_or_none()
     if texts is None:
@@ -39,6 +39,7 @@ def update(session, tid, lang, request):
 class AdminL10NHandler(BaseHandler):
     check_roles =  {'admin', 'receiver', 'custodian'}
     invalidate_cache = True
+    cache_tags = ['l10n']
 
     @inlineCallbacks
     def get(self, lang):
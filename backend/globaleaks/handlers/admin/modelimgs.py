@@ -1,10 +1,9 @@
 # -*- coding: utf-8 -*-
 # API handling upload/delete of users/contexts picture
-import base64
-
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.orm import transact
+from globaleaks.utils.security import sha256
 
 model_map = {
   'users': models.UserImg,
@@ -12,13 +11,20 @@ model_map = {
 }
 
 
+def get_model_img_url(obj_key, obj_id, img_hash):
+    """
+    Return the URL of the picture, addressed by the hash of its content
+    """
+    return u'%s/%s/img/%s' % (obj_key, obj_id, img_hash)
+
+
 def db_get_model_img(session, obj_key, obj_id):
     model = model_map[obj_key]
-    img =  session.query(model).filter(model.id == obj_id).one_or_none()
-    if img is None:
+    img_hash = session.query(model.hash).filter(model.id == obj_id).one_or_none()
+    if img_hash is None:
         return ''
     else:
-        return img.data
+        return get_model_img_url(obj_key, obj_id, img_hash[0])
 
 
 @transact
@@ -29,12 +35,15 @@ def get_model_img(session, obj_key, obj_id):
 @transact
 def add_model_img(session, tid, obj_key, obj_id, data):
     model = model_map[obj_key]
-    data = base64.b64encode(data).decode()
+    img_hash = sha256(data).decode()
     img = session.query(model).filter(model.id == obj_id).one_or_none()
     if img is None:
-        session.add(model({'id': obj_id, 'data': data}))
+        img = model({'id': obj_id, 'hash': img_hash})
+        img.data = data
+        session.add(img)
     else:
         img.data = data
+        img.hash = img_hash
 
 
 @transact
@@ -46,6 +55,8 @@ def del_model_img(session, tid, obj_key, obj_id):
 class ModelImgInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['contexts', 'receivers', 'users']
+    cache_tags_all_tenants = True
     upload_handler = True
 
     def post(self, obj_key, obj_id):
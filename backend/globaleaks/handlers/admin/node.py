@@ -13,7 +13,7 @@ from globaleaks.db.appdata import load_appdata
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.user import can_edit_general_settings_or_raise
 from globaleaks.models.config import ConfigFactory, NodeL10NFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors, requests
 from globaleaks.state import State
 from globaleaks.utils.crypto import GCE
@@ -48,7 +48,7 @@ def db_admin_serialize_node(session, tid, language, config_node='admin_node'):
     return utils.sets.merge_dicts(config, misc_dict, l10n_dict)
 
 
-@transact
+@transact_ro
 def admin_serialize_node(session, tid, language, config_node='admin_node'):
     return db_admin_serialize_node(session, tid, language, config_node)
 
@@ -135,6 +135,7 @@ class NodeInstance(BaseHandler):
     check_roles =  {'admin', 'receiver', 'custodian'}
     cache_resource = True
     invalidate_cache = True
+    cache_tags = ['node']
 
     @inlineCallbacks
     def determine_allow_config_filter(self):
@@ -7,7 +7,7 @@ from globaleaks.handlers.admin.node import admin_serialize_node
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.user import get_user
 from globaleaks.models.config import ConfigFactory, NotificationL10NFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests
 from globaleaks.state import State
 from globaleaks.utils.sets import merge_dicts
@@ -32,7 +32,7 @@ def db_get_notification(session, tid, language):
     return admin_serialize_notification(session, tid, language)
 
 
-@transact
+@transact_ro
 def get_notification(session, tid, language):
     return db_get_notification(session, tid, language)
 
@@ -3,11 +3,11 @@
 # API implementing an abstract admin overview of the submissions
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
 from globaleaks.utils.utility import datetime_to_ISO8601
 
 
-@transact
+@transact_ro
 def collect_tip_overview(session, tid):
     tip_description_list = []
 
@@ -22,7 +22,7 @@ def collect_tip_overview(session, tid):
     return tip_description_list
 
 
-@transact
+@transact_ro
 def collect_files_overview(session, tid):
     file_description_list = []
 
@@ -15,7 +15,7 @@ from globaleaks import models, QUESTIONNAIRE_EXPORT_VERSION
 from globaleaks.handlers.admin.step import db_create_step
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.public import serialize_questionnaire
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests
 from globaleaks.models import fill_localized_keys
 from globaleaks.utils.utility import datetime_to_ISO8601, datetime_now
@@ -27,7 +27,7 @@ def db_get_questionnaire_list(session, tid, language):
     return [serialize_questionnaire(session, tid, questionnaire, language) for questionnaire in questionnaires]
 
 
-@transact
+@transact_ro
 def get_questionnaire_list(session, tid, language):
     """
     Returns the questionnaire list.
@@ -49,7 +49,7 @@ def db_get_questionnaire(session, tid, questionnaire_id, language, serialize_tem
     return serialize_questionnaire(session, tid, questionnaire, language, serialize_templates=serialize_templates)
 
 
-@transact
+@transact_ro
 def get_questionnaire(session, tid, questionnaire_id, language,serialize_templates=True):
     return db_get_questionnaire(session, tid, questionnaire_id, language, serialize_templates=serialize_templates)
 
@@ -182,6 +182,7 @@ class QuestionnairesCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
     invalidate_cache = True
+    cache_tags = ['questionnaires']
 
     def get(self):
         """
@@ -205,6 +206,7 @@ class QuestionnairesCollection(BaseHandler):
 class QuestionnaireInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['questionnaires']
 
     def put(self, questionnaire_id):
         """
@@ -235,6 +237,7 @@ class QuestionnaireInstance(BaseHandler):
 class QuestionnareDuplication(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['questionnaires']
 
     def post(self):
         """
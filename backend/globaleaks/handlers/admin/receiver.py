@@ -7,12 +7,12 @@
 from globaleaks import models
 from globaleaks.handlers.admin.user import admin_serialize_receiver
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests
 from globaleaks.models import fill_localized_keys
 
 
-@transact
+@transact_ro
 def get_receiver_list(session, tid, language):
     return [admin_serialize_receiver(session, receiver, user, language)
         for receiver, user in session.query(models.Receiver, models.User) \
@@ -30,7 +30,7 @@ def db_get_receiver(session, tid, receiver_id):
                           models.UserTenant.tenant_id == tid).one_or_none()
 
 
-@transact
+@transact_ro
 def get_receiver(session, tid, receiver_id, language):
     receiver, user = db_get_receiver(session, tid, receiver_id)
     return admin_serialize_receiver(session, receiver, user, language)
@@ -53,6 +53,7 @@ def update_receiver(session, tid, receiver_id, request, language):
 class ReceiversCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['receivers', 'contexts']
 
     def get(self):
         """
@@ -64,6 +65,7 @@ class ReceiversCollection(BaseHandler):
 class ReceiverInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['receivers', 'contexts']
 
     def put(self, receiver_id):
         """
@@ -6,7 +6,7 @@
 #
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests
 
 
@@ -18,7 +18,7 @@ def serialize_shorturl(shorturl):
     }
 
 
-@transact
+@transact_ro
 def get_shorturl_list(session, tid):
     return [serialize_shorturl(shorturl) for shorturl in session.query(models.ShortURL).filter(models.ShortURL.tid == tid)]
 
@@ -35,6 +35,7 @@ class ShortURLCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
     invalidate_cache = True
+    cache_tags = ['shorturls']
 
     def get(self):
         """
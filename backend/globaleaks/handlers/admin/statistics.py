@@ -6,8 +6,10 @@ from datetime import timedelta
 from globaleaks.event import events_monitored
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.models import Stats, Anomalies
-from globaleaks.orm import transact
+from globaleaks.orm import get_lock_stats, get_pool_stats, get_transaction_stats, transact, transact_ro
+from globaleaks.rest.apicache import ApiCache
 from globaleaks.state import State
+from globaleaks.utils import kdf
 from globaleaks.utils.utility import datetime_to_ISO8601, datetime_now, \
     iso_to_gregorian
 
@@ -24,7 +26,7 @@ def weekmap_to_heatmap(week_map):
     return retlist
 
 
-@transact
+@transact_ro
 def get_stats(session, tid, week_delta):
     """
     :param week_delta: commonly is 0, mean that you're taking this
@@ -62,10 +64,18 @@ def get_stats(session, tid, week_delta):
         stats_day = int(hourdata.start.weekday())
         stats_hour = int(hourdata.start.isoformat()[11:13])
 
+        # every API process stores the statistics of its own events
+        if week_map[stats_day][stats_hour]:
+            summary = week_map[stats_day][stats_hour]['summary']
+            for event_type, count in hourdata.summary.items():
+                summary[event_type] = summary.get(event_type, 0) + count
+
+            continue
+
         week_map[stats_day][stats_hour] = {
             'hour': stats_hour,
             'day': stats_day,
-            'summary': hourdata.summary,
+            'summary': dict(hourdata.summary),
             'valid': 0  # 0 means valid data
         }
 
@@ -108,7 +118,7 @@ def get_stats(session, tid, week_delta):
     }
 
 
-@transact
+@transact_ro
 def get_anomaly_history(session, tid, limit):
     anomalies = session.query(Anomalies).filter(Anomalies.tid == tid).order_by(Anomalies.date.desc())[:limit]
 
@@ -186,7 +196,27 @@ class JobsTiming(BaseHandler):
         for job in State.jobs:
             response.append({
               'name': job.name,
-              'timings': job.last_executions
+              'timings': job.last_executions,
+              'queue_depth': job.queue_depth,
+              'backlog': job.backlog
             })
 
         return response
+
+
+class MetricsCollection(BaseHandler):
+    """
+    This handler returns the internal metrics useful to size the node resources
+    """
+    check_roles = 'admin'
+    root_tenant_only = True
+
+    def get(self):
+        return {
+            'orm_pool': get_pool_stats(),
+            'orm_lock': get_lock_stats(),
+            'orm_transactions': get_transaction_stats(),
+            'api_cache': ApiCache.get_stats(),
+            'kdf': kdf.get_stats(),
+            'jobs': State.jobs_monitor.get_metrics() if State.jobs_monitor is not None else {}
+        }
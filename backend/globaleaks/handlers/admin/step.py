@@ -106,6 +106,7 @@ class StepCollection(OperationHandler):
     check_roles = 'admin'
     cache_resource = True
     invalidate_cache = True
+    cache_tags = ['questionnaires']
 
     def post(self):
         """
@@ -140,6 +141,7 @@ class StepInstance(BaseHandler):
     """
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['questionnaires']
 
     def put(self, step_id):
         """
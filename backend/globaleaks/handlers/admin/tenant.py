@@ -12,7 +12,7 @@ from globaleaks.db import db_refresh_memory_variables
 from globaleaks.db.appdata import load_appdata
 from globaleaks.handlers.admin import file
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests
 from globaleaks.utils.log import log
 from globaleaks.settings import Settings
@@ -107,12 +107,12 @@ def db_get_tenant_list(session):
                                                                   .outerjoin(models.Signup, models.Tenant.id == models.Signup.tid)]
 
 
-@transact
+@transact_ro
 def get_tenant_list(session):
     return db_get_tenant_list(session)
 
 
-@transact
+@transact_ro
 def get(session, id):
     return serialize_tenant(session, models.db_get(session, models.Tenant, models.Tenant.id == id))
 
@@ -5,16 +5,18 @@
 # Implementation of the User model functionalities
 #
 from six import text_type
+from twisted.internet.defer import inlineCallbacks, returnValue
 
 from globaleaks import models
 from globaleaks.db import db_refresh_memory_variables
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.user import db_get_user, \
+                                     hash_new_password, \
                                      parse_pgp_options, \
                                      user_serialize_user, \
                                      serialize_usertenant_association
 
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests, errors
 from globaleaks.state import State
 from globaleaks.utils.crypto import GCE
@@ -142,9 +144,11 @@ def db_create_user(session, state, tid, request, language):
     return user
 
 
-def db_admin_update_user(session, state, tid, user_id, request, language):
+def db_admin_update_user(session, state, tid, user_id, request, language, password_change=None):
     """
     Updates the specified user.
+
+    The new password, if any, has to be hashed with hash_new_password.
     """
     fill_localized_keys(request, models.User.localized_keys, language)
 
@@ -159,11 +163,10 @@ def db_admin_update_user(session, state, tid, user_id, request, language):
 
     user.update(request)
 
-    password = request['password']
-    if password:
-        user.hash_alg = GCE.HASH
-        user.salt = GCE.generate_salt()
-        user.password = GCE.hash_password(password, user.salt)
+    if password_change is not None:
+        user.hash_alg = password_change['hash_alg']
+        user.salt = password_change['salt']
+        user.password = password_change['password']
         user.password_change_date = datetime_now()
         user.crypto_prv_key = b''
         user.crypto_pub_key = b''
@@ -178,8 +181,8 @@ def db_admin_update_user(session, state, tid, user_id, request, language):
 
 
 @transact
-def admin_update_user(session, state, tid, user_id, request, language):
-    return user_serialize_user(session, db_admin_update_user(session, state, tid, user_id, request, language), language)
+def admin_update_user(session, state, tid, user_id, request, language, password_change=None):
+    return user_serialize_user(session, db_admin_update_user(session, state, tid, user_id, request, language, password_change), language)
 
 
 
@@ -198,7 +201,7 @@ def db_get_admin_users(session, tid):
                                                           models.UserTenant.tenant_id == tid)]
 
 
-@transact
+@transact_ro
 def get_user_list(session, tid, language):
     """
     Returns:
@@ -213,6 +216,7 @@ class UsersCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
     invalidate_cache = True
+    cache_tags = ['users', 'receivers']
 
     def get(self):
         """
@@ -233,14 +237,23 @@ class UsersCollection(BaseHandler):
 class UserInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['users', 'receivers']
+    cache_tags_all_tenants = True
 
+    @inlineCallbacks
     def put(self, user_id):
         """
         Update the specified user.
         """
         request = self.validate_message(self.request.content.read(), requests.AdminUserDesc)
 
-        return admin_update_user(self.state, self.request.tid, user_id, request, self.request.language)
+        password_change = None
+        if request['password']:
+            password_change = yield hash_new_password(request['password'])
+
+        user = yield admin_update_user(self.state, self.request.tid, user_id, request, self.request.language, password_change)
+
+        returnValue(user)
 
     def delete(self, user_id):
         """
@@ -252,6 +265,8 @@ class UserInstance(BaseHandler):
 class UserTenantCollection(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    cache_tags = ['users', 'receivers']
+    cache_tags_all_tenants = True
     root_tenant_only = True
 
     def post(self, user_id):
@@ -263,6 +278,8 @@ class UserTenantCollection(BaseHandler):
 class UserTenantInstance(BaseHandler):
     check_role = 'admin'
     invalidate_cache = True
+    cache_tags = ['users', 'receivers']
+    cache_tags_all_tenants = True
     root_tenant_only = True
 
     def delete(self, user_id, tenant_id):
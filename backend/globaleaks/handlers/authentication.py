@@ -8,13 +8,15 @@ from six import text_type, binary_type
 from sqlalchemy import or_
 from twisted.internet.defer import inlineCallbacks, returnValue
 
+from globaleaks.db import update_receipt_hash_algs
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.models import InternalTip, User, UserTenant, WhistleblowerTip
-from globaleaks.orm import transact
+from globaleaks.orm import after_commit, transact, transact_ro
 from globaleaks.rest import errors, requests
 from globaleaks.sessions import Sessions
 from globaleaks.settings import Settings
 from globaleaks.state import State
+from globaleaks.utils import kdf
 from globaleaks.utils.crypto import GCE
 from globaleaks.utils.log import log
 from globaleaks.utils.utility import datetime_now, deferred_sleep, parse_csv_ip_ranges_to_ip_networks
@@ -50,18 +52,10 @@ def random_login_delay():
 
 
 @transact
-def login_whistleblower(session, tid, receipt, client_using_tor):
-    """
-    login_whistleblower returns a session
-    """
+def authenticate_whistleblower(session, tid, hashes, client_using_tor):
     x = None
 
-    algorithms = [x[0] for x in session.query(WhistleblowerTip.hash_alg).filter(WhistleblowerTip.tid == tid).distinct()]
-    if algorithms:
-        hashes = []
-        for alg in algorithms:
-            hashes.append(GCE.hash_password(receipt, State.tenant_cache[tid].receipt_salt, alg))
-
+    if hashes:
         x  = session.query(WhistleblowerTip, InternalTip) \
                     .filter(WhistleblowerTip.receipt_hash.in_(hashes),
                             WhistleblowerTip.tid == tid,
@@ -82,30 +76,86 @@ def login_whistleblower(session, tid, receipt, client_using_tor):
 
     itip.wb_last_access = datetime_now()
 
-    crypto_prv_key = ''
-    if State.tenant_cache[1].encryption and wbtip.crypto_prv_key:
-        user_key = GCE.derive_key(receipt.encode('utf-8'), State.tenant_cache[tid].receipt_salt)
-        crypto_prv_key = GCE.symmetric_decrypt(user_key, wbtip.crypto_prv_key)
-
-    return Sessions.new(tid, wbtip.id, 'whistleblower', False, crypto_prv_key)
+    return wbtip.id, wbtip.hash_alg, wbtip.receipt_hash, wbtip.crypto_prv_key
 
 
 @transact
-def login(session, tid, username, password, client_using_tor, client_ip):
+def rehash_receipt(session, tid, wbtip_id, receipt_hash, new_receipt_hash):
     """
-    login returns a session
+    Replace a receipt hash computed with a legacy algorithm with the one
+    computed with the current algorithm, keeping the receipt_hash_algs of
+    the tenant cache up to date.
     """
-    user = None
+    wbtip = session.query(WhistleblowerTip).filter(WhistleblowerTip.id == wbtip_id,
+                                                   WhistleblowerTip.receipt_hash == receipt_hash).one_or_none()
+    if wbtip is None:
+        return
+
+    hash_alg = wbtip.hash_alg
+
+    wbtip.hash_alg = GCE.HASH
+    wbtip.receipt_hash = new_receipt_hash
+
+    session.flush()
+
+    removed = None
+    if session.query(WhistleblowerTip.id).filter(WhistleblowerTip.tid == tid,
+                                                 WhistleblowerTip.hash_alg == hash_alg).first() is None:
+        removed = hash_alg
+
+    after_commit(session, update_receipt_hash_algs, tid, GCE.HASH, removed)
+
+
+@inlineCallbacks
+def login_whistleblower(tid, receipt, client_using_tor):
+    """
+    login_whistleblower returns a session
+
+    The receipt hashes and the key derivation are computed on the KDF pool
+    and never inside the database transaction; a receipt hashed with a
+    legacy algorithm is rehashed with the current one.
+    """
+    receipt_salt = State.tenant_cache[tid].receipt_salt
+
+    # the receipts are always checked with the current algorithm while the
+    # legacy algorithms in use are cached by tenant; the cache is kept by each
+    # process and could miss an algorithm added by another one, so that once
+    # all the legacy receipts are rehashed a login costs a single KDF
+    hashes = {GCE.HASH: (yield kdf.hash_password(receipt, receipt_salt))}
+    for alg in list(State.tenant_cache[tid].receipt_hash_algs):
+        if alg not in hashes:
+            hashes[alg] = yield kdf.hash_password(receipt, receipt_salt, alg)
+
+    wbtip_id, hash_alg, receipt_hash, wbtip_crypto_prv_key = yield authenticate_whistleblower(tid, list(hashes.values()), client_using_tor)
+
+    if hash_alg != GCE.HASH:
+        yield rehash_receipt(tid, wbtip_id, receipt_hash, hashes[GCE.HASH])
+
+    crypto_prv_key = ''
+    if State.tenant_cache[1].encryption and wbtip_crypto_prv_key:
+        user_key = yield kdf.derive_key(receipt.encode('utf-8'), State.tenant_cache[tid].receipt_salt)
+        crypto_prv_key = GCE.symmetric_decrypt(user_key, wbtip_crypto_prv_key)
+
+    returnValue(Sessions.new(tid, wbtip_id, 'whistleblower', False, crypto_prv_key))
 
+
+@transact_ro
+def get_login_candidates(session, tid, username):
     users = session.query(User).filter(User.username == username,
                                        User.state != u'disabled',
                                        UserTenant.user_id == User.id,
                                        UserTenant.tenant_id == tid).distinct()
-    for u in users:
-        if GCE.check_password(u.hash_alg, password, u.salt, u.password):
-            user = u
-            break
 
+    return [(u.id, u.hash_alg, u.salt, u.password) for u in users]
+
+
+@transact
+def authenticate_user(session, tid, user_id, password_hash, client_using_tor, client_ip):
+    user = session.query(User).filter(User.id == user_id,
+                                      User.password == password_hash,
+                                      User.state != u'disabled').one_or_none()
+
+    # the password could have been changed while it was being checked
     if user is None:
         log.debug("Login: Invalid credentials")
         Settings.failed_login_attempts += 1
@@ -140,12 +190,39 @@ def login(session, tid, username, password, client_using_tor, client_ip):
 
     user.last_login = datetime_now()
 
+    return user.role, user.password_change_needed, user.crypto_prv_key
+
+
+@inlineCallbacks
+def login(tid, username, password, client_using_tor, client_ip):
+    """
+    login returns a session
+
+    The password checks and the key derivation are computed on the KDF pool
+    and never inside the database transaction.
+    """
+    user = None
+
+    for u in (yield get_login_candidates(tid, username)):
+        if (yield kdf.check_password(u[1], password, u[2], u[3])):
+            user = u
+            break
+
+    if user is None:
+        log.debug("Login: Invalid credentials")
+        Settings.failed_login_attempts += 1
+        raise errors.InvalidAuthentication
+
+    user_id, salt, password_hash = user[0], user[2], user[3]
+
+    role, password_change_needed, user_crypto_prv_key = yield authenticate_user(tid, user_id, password_hash, client_using_tor, client_ip)
+
     crypto_prv_key = ''
-    if State.tenant_cache[1].encryption and user.crypto_prv_key:
-        user_key = GCE.derive_key(password.encode('utf-8'), user.salt)
-        crypto_prv_key = GCE.symmetric_decrypt(user_key, user.crypto_prv_key)
+    if State.tenant_cache[1].encryption and user_crypto_prv_key:
+        user_key = yield kdf.derive_key(password.encode('utf-8'), salt)
+        crypto_prv_key = GCE.symmetric_decrypt(user_key, user_crypto_prv_key)
 
-    return Sessions.new(tid, user.id, user.role, user.password_change_needed, crypto_prv_key)
+    returnValue(Sessions.new(tid, user_id, role, password_change_needed, crypto_prv_key))
 
 
 @transact
@@ -268,7 +345,7 @@ class SessionHandler(BaseHandler):
         """
         Logout
         """
-        del Sessions[self.current_user.id]
+        Sessions.delete(self.current_user.id)
 
 
 class TenantAuthSwitchHandler(BaseHandler):
@@ -3,15 +3,20 @@
 # Base class for all the handlers
 import base64
 import collections
+import io
 import json
 import mimetypes
+import mmap
 import os
 import re
+import weakref
 
 from datetime import datetime
 from cryptography.hazmat.primitives import constant_time
-from six import text_type, binary_type
-from twisted.internet import abstract, defer
+from six import PY3, text_type, binary_type
+from six.moves import builtins
+from twisted.internet import abstract, defer, reactor
+from twisted.internet.threads import deferToThreadPool
 
 from globaleaks.event import track_handler
 from globaleaks.rest import errors, requests
@@ -20,6 +25,7 @@ from globaleaks.utils.securetempfile import SecureTemporaryFile
 from globaleaks.sessions import Sessions
 from globaleaks.settings import Settings
 from globaleaks.utils.log import log
+from globaleaks.utils.multipart import MultipartUpload
 from globaleaks.utils.utility import datetime_now, deferred_sleep
 
 # https://github.com/globaleaks/GlobaLeaks/issues/1601
@@ -36,11 +42,13 @@ class FileProducer(object):
 
     @ivar request: The L{IRequest} to write the contents of the file to.
     @ivar fd: The file descriptor from which reading the content to be delivered
+    @ivar length: The number of bytes to be delivered or None for the whole file
     """
-    def __init__(self, request, fo):
+    def __init__(self, request, fo, length=None):
         self.finish = defer.Deferred()
         self.request = request
         self.fo = fo
+        self.length = length
 
     def start(self):
         self.request.registerProducer(self, False)
@@ -51,6 +59,10 @@ class FileProducer(object):
             return
 
         data = self.fo.read(abstract.FileDescriptor.bufferSize)
+        if data and self.length is not None:
+            data = data[:self.length]
+            self.length -= len(data)
+
         if data:
             self.request.write(data)
         else:
@@ -64,6 +76,297 @@ class FileProducer(object):
         self.finish.callback(None)
 
 
+class MmapProducer(object):
+    """
+    Streaming producer for the plain files on disk
+
+    The file is mapped in memory and its pages are handed to the transport
+    as they are instead of being read into Python buffers; the writes are
+    paused while the send buffer of the transport is full.
+
+    @ivar request: The L{IRequest} to write the contents of the file to.
+    @ivar fo: The file from the current position of which the content is delivered
+    @ivar length: The number of bytes to be delivered
+    """
+    chunk_size = 256 * 1024
+
+    def __init__(self, request, fo, length):
+        self.finish = defer.Deferred()
+        self.request = request
+        self.fo = fo
+        self.offset = fo.tell()
+        self.length = length
+        self.paused = False
+        self.data = None
+
+    def start(self):
+        data = mmap.mmap(self.fo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # the slices of a memoryview are not copied; python2 transports
+        # accept only strings and are given the slices of the map
+        self.data = memoryview(data) if PY3 else data
+
+        self.request.registerProducer(self, True)
+        self.resumeProducing()
+
+        return self.finish
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+
+        while self.request is not None and not self.paused:
+            if not self.length:
+                self.request.unregisterProducer()
+                self.request.finish()
+                self.stopProducing()
+                return
+
+            size = min(self.length, self.chunk_size)
+            data = self.data[self.offset:self.offset + size]
+            self.offset += size
+            self.length -= size
+            self.request.write(data)
+
+    def stopProducing(self):
+        if self.request is None:
+            return
+
+        # the map is released together with the last slice held by the transport
+        self.request = None
+        self.data = None
+        self.fo.close()
+        self.finish.callback(None)
+
+
+# locks serializing the appends of the chunks to the files of the flows
+upload_locks = weakref.WeakKeyDictionary()
+
+# the files opened on the local disk, whose content is not transformed
+plain_file_types = (io.BufferedReader, getattr(builtins, 'file', io.BufferedReader))
+
+
+def get_file_producer(request, fo, length):
+    """
+    Return the producer to be used to deliver the content of a file
+
+    The plain files on disk are delivered from their memory map while
+    the transformed streams, like the decrypted files, are copied.
+    """
+    if length and isinstance(fo, plain_file_types):
+        return MmapProducer(request, fo, length)
+
+    return FileProducer(request, fo, length)
+
+
+def parse_range(header, size):
+    """
+    Parse a Range header requesting a single byte range of an entity of
+    the given size and return the (start, end) of the range, None if the
+    header has to be ignored; the range is not satisfiable if start >= size
+    """
+    unit, _, byte_range = header.partition(b'=')
+    if unit.strip().lower() != b'bytes' or b',' in byte_range:
+        return None
+
+    first, sep, last = byte_range.strip().partition(b'-')
+    if not sep:
+        return None
+
+    try:
+        if not first:
+            return max(size - int(last), 0), size - 1
+
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if last and end < start:
+        return None
+
+    return start, min(end, size - 1)
+
+
+# (compiler, id(template)) -> (template, validator); the template is
+# referenced by the entry so that its id could not be reused while cached
+validators = {}
+validators_limit = 1024
+
+
+def get_validator(compiler, template):
+    """
+    Return the validator compiled for the template of a request
+    """
+    key = (compiler, id(template))
+
+    entry = validators.get(key)
+    if entry is None:
+        # bound the cache as the templates of the operations are built per request
+        if len(validators) >= validators_limit:
+            validators.clear()
+
+        entry = validators[key] = (template, compiler(template))
+
+    return entry[1]
+
+
+def compile_type_validator(type):
+    """
+    Compile a type of a request template into a function returning
+    True if a value conforms to it
+    """
+    # if it's callable, than assumes is a primitive class
+    if callable(type):
+        error = "-- Invalid python_type, in [%s] expected %s"
+
+        if type == requests.SkipSpecificValidation:
+            check = lambda value: True
+
+        elif type == int:
+            def check(value):
+                try:
+                    int(value)
+                    return True
+                except:
+                    return False
+
+        elif type == bool:
+            check = lambda value: value == u'true' or value == u'false' or isinstance(value, bool)
+
+        else:
+            check = lambda value: isinstance(value, type)
+
+    # value as "{foo:bar}"
+    elif isinstance(type, collections.Mapping):
+        error = "-- Invalid JSON/dict [%s] expected %s"
+        check = compile_jmessage_validator(type)
+
+    # regexp
+    elif isinstance(type, str):
+        error = "-- Failed Match in regexp [%s] against %s"
+        regexp = re.compile(type)
+
+        def check(value):
+            try:
+                value = text_type(value)
+            except:
+                return False
+
+            return regexp.match(value) is not None
+
+    # value as "[ type ]"
+    elif isinstance(type, collections.Iterable):
+        error = "-- List validation failed [%s] of %s"
+        item = get_validator(compile_type_validator, type[0]) if type else lambda value: False
+
+        def check(value):
+            # empty list is ok
+            if not value:
+                return True
+
+            try:
+                return all(item(x) for x in value)
+            except TypeError:
+                return False
+
+    else:
+        return lambda value: False
+
+    def validate(value):
+        if value is None:
+            log.err("-- Invalid python_type, in [%s] expected %s", value, type)
+            return False
+
+        if not check(value):
+            log.err(error, value, type)
+            return False
+
+        return True
+
+    return validate
+
+
+def compile_jmessage_validator(message_template):
+    """
+    Compile a request template into a function validating a message,
+    stripping the keys not described, or raising InputValidationError
+    """
+    if isinstance(message_template, dict):
+        keys = list(message_template)
+        checks = {key: get_validator(compile_type_validator, value) for key, value in message_template.items()}
+
+        def validate(jmessage):
+            if not isinstance(jmessage, dict):
+                raise errors.InputValidationError("invalid json massage: expected dict or list")
+
+            for key in list(jmessage):
+                check = checks.get(key)
+                if check is None:
+                    # strip whatever is not validated
+                    #
+                    # reminder: it's not possible to raise an exception for the
+                    # in case more values are present because it's normal that the
+                    # client will send automatically more data.
+                    #
+                    # e.g. the client will always send 'creation_date' attributes of
+                    #      objects and attributes like this are present generally only
+                    #      from the second request on.
+                    #
+                    del jmessage[key]
+
+                elif not check(jmessage[key]):
+                    log.err("Received key %s: type validation fail", key)
+                    raise errors.InputValidationError("Key (%s) type validation failure" % key)
+
+            for key in keys:
+                if key not in jmessage:
+                    log.debug("Key %s expected but missing!",  key)
+                    log.debug("Received schema %s - Expected %s",
+                              jmessage.keys(), message_template.keys())
+                    raise errors.InputValidationError("Missing key %s" % key)
+
+            return True
+
+    elif isinstance(message_template, list):
+        check = get_validator(compile_type_validator, message_template[0])
+
+        def validate(jmessage):
+            try:
+                if all(check(x) for x in jmessage):
+                    return True
+            except TypeError:
+                pass
+
+            raise errors.InputValidationError("Not every element in %s is %s" %
+                                              (jmessage, message_template[0]))
+
+    else:
+        def validate(jmessage):
+            raise errors.InputValidationError("invalid json massage: expected dict or list")
+
+    return validate
+
+
+def open_upload_chunk(state, tid, args):
+    """
+    Return the temporary file receiving the chunk of an upload flow
+    given the fields describing it
+
+    The chunk is added to the file of its flow by process_file_upload
+    only once the request has been routed to an upload handler.
+    """
+    maximum_filesize = state.tenant_cache[tid].maximum_filesize
+
+    if (int(args[b'flowTotalSize'][0]) / (1024 * 1024)) > maximum_filesize:
+        log.err("File upload request rejected: file too big", tid=tid)
+        raise errors.FileTooBig(maximum_filesize)
+
+    return SecureTemporaryFile(Settings.tmp_path).open('w')
+
+
 class BaseHandler(object):
     check_roles = 'admin'
     handler_exec_time_threshold = 120
@@ -71,6 +374,14 @@ class BaseHandler(object):
     cache_resource = False
     invalidate_global_cache = False
     invalidate_cache = False
+
+    # the entities a cached resource is built from, or whose update
+    # invalidates the cached resources, e.g. ['contexts', 'receivers']
+    cache_tags = []
+
+    # whether the entities in cache_tags are shared by more tenants, e.g. the
+    # users associated to them, and are invalidated in all of the tenants
+    cache_tags_all_tenants = False
     invalidate_tenant_state = False
     bypass_basic_auth = False
     root_tenant_only = False
@@ -174,41 +485,7 @@ class BaseHandler(object):
 
     @staticmethod
     def validate_type(value, type):
-        retval = False
-
-        if value is None:
-            log.err("-- Invalid python_type, in [%s] expected %s", value, type)
-
-        # if it's callable, than assumes is a primitive class
-        elif callable(type):
-            retval = BaseHandler.validate_python_type(value, type)
-            if not retval:
-                log.err("-- Invalid python_type, in [%s] expected %s", value, type)
-
-        # value as "{foo:bar}"
-        elif isinstance(type, collections.Mapping):
-            retval = BaseHandler.validate_jmessage(value, type)
-            if not retval:
-                log.err("-- Invalid JSON/dict [%s] expected %s", value, type)
-
-        # regexp
-        elif isinstance(type, str):
-            retval = BaseHandler.validate_regexp(value, type)
-            if not retval:
-                log.err("-- Failed Match in regexp [%s] against %s", value, type)
-
-        # value as "[ type ]"
-        elif isinstance(type, collections.Iterable):
-            # empty list is ok
-            if not value:
-                retval = True
-
-            else:
-                retval = all(BaseHandler.validate_type(x, type[0]) for x in value)
-                if not retval:
-                    log.err("-- List validation failed [%s] of %s", value, type)
-
-        return retval
+        return get_validator(compile_type_validator, type)(value)
 
     @staticmethod
     def validate_jmessage(jmessage, message_template):
@@ -223,63 +500,7 @@ class BaseHandler(object):
 
         message_type: the GLType class it should match.
         """
-        if isinstance(message_template, dict):
-            success_check = 0
-            keys_to_strip = []
-            for key, value in jmessage.items():
-                if key not in message_template:
-                    # strip whatever is not validated
-                    #
-                    # reminder: it's not possible to raise an exception for the
-                    # in case more values are present because it's normal that the
-                    # client will send automatically more data.
-                    #
-                    # e.g. the client will always send 'creation_date' attributes of
-                    #      objects and attributes like this are present generally only
-                    #      from the second request on.
-                    #
-                    keys_to_strip.append(key)
-                    continue
-
-                if not BaseHandler.validate_type(value, message_template[key]):
-                    log.err("Received key %s: type validation fail", key)
-                    raise errors.InputValidationError("Key (%s) type validation failure" % key)
-                success_check += 1
-
-            for key in keys_to_strip:
-                del jmessage[key]
-
-            for key, value in message_template.items():
-                if key not in jmessage:
-                    log.debug("Key %s expected but missing!",  key)
-                    log.debug("Received schema %s - Expected %s",
-                              jmessage.keys(), message_template.keys())
-                    raise errors.InputValidationError("Missing key %s" % key)
-
-                if not BaseHandler.validate_type(jmessage[key], value):
-                    log.err("Expected key: %s type validation failure", key)
-                    raise errors.InputValidationError("Key (%s) double validation failure" % key)
-
-                if isinstance(message_template[key], dict) or isinstance(message_template[key], list):
-                    if message_template[key]:
-                        BaseHandler.validate_jmessage(jmessage[key], message_template[key])
-
-                success_check += 1
-
-            if success_check != len(message_template) * 2:
-                log.err("Success counter double check failure: %d", success_check)
-                raise errors.InputValidationError("Success counter double check failure")
-
-            return True
-
-        elif isinstance(message_template, list):
-            if not all(BaseHandler.validate_type(x, message_template[0]) for x in jmessage):
-                raise errors.InputValidationError("Not every element in %s is %s" %
-                                                (jmessage, message_template[0]))
-            return True
-
-        else:
-            raise errors.InputValidationError("invalid json massage: expected dict or list")
+        return get_validator(compile_jmessage_validator, message_template)(jmessage)
 
     @staticmethod
     def validate_message(message, message_template):
@@ -318,7 +539,10 @@ class BaseHandler(object):
         if mime_type:
             self.request.setHeader(b'Content-Type', mime_type)
 
-        return FileProducer(self.request, fo).start()
+        size = os.fstat(fo.fileno()).st_size
+        self.request.setHeader(b'Content-Length', str(size).encode())
+
+        return get_file_producer(self.request, fo, size).start()
 
     def write_file(self, filename, filepath):
         fo = self.open_file(filepath)
@@ -329,7 +553,48 @@ class BaseHandler(object):
         self.request.setHeader(b'Content-Type', b'application/octet-stream')
         self.request.setHeader(b'Content-Disposition', 'attachment; filename="%s"' % filename)
 
-        return FileProducer(self.request, fo).start()
+        return self.write_file_range_fo(fo)
+
+    def write_file_range_fo(self, fo):
+        """
+        Write the file or the byte range of it requested by the client
+
+        The encrypted files expose the size of the plaintext and seek
+        directly to the chunk including the start of the range.
+        """
+        stat = os.fstat(fo.fileno())
+        size = fo.get_size() if hasattr(fo, 'get_size') else stat.st_size
+        etag = ('"%x-%x"' % (int(stat.st_mtime), stat.st_size)).encode()
+
+        self.request.setHeader(b'Accept-Ranges', b'bytes')
+        self.request.setHeader(b'ETag', etag)
+
+        byte_range = None
+        range_header = self.request.getHeader(b'range')
+        if range_header is not None:
+            # a range of a modified file is not valid anymore
+            if_range = self.request.getHeader(b'if-range')
+            if if_range is None or if_range.strip() == etag:
+                byte_range = parse_range(range_header, size)
+
+        if byte_range is None:
+            self.request.setHeader(b'Content-Length', str(size).encode())
+            return get_file_producer(self.request, fo, size).start()
+
+        start, end = byte_range
+        if start >= size:
+            fo.close()
+            self.request.setResponseCode(416)
+            self.request.setHeader(b'Content-Range', ('bytes */%d' % size).encode())
+            return defer.succeed(None)
+
+        fo.seek(start)
+
+        self.request.setResponseCode(206)
+        self.request.setHeader(b'Content-Range', ('bytes %d-%d/%d' % (start, end, size)).encode())
+        self.request.setHeader(b'Content-Length', str(end - start + 1).encode())
+
+        return get_file_producer(self.request, fo, end - start + 1).start()
 
     def write_file_as_download(self, filename, filepath):
         fo = self.open_file(filepath)
@@ -381,30 +646,53 @@ class BaseHandler(object):
         if constant_time.bytes_eq(sha512(token), stored_token_hash):
             return self.state.api_token_session
 
+    @staticmethod
+    def append_upload_chunk(f, chunk, last):
+        with f.open('w'), chunk.open('r'):
+            while True:
+                data = chunk.read(64 * 1024)
+                if not data:
+                    break
+
+                f.write(data)
+
+            if last:
+                f.finalize_write()
+
+    @defer.inlineCallbacks
     def process_file_upload(self):
-        if b'flowFilename' not in self.request.args:
+        upload = self.request.content
+        if not isinstance(upload, MultipartUpload) or b'flowFilename' not in self.request.args:
             return
 
+        if upload.error is not None:
+            raise upload.error
+
+        if upload.file is None or not upload.completed:
+            raise errors.InputValidationError("Missing file")
+
         total_file_size = int(self.request.args[b'flowTotalSize'][0])
         flow_identifier = self.request.args[b'flowIdentifier'][0]
-
-        chunk_size = len(self.request.args[b'file'][0])
-        if ((chunk_size / (1024 * 1024)) > self.state.tenant_cache[self.request.tid].maximum_filesize or
-            (total_file_size / (1024 * 1024)) > self.state.tenant_cache[self.request.tid].maximum_filesize):
-            log.err("File upload request rejected: file too big", tid=self.request.tid)
-            raise errors.FileTooBig(self.state.tenant_cache[self.request.tid].maximum_filesize)
+        last = self.request.args[b'flowChunkNumber'][0] == self.request.args[b'flowTotalChunks'][0]
 
         if flow_identifier not in self.state.TempUploadFiles:
             self.state.TempUploadFiles.set(flow_identifier, SecureTemporaryFile(Settings.tmp_path))
 
         f = self.state.TempUploadFiles[flow_identifier]
-        with f.open('w') as f:
-            f.write(self.request.args[b'file'][0])
+        if f not in upload_locks:
+            upload_locks[f] = defer.DeferredLock()
+
+        # the chunks are decrypted and encrypted again out of the reactor
+        # while the ones of the same flow are still appended one at a time
+        yield upload_locks[f].run(deferToThreadPool, reactor, self.state.upload_tp,
+                                  self.append_upload_chunk, f, upload.file, last)
 
-            if self.request.args[b'flowChunkNumber'][0] != self.request.args[b'flowTotalChunks'][0]:
-                return None
+        if not last:
+            return
 
-            f.finalize_write()
+        if f.size != total_file_size:
+            self.state.TempUploadFiles.pop(flow_identifier, None)
+            raise errors.InputValidationError("Incomplete file upload")
 
         mime_type, _ = mimetypes.guess_type(text_type(self.request.args[b'flowFilename'][0], 'utf-8'))
         if mime_type is None:
@@ -3,10 +3,12 @@
 # API handling export of submissions
 import os
 
+from collections import deque
 from io import BytesIO
 from six import binary_type, text_type
-from twisted.internet import abstract
+from twisted.internet import abstract, reactor
 from twisted.internet.defer import Deferred, inlineCallbacks
+from twisted.internet.threads import deferToThreadPool
 
 from globaleaks import models
 from globaleaks.handlers.admin.context import admin_serialize_context
@@ -17,6 +19,7 @@ from globaleaks.handlers.rtip import db_access_rtip, serialize_rtip
 from globaleaks.handlers.user import user_serialize_user
 from globaleaks.orm import transact
 from globaleaks.settings import Settings
+from globaleaks.state import State
 from globaleaks.utils.crypto import GCE
 from globaleaks.utils.templating import Templating
 from globaleaks.utils.utility import msdos_encode, datetime_now
@@ -76,32 +79,94 @@ def get_tip_export(session, tid, user_id, rtip_id, language):
 
 
 class ZipStreamProducer(object):
-    """Streaming producter for ZipStream"""
-    def __init__(self, handler, zipstreamObject):
+    """
+    Streaming producer for ZipStream
+
+    The chunks of the archive are built on a thread pool so that the
+    decryption and the compression of the files do not block the reactor;
+    at most readahead chunks are kept ready to be written and the production
+    follows the pauses requested by the transport.
+    """
+    readahead = 4
+
+    def __init__(self, handler, zipstreamObject, threadpool):
         self.finish = Deferred()
         self.handler = handler
         self.zipstreamObject = zipstreamObject
+        self.threadpool = threadpool
+        self.chunks = deque()
+        self.paused = False
+        self.pending = False
+        self.completed = False
 
     def start(self):
-        self.handler.request.registerProducer(self, False)
+        self.handler.request.registerProducer(self, True)
+        self.produce()
         return self.finish
 
-    def resumeProducing(self):
-        if not self.handler:
+    def produce(self):
+        while self.handler is not None and self.chunks and not self.paused:
+            self.handler.request.write(self.chunks.popleft())
+
+        if self.handler is None:
             return
 
-        data = self.zip_chunk()
+        if self.completed:
+            if not self.chunks:
+                self.conclude()
+
+        elif not self.pending and len(self.chunks) < self.readahead:
+            self.pending = True
+            deferToThreadPool(reactor, self.threadpool, self.zip_chunk).addCallbacks(self.chunk_ready, self.chunk_failed)
+
+    def chunk_ready(self, data):
+        self.pending = False
+
         if data:
-            self.handler.request.write(data)
+            self.chunks.append(data)
         else:
-            self.stopProducing()
+            self.completed = True
+
+        self.produce()
+
+    def chunk_failed(self, failure):
+        self.pending = False
+
+        if self.handler is None:
+            return
+
+        # the response is already started and the client could not tell
+        # a truncated archive from a complete one, so drop the connection
+        transport = getattr(self.handler.request.channel, 'transport', None)
+        if transport is not None:
+            transport.abortConnection()
 
-    def stopProducing(self):
+        self.handler.request.unregisterProducer()
+        self.handler = None
+        self.chunks.clear()
+        self.finish.errback(failure)
+
+    def conclude(self):
         self.handler.request.unregisterProducer()
         self.handler.request.finish()
         self.handler = None
         self.finish.callback(None)
 
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+        self.produce()
+
+    def stopProducing(self):
+        if self.handler is None:
+            return
+
+        self.handler = None
+        self.chunks.clear()
+        self.finish.callback(None)
+
     def zip_chunk(self):
         chunk = []
         chunk_size = 0
@@ -140,6 +205,6 @@ class ExportHandler(BaseHandler):
         self.request.setHeader(b'Content-Type', b'application/octet-stream')
         self.request.setHeader(b'Content-Disposition', b'attachment; filename="submission.zip"')
 
-        self.zip_stream = iter(ZipStream(tip_export['files']))
+        self.zip_stream = iter(ZipStream(tip_export['files'], Settings.export_compression_level))
 
-        yield ZipStreamProducer(self, self.zip_stream).start()
+        yield ZipStreamProducer(self, self.zip_stream, State.export_tp).start()
@@ -6,7 +6,7 @@ import os
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.models.config import ConfigFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
 from globaleaks.rest import errors
 from globaleaks.settings import Settings
 from globaleaks.utils.fs import directory_traversal_check
@@ -17,7 +17,7 @@ def langfile_path(lang):
     return os.path.abspath(os.path.join(Settings.client_path, 'l10n', '%s.json' % lang))
 
 
-@transact
+@transact_ro
 def get_l10n(session, tid, lang):
     if tid != 1:
         node = ConfigFactory(session, 1, 'public_node')
@@ -44,6 +44,7 @@ def get_l10n(session, tid, lang):
 class L10NHandler(BaseHandler):
     check_roles = '*'
     cache_resource = True
+    cache_tags = ['l10n', 'node']
 
     def get(self, lang):
         return get_l10n(self.request.tid, lang)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+# Handler exposing users/contexts pictures
+from twisted.internet import defer
+
+from globaleaks import models
+from globaleaks.handlers.admin.modelimgs import model_map
+from globaleaks.handlers.base import BaseHandler
+from globaleaks.orm import transact_ro
+from globaleaks.rest.apicache import ApiCacheEntry, serve_cache_entry
+
+owner_model_map = {
+  'users': models.User,
+  'contexts': models.Context
+}
+
+
+@transact_ro
+def get_model_img(session, tid, obj_key, obj_id, img_hash):
+    model, owner_model = model_map[obj_key], owner_model_map[obj_key]
+
+    return models.db_get(session,
+                         model,
+                         model.id == obj_id,
+                         model.hash == img_hash,
+                         owner_model.id == model.id,
+                         owner_model.tid == tid).data
+
+
+class ModelImgHandler(BaseHandler):
+    """
+    The pictures are addressed by the hash of their content and could be
+    stored by the clients without any revalidation
+    """
+    check_roles = '*'
+
+    @defer.inlineCallbacks
+    def get(self, obj_key, obj_id, img_hash):
+        data = yield get_model_img(self.request.tid, obj_key, obj_id, img_hash)
+
+        self.request.responseHeaders.removeHeader(b'Pragma')
+        self.request.responseHeaders.removeHeader(b'Expires')
+
+        data = serve_cache_entry(self, ApiCacheEntry(b'image/png', data, compress=False))
+
+        self.request.responseHeaders.setRawHeaders(b'Cache-control', [b'public, max-age=31536000, immutable'])
+
+        defer.returnValue(data)
@@ -7,10 +7,11 @@ from sqlalchemy import or_
 
 from globaleaks import models, LANGUAGES_SUPPORTED, LANGUAGES_SUPPORTED_CODES
 from globaleaks.handlers.admin.file import db_get_file
+from globaleaks.handlers.admin.modelimgs import get_model_img_url
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.admin.submission_statuses import db_retrieve_all_submission_statuses
 from globaleaks.models.config import ConfigFactory, NodeL10NFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
 from globaleaks.state import State
 from globaleaks.utils.sets import merge_dicts
 from globaleaks.models import get_localized_values
@@ -24,8 +25,9 @@ def db_prepare_contexts_serialization(session, contexts):
     contexts_ids = [c.id for c in contexts]
 
     if contexts_ids:
-        for o in session.query(models.ContextImg).filter(models.ContextImg.id.in_(contexts_ids)):
-            data['imgs'][o.id] = o.data
+        for img_id, img_hash in session.query(models.ContextImg.id, models.ContextImg.hash) \
+                                       .filter(models.ContextImg.id.in_(contexts_ids)):
+            data['imgs'][img_id] = get_model_img_url('contexts', img_id, img_hash)
 
         for o in session.query(models.ReceiverContext).filter(models.ReceiverContext.context_id.in_(contexts_ids)).order_by(models.ReceiverContext.presentation_order):
             if o.context_id not in data['receivers']:
@@ -45,8 +47,9 @@ def db_prepare_receivers_serialization(session, receivers):
         for o in session.query(models.User).filter(models.User.id.in_(receivers_ids)):
             data['users'][o.id] = o
 
-        for o in session.query(models.UserImg).filter(models.UserImg.id.in_(receivers_ids)):
-            data['imgs'][o.id] = o.data
+        for img_id, img_hash in session.query(models.UserImg.id, models.UserImg.hash) \
+                                       .filter(models.UserImg.id.in_(receivers_ids)):
+            data['imgs'][img_id] = get_model_img_url('users', img_id, img_hash)
 
     return data
 
@@ -392,7 +395,7 @@ def db_get_public_receiver_list(session, tid, language):
     return ret
 
 
-@transact
+@transact_ro
 def get_public_resources(session, tid, language):
     return {
         'node': db_serialize_node(session, tid, language),
@@ -406,6 +409,7 @@ def get_public_resources(session, tid, language):
 class PublicResource(BaseHandler):
     check_roles = '*'
     cache_resource = True
+    cache_tags = ['node', 'files', 'contexts', 'questionnaires', 'receivers', 'submission_statuses']
 
     def get(self):
         """
@@ -2,14 +2,16 @@
 #
 # API handling recipient user functionalities
 from sqlalchemy.sql.expression import func, distinct
+from twisted.internet.defer import inlineCallbacks, returnValue
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.rtip import db_postpone_expiration_date, db_delete_itip
 from globaleaks.handlers.submission import db_serialize_archived_preview_schema
-from globaleaks.handlers.user import db_user_update_user, user_serialize_user
-from globaleaks.orm import transact
+from globaleaks.handlers.user import db_user_update_user, prepare_password_change, user_serialize_user
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests, errors
+from globaleaks.sessions import Sessions
 from globaleaks.state import State
 from globaleaks.models import get_localized_values
 from globaleaks.utils.utility import datetime_to_ISO8601
@@ -35,7 +37,7 @@ def receiver_serialize_receiver(session, tid, receiver, user, language):
     return get_localized_values(ret_dict, receiver, receiver.localized_keys, language)
 
 
-@transact
+@transact_ro
 def get_receiver_settings(session, tid, receiver_id, language):
     receiver, user = session.query(models.Receiver, models.User) \
                             .filter(models.Receiver.id == receiver_id,
@@ -45,8 +47,8 @@ def get_receiver_settings(session, tid, receiver_id, language):
 
 
 @transact
-def update_receiver_settings(session, state, tid, user_session, request, language):
-    db_user_update_user(session, state, tid, user_session, request)
+def update_receiver_settings(session, state, tid, user_session, request, language, password_change=None):
+    db_user_update_user(session, state, tid, user_session, request, password_change)
 
     receiver, user = session.query(models.Receiver, models.User) \
                             .filter(models.Receiver.id == user_session.user_id,
@@ -57,7 +59,7 @@ def update_receiver_settings(session, state, tid, user_session, request, languag
     return receiver_serialize_receiver(session, tid, receiver, user, language)
 
 
-@transact
+@transact_ro
 def get_receivertip_list(session, tid, receiver_id, language):
     rtip_summary_list = []
 
@@ -170,14 +172,23 @@ class ReceiverInstance(BaseHandler):
                                      self.current_user.user_id,
                                      self.request.language)
 
+    @inlineCallbacks
     def put(self):
         request = self.validate_message(self.request.content.read(), requests.ReceiverReceiverDesc)
 
-        return update_receiver_settings(self.state,
-                                        self.request.tid,
-                                        self.current_user,
-                                        request,
-                                        self.request.language)
+        password_change = yield prepare_password_change(self.current_user, request)
+
+        receiver = yield update_receiver_settings(self.state,
+                                                  self.request.tid,
+                                                  self.current_user,
+                                                  request,
+                                                  self.request.language,
+                                                  password_change)
+
+        # the session keeps the key of the user that could have been generated
+        Sessions.update(self.current_user)
+
+        returnValue(receiver)
 
 class TipsCollection(BaseHandler):
     """
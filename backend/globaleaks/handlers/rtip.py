@@ -404,6 +404,8 @@ def create_comment(session, tid, user_id, user_key, rtip_id, content):
     session.add(comment)
     session.flush()
 
+    models.db_schedule_notification(session, tid, comment)
+
     ret = serialize_comment(session, comment)
     ret['content'] = content
 
@@ -436,6 +438,8 @@ def create_message(session, tid, user_id, user_key, rtip_id, content):
     session.add(msg)
     session.flush()
 
+    models.db_schedule_notification(session, tid, msg)
+
     ret = serialize_message(session, msg)
     ret['content'] = content
     return ret
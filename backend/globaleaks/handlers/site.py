@@ -5,7 +5,7 @@
 # Implementation of the Tenant handlers
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
 from globaleaks.state import State
 
 
@@ -32,7 +32,7 @@ def db_get_site_list(session):
     return [serialize_site(session, t) for t in session.query(models.Tenant).filter(models.Tenant.active == True)]
 
 
-@transact
+@transact_ro
 def get_site_list(session):
     return db_get_site_list(session)
 
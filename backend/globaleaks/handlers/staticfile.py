@@ -1,11 +1,113 @@
 # -*- coding: utf-8 -*-
 #
 # Handler exposing application files
+import gzip
+import mimetypes
 import os
+import re
 
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.rest import errors
-from globaleaks.utils.fs import directory_traversal_check
+from globaleaks.rest.apicache import ApiCacheEntry, serve_cache_entry
+
+# the content types already compressed
+uncompressible_types = re.compile(r'^(image/(?!svg)|audio/|video/|application/(woff|woff2|zip|gzip|pdf))')
+
+# the references of index.html to the files of the bundle
+index_references = re.compile(br'(<(?:script|link)\b[^>]*?\b(?:src|href)=")([^":?#]+)(")')
+
+
+class StaticAsset(ApiCacheEntry):
+    """
+    A file of the client bundle stored together with its pre-compressed variants
+
+    The content of the files bigger than memory_limit is not kept in memory
+    and is delivered from disk to the clients not accepting a compressed variant.
+    """
+    memory_limit = 1024 * 1024
+
+    def __init__(self, name, path, data):
+        mime_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+        ApiCacheEntry.__init__(self, mime_type.encode(), data,
+                               compress=not uncompressible_types.match(mime_type))
+
+        self.name = name
+        self.path = path
+        self.version = self.etag[:16].encode()
+
+        if path is not None and len(data) > self.memory_limit:
+            self.variants['identity'] = None
+
+        self.size = sum(len(variant) for variant in self.variants.values() if variant is not None)
+
+
+class StaticManifest(object):
+    """
+    Index of the files of the client bundle built once at startup
+    """
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.assets = {}
+
+        files = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                files[os.path.relpath(path, self.root).replace(os.sep, '/')] = path
+
+        # the files available only as a .gz twin are served decompressed
+        # to the clients not accepting it
+        names = set(name[:-3] if name.endswith('.gz') else name for name in files)
+
+        for name in names - {'index.html'}:
+            path, data = self.read(files, name)
+            self.assets[name] = StaticAsset(name, path, data)
+
+        if 'index.html' in names:
+            _, data = self.read(files, 'index.html')
+            self.assets['index.html'] = StaticAsset('index.html', None, self.version_references(data))
+
+    def read(self, files, name):
+        """
+        Return the path and the content of a file of the bundle
+        """
+        if name in files:
+            with open(files[name], 'rb') as f:
+                return files[name], f.read()
+
+        with gzip.open(files[name + '.gz'], 'rb') as f:
+            return None, f.read()
+
+    def version_references(self, data):
+        """
+        Add the version of the files of the bundle to their references in
+        index.html so that the clients could store them until they change
+        """
+        def version_reference(match):
+            asset = self.assets.get(match.group(2).decode('utf-8', 'ignore'))
+            if asset is None:
+                return match.group(0)
+
+            return match.group(1) + match.group(2) + b'?v=' + asset.version + match.group(3)
+
+        return index_references.sub(version_reference, data)
+
+    def get(self, name):
+        return self.assets.get(name)
+
+
+# root -> manifest of the bundle served from the directory
+manifests = {}
+
+
+def get_manifest(root):
+    root = os.path.abspath(root)
+
+    if root not in manifests:
+        manifests[root] = StaticManifest(root)
+
+    return manifests[root]
 
 
 class StaticFileHandler(BaseHandler):
@@ -15,20 +117,30 @@ class StaticFileHandler(BaseHandler):
     def __init__(self, state, request, path):
         BaseHandler.__init__(self, state, request)
 
-        self.root = "%s%s" % (os.path.abspath(path), "/")
+        self.manifest = get_manifest(path)
 
     def get(self, filename):
         if not filename:
             filename = 'index.html'
 
-        abspath = os.path.abspath(os.path.join(self.root, filename))
+        asset = self.manifest.get(filename)
+        if asset is None:
+            raise errors.ResourceNotFound()
+
+        # the files of the client are not subject to the no-store policy of the API
+        self.request.responseHeaders.removeHeader(b'Pragma')
+        self.request.responseHeaders.removeHeader(b'Expires')
 
-        directory_traversal_check(self.root, abspath)
+        data = serve_cache_entry(self, asset)
 
-        if os.path.exists(abspath + '.gz') and os.path.isfile(abspath + '.gz'):
-            return self.write_file(filename + '.gz', abspath + '.gz')
-        if os.path.exists(abspath) and os.path.isfile(abspath):
-            return self.write_file(filename, abspath)
-        else:
-            raise errors.ResourceNotFound()
+        if self.request.args.get(b'v', [None])[0] == asset.version:
+            # a versioned reference changes together with the content
+            self.request.responseHeaders.setRawHeaders(b'Cache-control', [b'public, max-age=31536000, immutable'])
+
+        if data is None:
+            return self.write_file(filename, asset.path)
+
+        if data:
+            self.request.setHeader(b'Content-Length', str(len(data)).encode())
 
+        return data
@@ -8,10 +8,11 @@ import json
 from six import text_type
 
 from globaleaks import models
+from globaleaks.db import update_receipt_hash_algs
 from globaleaks.handlers.admin.questionnaire import db_get_questionnaire
 from globaleaks.handlers.admin.submission_statuses import db_get_id_for_system_status
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import after_commit, transact
 from globaleaks.rest import errors, requests
 from globaleaks.state import State
 from globaleaks.utils.crypto import sha256, GCE
@@ -266,6 +267,8 @@ def db_create_receivertip(session, receiver, internaltip, can_access_whistleblow
 
     session.add(receivertip)
 
+    models.db_schedule_notification(session, internaltip.tid, receivertip)
+
 
 def db_create_submission(session, tid, request, token, client_using_tor):
     answers = request['answers']
@@ -338,6 +341,9 @@ def db_create_submission(session, tid, request, token, client_using_tor):
     wbtip.hash_alg = GCE.HASH
     wbtip.receipt_hash = GCE.hash_password(receipt, receipt_salt)
 
+    if wbtip.hash_alg not in State.tenant_cache[tid].receipt_hash_algs:
+        after_commit(session, update_receipt_hash_algs, tid, wbtip.hash_alg)
+
     crypto_is_available = State.tenant_cache[1].encryption
 
     if crypto_is_available:
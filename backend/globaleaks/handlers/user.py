@@ -6,9 +6,11 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 from globaleaks import models
 from globaleaks.handlers.admin.modelimgs import db_get_model_img
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors, requests
+from globaleaks.sessions import Sessions
 from globaleaks.state import State
+from globaleaks.utils import kdf
 from globaleaks.utils.pgp import PGPContext
 from globaleaks.utils.crypto import GCE, generateRandomKey
 from globaleaks.models import get_localized_values
@@ -22,6 +24,9 @@ def parse_pgp_options(state, user, request):
     pgp_key_public = request['pgp_key_public']
     remove_key = request['pgp_key_remove']
 
+    if user.pgp_key_fingerprint and (remove_key or pgp_key_public != user.pgp_key_public):
+        state.pgp_keyring.invalidate(user.pgp_key_fingerprint)
+
     k = None
     if not remove_key and pgp_key_public:
         pgpctx = PGPContext(state.settings.tmp_path)
@@ -103,7 +108,60 @@ def get_user(session, tid, user_id, language):
     return user_serialize_user(session, user, language)
 
 
-def db_user_update_user(session, state, tid, user_session, request):
+@transact_ro
+def get_user_password(session, user_id):
+    user = models.db_get(session,
+                         models.User,
+                         models.User.id == user_id)
+
+    return user.hash_alg, user.salt, user.password, user.password_change_needed
+
+
+@inlineCallbacks
+def hash_new_password(password):
+    """
+    Compute on the KDF pool the hash of a new password with a new salt
+    """
+    salt = GCE.generate_salt()
+
+    password_hash = yield kdf.hash_password(password, salt)
+
+    returnValue({
+        'hash_alg': GCE.HASH,
+        'salt': salt,
+        'password': password_hash
+    })
+
+
+@inlineCallbacks
+def prepare_password_change(user_session, request):
+    """
+    Compute on the KDF pool the old password check, the new password hash
+    and the new encryption key needed by db_user_update_user.
+
+    Returns None if the request does not change the password.
+    """
+    if not request['password']:
+        returnValue(None)
+
+    hash_alg, salt, password_hash, password_change_needed = yield get_user_password(user_session.user_id)
+
+    if not password_change_needed:
+        check = yield kdf.check_password(hash_alg, request['old_password'], salt, password_hash)
+        if not check:
+            raise errors.InvalidOldPassword
+
+    password_change = yield hash_new_password(request['password'])
+    password_change['old_password_hash'] = password_hash
+    password_change['enc_key'] = None
+
+    if State.tenant_cache[1].encryption:
+        password_change['enc_key'] = yield kdf.derive_key(request['password'].encode(), password_change['salt'])
+
+    returnValue(password_change)
+
+
+def db_user_update_user(session, state, tid, user_session, request, password_change=None):
     """
     Updates the specified user.
     This version of the function is specific for users that with comparison with
@@ -113,6 +171,7 @@ def db_user_update_user(session, state, tid, user_session, request):
       - preferred language
       - the password (with old password check)
       - pgp key
+    The password change has to be prepared with prepare_password_change.
     raises: globaleaks.errors.ResourceNotFound` if the receiver does not exist.
     """
     from globaleaks.handlers.admin.notification import db_get_notification
@@ -124,30 +183,23 @@ def db_user_update_user(session, state, tid, user_session, request):
 
     user.language = request.get('language', State.tenant_cache[tid].default_language)
     user.name = request['name']
-    new_password = request['password']
-    old_password = request['old_password']
-
-    if new_password:
-        if user.password_change_needed:
-            user.password_change_needed = False
-        else:
-            if not GCE.check_password(user.hash_alg,
-                                      old_password,
-                                      user.salt,
-                                      user.password):
-                raise errors.InvalidOldPassword
-
-        user.hash_alg = GCE.HASH
-        user.salt = GCE.generate_salt()
-        user.password = GCE.hash_password(new_password, user.salt)
+
+    if password_change is not None:
+        # the password could have been changed while the old one was being checked
+        if user.password != password_change['old_password_hash']:
+            raise errors.InvalidOldPassword
+
+        user.password_change_needed = False
+        user.hash_alg = password_change['hash_alg']
+        user.salt = password_change['salt']
+        user.password = password_change['password']
         user.password_change_date = datetime_now()
 
-        if State.tenant_cache[1].encryption:
-            enc_key = GCE.derive_key(request['password'].encode(), user.salt)
+        if password_change['enc_key'] is not None:
             if not user_session.cc:
                 user_session.cc, user.crypto_pub_key = GCE.generate_keypair()
 
-            user.crypto_prv_key = GCE.symmetric_encrypt(enc_key, user_session.cc)
+            user.crypto_prv_key = GCE.symmetric_encrypt(password_change['enc_key'], user_session.cc)
 
     # If the email address changed, send a validation email
     if request['mail_address'] != user.mail_address:
@@ -176,8 +228,8 @@ def db_user_update_user(session, state, tid, user_session, request):
 
 
 @transact
-def update_user_settings(session, state, tid, user_session, request, language):
-    user = db_user_update_user(session, state, tid, user_session, request)
+def update_user_settings(session, state, tid, user_session, request, language, password_change=None):
+    user = db_user_update_user(session, state, tid, user_session, request, password_change)
 
     return user_serialize_user(session, user, language)
 
@@ -216,17 +268,28 @@ class UserInstance(BaseHandler):
     """
     check_roles = {'admin', 'receiver', 'custodian'}
     invalidate_cache = True
+    cache_tags = ['users', 'receivers']
+    cache_tags_all_tenants = True
 
     def get(self):
         return get_user(self.request.tid,
                         self.current_user.user_id,
                         self.request.language)
 
+    @inlineCallbacks
     def put(self):
         request = self.validate_message(self.request.content.read(), requests.UserUserDesc)
 
-        return update_user_settings(self.state,
-                                    self.request.tid,
-                                    self.current_user,
-                                    request,
-                                    self.request.language)
+        password_change = yield prepare_password_change(self.current_user, request)
+
+        user = yield update_user_settings(self.state,
+                                          self.request.tid,
+                                          self.current_user,
+                                          request,
+                                          self.request.language,
+                                          password_change)
+
+        # the session keeps the key of the user that could have been generated
+        Sessions.update(self.current_user)
+
+        returnValue(user)
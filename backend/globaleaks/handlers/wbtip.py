@@ -111,6 +111,8 @@ def create_comment(session, tid, wbtip_id, user_key, content):
     session.add(comment)
     session.flush()
 
+    models.db_schedule_notification(session, tid, comment)
+
     ret = serialize_comment(session, comment)
     ret['content'] = content
 
@@ -152,6 +154,8 @@ def create_message(session, tid, wbtip_id, user_key, receiver_id, content):
     session.add(msg)
     session.flush()
 
+    models.db_schedule_notification(session, tid, msg)
+
     ret = serialize_message(session, msg)
     ret['content'] = content
 
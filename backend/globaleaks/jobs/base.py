@@ -20,6 +20,13 @@ class BaseJob(task.LoopingCall):
     active = None
     last_executions = []
 
+    # operations dispatched by the job and not yet completed
+    queue_depth = 0
+
+    # operations postponed to the next runs in order to limit the queue
+    backlog = 0
+    last_backlog_warning = 0
+
     def __init__(self):
         self.name = self.__class__.__name__
 
@@ -135,6 +142,12 @@ class JobsMonitor(LoopingJob):
 
         error_msg = ""
         for job in self.jobs_list:
+            if (job.backlog and
+                current_time - job.last_backlog_warning > job.monitor_interval):
+                job.last_backlog_warning = current_time
+                log.err("Job %s is applying backpressure: %d operations queued and %d postponed",
+                        job.name, job.queue_depth, job.backlog)
+
             if job.active is None:
                 continue
 
@@ -160,3 +173,7 @@ class JobsMonitor(LoopingJob):
 
         if error_msg:
             self.state.schedule_exception_email(error_msg)
+
+    def get_metrics(self):
+        return {job.name: {'queue_depth': job.queue_depth,
+                           'backlog': job.backlog} for job in self.jobs_list}
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 import os
 
-from twisted.internet import abstract
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet import abstract, reactor
+from twisted.internet.defer import gatherResults, inlineCallbacks
+from twisted.internet.threads import deferToThreadPool
 
 from globaleaks import models
 from globaleaks.jobs.base import LoopingJob
@@ -16,18 +17,26 @@ __all__ = ['Delivery']
 
 
 @transact
-def file_delivery_planning(session):
+def file_delivery_planning(session, limit):
     """
     This function roll over the InternalFile uploaded, extract a path, id and
     receivers associated, one entry for each combination. representing the
     ReceiverFile that need to be created.
+
+    At most limit files of each kind are planned at every run; the number
+    of files left for the next runs is returned as backlog.
     """
     receiverfiles_maps = {}
     whistleblowerfiles_maps = {}
 
+    backlog = session.query(models.InternalFile).filter(models.InternalFile.new == True).count() + \
+              session.query(models.WhistleblowerFile).filter(models.WhistleblowerFile.new == True).count()
+
     for ifile, itip in session.query(models.InternalFile, models.InternalTip)\
                               .filter(models.InternalFile.new == True,
-                                      models.InternalTip.id == models.InternalFile.internaltip_id):
+                                      models.InternalTip.id == models.InternalFile.internaltip_id) \
+                              .order_by(models.InternalFile.creation_date) \
+                              .limit(limit):
         ifile.new = False
         for rtip, user in session.query(models.ReceiverTip, models.User) \
                                  .filter(models.ReceiverTip.internaltip_id == ifile.internaltip_id,
@@ -38,15 +47,16 @@ def file_delivery_planning(session):
             receiverfile.filename = ifile.filename
             receiverfile.status = u'processing'
 
-            # https://github.com/globaleaks/GlobaLeaks/issues/444
-            # avoid to mark the receiverfile as new if it is part of a submission
-            # this way we avoid to send unuseful messages
-            receiverfile.new = not ifile.submission
-
             session.add(receiverfile)
 
             session.flush()
 
+            # https://github.com/globaleaks/GlobaLeaks/issues/444
+            # avoid to notify the receiverfile if it is part of a submission
+            # this way we avoid to send unuseful messages
+            if not ifile.submission:
+                models.db_schedule_notification(session, itip.tid, receiverfile)
+
             if ifile.id not in receiverfiles_maps:
                 receiverfiles_maps[ifile.id] = {
                   'tid': user.tid,
@@ -72,7 +82,9 @@ def file_delivery_planning(session):
     for wbfile, itip in session.query(models.WhistleblowerFile, models.InternalTip)\
                                 .filter(models.WhistleblowerFile.new == True,
                                         models.ReceiverTip.id == models.WhistleblowerFile.receivertip_id,
-                                        models.InternalTip.id == models.ReceiverTip.internaltip_id):
+                                        models.InternalTip.id == models.ReceiverTip.internaltip_id) \
+                                .order_by(models.WhistleblowerFile.creation_date) \
+                                .limit(limit):
 
         wbfile.new = False
         whistleblowerfiles_maps[wbfile.id] = {
@@ -81,18 +93,60 @@ def file_delivery_planning(session):
             'filename': wbfile.filename,
         }
 
-    return receiverfiles_maps, whistleblowerfiles_maps
+    backlog -= len(receiverfiles_maps) + len(whistleblowerfiles_maps)
 
+    return receiverfiles_maps, whistleblowerfiles_maps, backlog
 
-def encrypt_file_with_pgp(state, fd, key, fingerprint, dest_path):
+
+def encrypt_file_with_pgp(state, fd, keys, fingerprints, dest_path):
     """
-    Encrypt the file for a specific key
+    Encrypt the file for the specified keys
+
+    A single message is produced whose session key is encrypted for every key
     """
     pgpctx = PGPContext(state.settings.tmp_path)
 
-    pgpctx.load_key(key)
+    for key in keys:
+        pgpctx.load_key(key)
+
+    pgpctx.encrypt_file(fingerprints, fd, dest_path)
+
+
+def encrypt_rfiles_with_pgp(state, sf, rfiles):
+    """
+    Encrypt the file once for all the receivers of the specified rfiles
+
+    If the encryption fails the receivers are retried one by one in order
+    to mark as unavailable only the files of the receivers with faulty keys.
+    """
+    pgp_name = "pgp_encrypted-%s" % generateRandomKey(16)
+    pgp_path = os.path.abspath(os.path.join(Settings.attachments_path, pgp_name))
+
+    try:
+        with sf.open('rb') as encrypted_file:
+            encrypt_file_with_pgp(state,
+                                  encrypted_file,
+                                  [rf['receiver']['pgp_key_public'] for rf in rfiles],
+                                  [rf['receiver']['pgp_key_fingerprint'] for rf in rfiles],
+                                  pgp_path)
+    except Exception as excep:
+        if os.path.exists(pgp_path):
+            os.remove(pgp_path)
+
+        if len(rfiles) > 1:
+            for rf in rfiles:
+                encrypt_rfiles_with_pgp(state, sf, [rf])
 
-    pgpctx.encrypt_file(fingerprint, fd, dest_path)
+            return
+
+        log.err("Unable to complete PGP encrypt for %s on %s: %s. marking the file as unavailable.",
+                rfiles[0]['receiver']['name'], rfiles[0]['filename'], excep)
+        rfiles[0]['status'] = u'unavailable'
+        return
+
+    for rf in rfiles:
+        rf['filename'] = pgp_name
+        rf['status'] = u'encrypted'
 
 
 def write_plaintext_file(sf, dest_path):
@@ -126,78 +180,65 @@ def write_encrypted_file(key, sf, dest_path):
         log.err("Unable to create plaintext file %s: %s", dest_path, excep)
 
 
-def process_receiverfiles(state, receiverfiles_maps):
+def process_receiverfile(state, receiverfiles_map, sf):
     """
-    @param receiverfiles_maps: the mapping of ifile/rfiles to be created on filesystem
+    @param receiverfiles_map: the mapping of an ifile/rfiles to be created on filesystem
+    @param sf: the temporary file holding the uploaded ifile
     @return: return None
     """
-    for id, receiverfiles_map in receiverfiles_maps.items():
-        key = receiverfiles_map['crypto_tip_pub_key']
-        filename = receiverfiles_map['filename']
-        filecode = filename.split('.')[0]
-        plaintext_name = "%s.plain" % filecode
-        encrypted_name = "%s.encrypted" % filecode
-        plaintext_path = os.path.abspath(os.path.join(Settings.attachments_path, plaintext_name))
-        encrypted_path = os.path.abspath(os.path.join(Settings.attachments_path, encrypted_name))
-
-        sf = state.get_tmp_file_by_name(filename)
-
-        if key:
-            receiverfiles_map['filename'] = encrypted_name
-            write_encrypted_file(key, sf, encrypted_path)
-            for rf in receiverfiles_map['rfiles']:
-                rf['filename'] = encrypted_name
-        else:
-            for rcounter, rfileinfo in enumerate(receiverfiles_map['rfiles']):
-                with sf.open('rb') as encrypted_file:
-                    if rfileinfo['receiver']['pgp_key_public']:
-                        try:
-                            pgp_name = "pgp_encrypted-%s" % generateRandomKey(16)
-                            pgp_path = os.path.abspath(os.path.join(Settings.attachments_path, pgp_name))
-                            encrypt_file_with_pgp(state,
-                                                  encrypted_file,
-                                                  rfileinfo['receiver']['pgp_key_public'],
-                                                  rfileinfo['receiver']['pgp_key_fingerprint'],
-                                                  pgp_path)
-                            rfileinfo['filename'] = pgp_name
-                            rfileinfo['status'] = u'encrypted'
-                        except Exception as excep:
-                            log.err("%d# Unable to complete PGP encrypt for %s on %s: %s. marking the file as unavailable.",
-                                    rcounter, rfileinfo['receiver']['name'], rfileinfo['filename'], excep)
-                            rfileinfo['status'] = u'unavailable'
-                    elif state.tenant_cache[receiverfiles_map['tid']].allow_unencrypted:
-                        receiverfiles_map['plaintext_file_needed'] = True
-                        rfileinfo['filename'] = plaintext_name
-                        rfileinfo['status'] = u'reference'
-                    else:
-                        rfileinfo['status'] = u'nokey'
-
-        if receiverfiles_map['plaintext_file_needed']:
-            write_plaintext_file(sf, plaintext_path)
-
-
-def process_whistleblowerfiles(state, whistleblowerfiles_maps):
+    key = receiverfiles_map['crypto_tip_pub_key']
+    filename = receiverfiles_map['filename']
+    filecode = filename.split('.')[0]
+    plaintext_name = "%s.plain" % filecode
+    encrypted_name = "%s.encrypted" % filecode
+    plaintext_path = os.path.abspath(os.path.join(Settings.attachments_path, plaintext_name))
+    encrypted_path = os.path.abspath(os.path.join(Settings.attachments_path, encrypted_name))
+
+    if key:
+        receiverfiles_map['filename'] = encrypted_name
+        write_encrypted_file(key, sf, encrypted_path)
+        for rf in receiverfiles_map['rfiles']:
+            rf['filename'] = encrypted_name
+    else:
+        pgp_rfiles = []
+
+        for rfileinfo in receiverfiles_map['rfiles']:
+            if rfileinfo['receiver']['pgp_key_public']:
+                pgp_rfiles.append(rfileinfo)
+            elif state.tenant_cache[receiverfiles_map['tid']].allow_unencrypted:
+                receiverfiles_map['plaintext_file_needed'] = True
+                rfileinfo['filename'] = plaintext_name
+                rfileinfo['status'] = u'reference'
+            else:
+                rfileinfo['status'] = u'nokey'
+
+        if pgp_rfiles:
+            encrypt_rfiles_with_pgp(state, sf, pgp_rfiles)
+
+    if receiverfiles_map['plaintext_file_needed']:
+        write_plaintext_file(sf, plaintext_path)
+
+
+def process_whistleblowerfile(state, whistleblowerfiles_map, sf):
     """
-    @param whistleblowerfiles_maps: descriptos of whistleblower files to be processed
+    @param whistleblowerfiles_map: descriptor of the whistleblower file to be processed
+    @param sf: the temporary file holding the uploaded file
     @return: return None
     """
-    for id, whistleblowerfiles_map in whistleblowerfiles_maps.items():
-        key = whistleblowerfiles_map['crypto_tip_pub_key']
-        filename = whistleblowerfiles_map['filename']
-        filecode = filename.split('.')[0]
-        plaintext_name = "%s.plain" % filecode
-        encrypted_name = "%s.encrypted" % filecode
-        plaintext_path = os.path.abspath(os.path.join(Settings.attachments_path, plaintext_name))
-        encrypted_path = os.path.abspath(os.path.join(Settings.attachments_path, encrypted_name))
-
-        sf = state.get_tmp_file_by_name(filename)
-
-        if key:
-            whistleblowerfiles_map['filename'] = encrypted_name
-            write_encrypted_file(key, sf, encrypted_path)
-        else:
-            whistleblowerfiles_map['filename'] = plaintext_name
-            write_plaintext_file(sf, plaintext_path)
+    key = whistleblowerfiles_map['crypto_tip_pub_key']
+    filename = whistleblowerfiles_map['filename']
+    filecode = filename.split('.')[0]
+    plaintext_name = "%s.plain" % filecode
+    encrypted_name = "%s.encrypted" % filecode
+    plaintext_path = os.path.abspath(os.path.join(Settings.attachments_path, plaintext_name))
+    encrypted_path = os.path.abspath(os.path.join(Settings.attachments_path, encrypted_name))
+
+    if key:
+        whistleblowerfiles_map['filename'] = encrypted_name
+        write_encrypted_file(key, sf, encrypted_path)
+    else:
+        whistleblowerfiles_map['filename'] = plaintext_name
+        write_plaintext_file(sf, plaintext_path)
 
 
 @transact
@@ -230,16 +271,39 @@ class Delivery(LoopingJob):
     interval = 5
     monitor_interval = 180
 
+    def process(self, function, files_map):
+        """
+        Schedule the processing of a file on the delivery thread pool
+        """
+        # the temporary files are tracked by the reactor and so they
+        # are fetched before leaving the reactor thread
+        sf = self.state.get_tmp_file_by_name(files_map['filename'])
+
+        self.queue_depth += 1
+
+        def processed(result):
+            self.queue_depth -= 1
+            return result
+
+        return deferToThreadPool(reactor,
+                                 self.state.delivery_tp,
+                                 function,
+                                 self.state,
+                                 files_map,
+                                 sf).addBoth(processed)
+
     @inlineCallbacks
     def operation(self):
         """
         This function creates receiver files
         """
-        receiverfiles_maps, whistleblowerfiles_maps = yield file_delivery_planning()
+        receiverfiles_maps, whistleblowerfiles_maps, self.backlog = \
+            yield file_delivery_planning(self.state.settings.jobs_operation_limit)
+
         if receiverfiles_maps:
-            process_receiverfiles(self.state, receiverfiles_maps)
+            yield gatherResults([self.process(process_receiverfile, x) for x in receiverfiles_maps.values()], consumeErrors=True)
             yield update_receiverfiles(receiverfiles_maps)
 
         if whistleblowerfiles_maps:
-            process_whistleblowerfiles(self.state, whistleblowerfiles_maps)
+            yield gatherResults([self.process(process_whistleblowerfile, x) for x in whistleblowerfiles_maps.values()], consumeErrors=True)
             yield update_whistleblowerfiles(whistleblowerfiles_maps)
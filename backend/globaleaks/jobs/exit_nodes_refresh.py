@@ -19,3 +19,5 @@ class ExitNodesRefresh(NetLoopingJob):
         log.debug('Fetching list of Tor exit nodes')
         yield State.tor_exit_set.update(net_agent)
         log.debug('Retrieved a list of %d exit nodes', len(State.tor_exit_set))
+
+        State.publish({'type': 'tor_exit_set', 'ips': list(State.tor_exit_set)})
@@ -2,6 +2,9 @@
 # Implement the notification of new submissions
 import copy
 
+from collections import OrderedDict
+from datetime import timedelta
+
 from twisted.internet import defer
 
 from globaleaks import models
@@ -12,9 +15,9 @@ from globaleaks.handlers.rtip import serialize_rtip, serialize_message, serializ
 from globaleaks.handlers.user import user_serialize_user
 from globaleaks.jobs.base import NetLoopingJob
 from globaleaks.orm import transact
-from globaleaks.utils.pgp import PGPContext
 from globaleaks.utils.templating import Templating
 from globaleaks.utils.log import log
+from globaleaks.utils.utility import datetime_now, uuid4
 
 trigger_template_map = {
     'ReceiverTip': u'tip',
@@ -200,9 +203,7 @@ class MailGenerator(object):
 
         # If the receiver has encryption enabled encrypt the mail body
         if data['user']['pgp_key_public']:
-            pgpctx = PGPContext(self.state.settings.tmp_path)
-            fingerprint = pgpctx.load_key(data['user']['pgp_key_public'])['fingerprint']
-            body = pgpctx.encrypt_message(fingerprint, body)
+            body = self.state.pgp_keyring.encrypt_message(data['user']['pgp_key_public'], body)
 
         session.add(models.Mail({
             'address': data['user']['mail_address'],
@@ -213,90 +214,227 @@ class MailGenerator(object):
 
     @transact
     def generate(self, session):
-        for trigger in ['ReceiverTip', 'Comment', 'Message', 'ReceiverFile']:
+        silent_tids = [tid for tid, cache_item in self.state.tenant_cache.items()
+                       if cache_item.notification.disable_receiver_notification_emails]
+
+        if silent_tids:
+            session.query(models.Outbox).filter(models.Outbox.tid.in_(silent_tids)).delete(synchronize_session=False)
+
+        events = session.query(models.Outbox.id, models.Outbox.type, models.Outbox.object_id) \
+                        .order_by(models.Outbox.id).all()
+
+        if not events:
+            return
+
+        object_ids = {}
+        for _, trigger, object_id in events:
+            object_ids.setdefault(trigger, []).append(object_id)
+
+        objects = {}
+        for trigger, ids in object_ids.items():
             model = trigger_model_map[trigger]
+            objects[trigger] = {obj.id: obj for obj in session.query(model).filter(model.id.in_(ids))}
+
+        for _, trigger, object_id in events:
+            # the object could have been deleted before being notified
+            element = objects[trigger].get(object_id)
+            if element is None:
+                continue
+
+            data = {
+                'type': trigger_template_map[trigger]
+            }
 
-            silent_tids = []
-            for tid, cache_item in self.state.tenant_cache.items():
-                if cache_item.notification.disable_receiver_notification_emails:
-                    silent_tids.append(tid)
+            getattr(self, 'process_%s' % trigger)(session, element, data)
 
-            if len(silent_tids):
-                for x in session.query(models.ReceiverTip).filter(models.ReceiverTip.internaltip_id == models.InternalTip.id,
-                                                                  models.InternalTip.tid.in_(silent_tids)):
-                    x.new = False
+        session.query(models.Outbox).filter(models.Outbox.id <= events[-1][0]).delete(synchronize_session=False)
 
-                for x in session.query(models.Comment).filter(models.Comment.internaltip_id == models.InternalTip.id,
-                                                              models.InternalTip.tid.in_(silent_tids)):
-                    x.new = False
 
-                for x in session.query(models.Message).filter(models.Message.receivertip_id == models.ReceiverTip.id,
-                                                              models.ReceiverTip.internaltip_id == models.InternalTip.id,
-                                                              models.InternalTip.tid.in_(silent_tids)):
-                    x.new = False
+def fair_schedule(mails, limit):
+    """
+    Select up to limit mails picking them in round robin among the tenants
+    so that a burst of mails of a tenant does not starve the others.
 
-                for x in session.query(models.ReceiverFile).filter(models.ReceiverFile.receivertip_id == models.ReceiverTip.id,
-                                                                   models.ReceiverTip.internaltip_id == models.InternalTip.id,
-                                                                   models.InternalTip.tid.in_(silent_tids)):
-                    x.new = False
+    @param mails: a list of mails ordered by creation date
+    """
+    queues = OrderedDict()
+    for mail in mails:
+        queues.setdefault(mail['tid'], []).append(mail)
 
-            for element in session.query(model).filter(model.new == True):
-                element.new = False
+    ret = []
+    queues = [iter(q) for q in queues.values()]
+    while queues and len(ret) < limit:
+        for q in list(queues):
+            mail = next(q, None)
+            if mail is None:
+                queues.remove(q)
+            elif len(ret) < limit:
+                ret.append(mail)
 
-                data = {
-                    'type': trigger_template_map[trigger]
-                }
+    return ret
 
-                getattr(self, 'process_%s' % trigger)(session, element, data)
 
 @transact
 def delete_sent_mails(session, mail_ids):
-    session.query(models.Mail).filter(models.Mail.id.in_(mail_ids)).delete(synchronize_session='fetch')
+    session.query(models.Mail).filter(models.Mail.id.in_(mail_ids)).delete(synchronize_session=False)
 
 
 @transact
-def get_mails_from_the_pool(session):
-    session.query(models.Mail).filter(models.Mail.processing_attempts > 9).delete(synchronize_session='fetch')
-    session.query(models.Mail).update({'processing_attempts': models.Mail.processing_attempts + 1})
+def release_failed_mails(session, owner, next_attempts):
+    """
+    Release the lease on the mails whose delivery failed scheduling their next attempt
 
-    ret = []
+    @param next_attempts: a dict mapping the mail ids to the date of the next attempt
+    """
+    for mail in session.query(models.Mail).filter(models.Mail.id.in_(list(next_attempts)),
+                                                  models.Mail.lease_owner == owner):
+        mail.processing_attempts += 1
+        mail.next_attempt_at = next_attempts[mail.id]
+        mail.lease_owner = u''
 
-    for mail in session.query(models.Mail).order_by(models.Mail.creation_date):
-        ret.append({
-            'id': mail.id,
-            'address': mail.address,
-            'subject': mail.subject,
-            'body': mail.body,
-            'tid': mail.tid
-        })
 
-    return ret
+@transact
+def lease_mails(session, owner, limit, lease_time, due_date):
+    """
+    Lease a batch of at most limit mails due for delivery at due_date
+    picking them in round robin among the tenants.
+
+    The lease expires after lease_time seconds so that the mails leased by
+    a job that died without releasing them are spooled again.
+    """
+    now = datetime_now()
+
+    due = models.Mail.next_attempt_at <= due_date
+
+    session.query(models.Mail).filter(due, models.Mail.processing_attempts > 9).delete(synchronize_session=False)
+
+    mails = []
+    for tid, in session.query(models.Mail.tid).filter(due).distinct():
+        mails.extend({'id': id, 'tid': tid} for id, in session.query(models.Mail.id)
+                                                              .filter(models.Mail.tid == tid, due)
+                                                              .order_by(models.Mail.next_attempt_at,
+                                                                        models.Mail.creation_date)
+                                                              .limit(limit))
+
+    mail_ids = [mail['id'] for mail in fair_schedule(mails, limit)]
+    if not mail_ids:
+        return []
+
+    # the condition on the due date protects from leasing the mails that
+    # have been leased concurrently by another job
+    session.query(models.Mail).filter(models.Mail.id.in_(mail_ids), due) \
+                              .update({'lease_owner': owner,
+                                       'next_attempt_at': now + timedelta(seconds=lease_time)},
+                                      synchronize_session=False)
+
+    ret = {mail.id: {
+        'id': mail.id,
+        'address': mail.address,
+        'subject': mail.subject,
+        'body': mail.body,
+        'tid': mail.tid,
+        'processing_attempts': mail.processing_attempts
+    } for mail in session.query(models.Mail).filter(models.Mail.id.in_(mail_ids),
+                                                    models.Mail.lease_owner == owner)}
+
+    return [ret[mail_id] for mail_id in mail_ids if mail_id in ret]
+
+
+@transact
+def count_mails(session):
+    return session.query(models.Mail).count()
 
 
 class Notification(NetLoopingJob):
     interval = 5
     monitor_interval = 3 * 60
-    mails_to_delete = []
+
+    def __init__(self):
+        NetLoopingJob.__init__(self)
+
+        self.lease_owner = uuid4()
+
+    def get_backoff(self, attempts):
+        """
+        Return the delay before the next delivery attempt of a mail that
+        failed the given number of attempts
+        """
+        return min(self.interval * 2 ** attempts, self.state.settings.mail_backoff_limit)
+
+    def sendmails(self, tid, mails):
+        return self.state.sendmails(tid, [(mail['address'], mail['subject'], mail['body']) for mail in mails])
 
     @defer.inlineCallbacks
-    def sendmail(self, mail):
-        success = yield self.state.sendmail(mail['tid'], mail['address'], mail['subject'], mail['body'])
-        if success:
-            self.mails_to_delete.append(mail['id'])
+    def send_session(self, tid, mails, sent_ids, failed_mails):
+        self.queue_depth += 1
+
+        try:
+            results = yield self.sendmails(tid, mails)
+        finally:
+            self.queue_depth -= 1
+
+        for mail, success in zip(mails, results):
+            if success:
+                sent_ids.append(mail['id'])
+            else:
+                failed_mails.append(mail)
 
     @defer.inlineCallbacks
-    def spool_emails(self):
-        mails = yield get_mails_from_the_pool()
+    def spool_batch(self, mails):
+        # mails sent with the same SMTP configuration are grouped in
+        # sessions and each mail server is contacted with bounded concurrency
+        sessions = OrderedDict()
         for mail in mails:
-            yield self.sendmail(mail)
+            session = sessions.setdefault(self.state.get_mail_tid(mail['tid']), [[]])
+            if len(session[-1]) >= self.state.settings.mail_session_limit:
+                session.append([])
+
+            session[-1].append(mail)
+
+        sent_ids, failed_mails = [], []
+
+        semaphores = {}
+        dl = []
+        for tid, batches in sessions.items():
+            notification = self.state.tenant_cache[tid].notification
+            server = (notification.smtp_server, notification.smtp_port)
+            semaphore = semaphores.setdefault(server, defer.DeferredSemaphore(self.state.settings.mail_smtp_concurrency))
+            for batch in batches:
+                dl.append(semaphore.run(self.send_session, tid, batch, sent_ids, failed_mails))
+
+        yield defer.gatherResults(dl, consumeErrors=True)
+
+        if sent_ids:
+            yield delete_sent_mails(sent_ids)
 
-        if self.mails_to_delete:
-            yield delete_sent_mails(self.mails_to_delete)
+        if failed_mails:
+            now = datetime_now()
+            yield release_failed_mails(self.lease_owner,
+                                       {mail['id']: now + timedelta(seconds=self.get_backoff(mail['processing_attempts']))
+                                        for mail in failed_mails})
 
     @defer.inlineCallbacks
-    def operation(self):
-        del self.mails_to_delete[:]
+    def spool_emails(self):
+        limit = self.state.settings.notification_limit
+
+        # the mails due for delivery are streamed in batches of bounded size;
+        # the mails that fail are rescheduled after the beginning of the run
+        # and so the loop ends when all the due mails have been tried once
+        due_date = datetime_now()
+
+        while True:
+            mails = yield lease_mails(self.lease_owner, limit, self.state.settings.mail_lease_time, due_date)
+
+            if mails:
+                yield self.spool_batch(mails)
 
+            if len(mails) < limit:
+                break
+
+        self.backlog = yield count_mails()
+
+    @defer.inlineCallbacks
+    def operation(self):
         yield MailGenerator(self.state).generate()
 
         yield self.spool_emails()
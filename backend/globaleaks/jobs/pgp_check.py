@@ -76,6 +76,7 @@ class PGPCheck(LoopingJob):
 
             log.info('Removing expired PGP key of: %s', user.username, tid=user.tid)
             if user.pgp_key_expiration < datetime_now():
+                self.state.pgp_keyring.invalidate(user.pgp_key_fingerprint)
                 user.pgp_key_public = ''
                 user.pgp_key_fingerprint = ''
                 user.pgp_key_expiration = datetime_null()
@@ -60,6 +60,16 @@ def delete(session, model, *args, **kwargs):
     return db_delete(session, model, *args, **kwargs)
 
 
+def db_schedule_notification(session, tid, obj):
+    """
+    Append to the outbox the event of the creation of an object to be notified
+    """
+    if obj.id is None:
+        session.flush()
+
+    session.add(Outbox({'tid': tid, 'type': obj.__class__.__name__, 'object_id': obj.id}))
+
+
 class LocalizationEngine(object):
     """
     This Class can manage all the localized strings inside
@@ -266,7 +276,9 @@ class _Anomalies(Model):
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_anomalies_tid_date', 'tid', 'date'),
+                Index('idx_anomalies_date', 'date'))
 
 
 class _ArchivedSchema(Model):
@@ -293,7 +305,6 @@ class _Comment(Model):
     author_id = Column(UnicodeText(36))
     content = Column(UnicodeText, nullable=False)
     type = Column(UnicodeText, nullable=False)
-    new = Column(Integer, default=True, nullable=False)
 
     @declared_attr
     def __table_args__(self):
@@ -453,9 +464,11 @@ class _ContextImg(Model):
 
     id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
 
-    data = Column(UnicodeText, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    hash = Column(UnicodeText(64), nullable=False)
 
-    unicode_keys = ['data']
+    binary_keys = ['data']
+    unicode_keys = ['hash']
 
     @declared_attr
     def __table_args__(self):
@@ -728,7 +741,8 @@ class _InternalFile(Model):
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_internalfile_new', 'new', sqlite_where=self.new == 1))
 
 
 class _InternalTip(Model):
@@ -769,7 +783,9 @@ class _InternalTip(Model):
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_internaltip_tid_wb_last_access', 'tid', 'wb_last_access'),
+                Index('idx_internaltip_expiration_date', 'expiration_date'))
 
 
 class _InternalTipAnswers(Model):
@@ -821,11 +837,19 @@ class _Mail(Model):
     body = Column(UnicodeText, nullable=False)
     processing_attempts = Column(Integer, default=0, nullable=False)
 
-    unicode_keys = ['address', 'subject', 'body']
+    # the mail is not spooled before this date; while a notification job
+    # holds the lease on the mail this is the expiration of the lease
+    next_attempt_at = Column(DateTime, default=datetime_null, nullable=False)
+    lease_owner = Column(UnicodeText(36), default=u'', nullable=False)
+
+    unicode_keys = ['address', 'subject', 'body', 'lease_owner']
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_mail_creation_date', 'creation_date'),
+                Index('idx_mail_tid_next_attempt_at', 'tid', 'next_attempt_at', 'creation_date'),
+                Index('idx_mail_next_attempt_at', 'next_attempt_at'))
 
 
 class _Message(Model):
@@ -841,7 +865,6 @@ class _Message(Model):
     receivertip_id = Column(UnicodeText(36), nullable=False)
     content = Column(UnicodeText, nullable=False)
     type = Column(UnicodeText, nullable=False)
-    new = Column(Integer, default=True, nullable=False)
 
     @declared_attr
     def __table_args__(self):
@@ -849,6 +872,27 @@ class _Message(Model):
                 CheckConstraint(self.type.in_(['receiver', 'whistleblower'])))
 
 
+class _Outbox(Model):
+    """
+    This model keeps track of the creation of the objects whose notification
+    is pending; the notification job consumes the events in order of id.
+    """
+    __tablename__ = 'outbox'
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    tid = Column(Integer, default=1, nullable=False)
+    type = Column(UnicodeText, nullable=False)
+    object_id = Column(UnicodeText(36), nullable=False)
+
+    unicode_keys = ['type', 'object_id']
+
+    @declared_attr
+    def __table_args__(self):
+        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                CheckConstraint(self.type.in_(['ReceiverTip', 'Comment', 'Message', 'ReceiverFile'])),
+                Index('idx_outbox_tid', 'tid'))
+
+
 class _Questionnaire(Model):
     __tablename__ = 'questionnaire'
 
@@ -931,7 +975,6 @@ class _ReceiverFile(Model):
     filename = Column(UnicodeText(255), nullable=False)
     downloads = Column(Integer, default=0, nullable=False)
     last_access = Column(DateTime, default=datetime_null, nullable=False)
-    new = Column(Integer, default=True, nullable=True)
     status = Column(UnicodeText, default=u'processing', nullable=False)
 
     @declared_attr
@@ -957,7 +1000,6 @@ class _ReceiverTip(Model):
     access_counter = Column(Integer, default=0, nullable=False)
     label = Column(UnicodeText, default=u'', nullable=False)
     can_access_whistleblower_identity = Column(Boolean, default=False, nullable=False)
-    new = Column(Integer, default=True, nullable=False)
     enable_notifications = Column(Boolean, default=True, nullable=False)
 
     crypto_tip_prv_key = Column(LargeBinary(72), default=b'', nullable=False)
@@ -971,7 +1013,8 @@ class _ReceiverTip(Model):
     @declared_attr
     def __table_args__(self):
         return (ForeignKeyConstraint(['receiver_id'], ['receiver.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
-                ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'))
+                ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_receivertip_receiver_id', 'receiver_id'))
 
 
 class _SecureFileDelete(Model):
@@ -1082,7 +1125,9 @@ class _Stats(Model):
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_stats_tid_start', 'tid', 'start'),
+                Index('idx_stats_start', 'start'))
 
 
 class _SubmissionStatus(Model):
@@ -1257,9 +1302,11 @@ class _UserImg(Model):
 
     id = Column(UnicodeText(36), primary_key=True, default=uuid4, nullable=False)
 
-    data = Column(UnicodeText, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    hash = Column(UnicodeText(64), nullable=False)
 
-    unicode_keys = ['data']
+    binary_keys = ['data']
+    unicode_keys = ['hash']
 
     @declared_attr
     def __table_args__(self):
@@ -1289,7 +1336,8 @@ class _WhistleblowerFile(Model):
 
     @declared_attr
     def __table_args__(self):
-        return (ForeignKeyConstraint(['receivertip_id'], ['receivertip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['receivertip_id'], ['receivertip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_whistleblowerfile_new', 'new', sqlite_where=self.new == 1))
 
 
 class _WhistleblowerIdentity(Model):
@@ -1348,6 +1396,7 @@ class InternalTipAnswers(_InternalTipAnswers, Base): pass
 class InternalTipData(_InternalTipData, Base): pass
 class Mail(_Mail, Base): pass
 class Message(_Message, Base): pass
+class Outbox(_Outbox, Base): pass
 class Questionnaire(_Questionnaire, Base): pass
 class Receiver(_Receiver, Base): pass
 class ReceiverContext(_ReceiverContext, Base): pass
@@ -1,10 +1,13 @@
 # -*- coding: utf-8
+import random
+import threading
 import time
 import platform
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 
 from twisted.internet import reactor
@@ -14,6 +17,124 @@ from globaleaks.utils.log import log
 
 __DB_URI = 'sqlite:'
 __THREAD_POOL = None
+__WRITER_THREAD_POOL = None
+
+# Process wide engines (and their connection pools) indexed by DB URI
+__ENGINES = {}
+__ENGINES_LOCK = threading.Lock()
+
+# Size of the connection pool when the ORM thread pool does not specify one
+DEFAULT_POOL_SIZE = 16
+
+# Bounded exponential backoff applied while the database is locked
+LOCK_RETRY_ATTEMPTS = 8
+LOCK_RETRY_BASE_DELAY = 0.05
+LOCK_RETRY_MAX_DELAY = 2.0
+
+
+class PoolStats(object):
+    """
+    Counters describing the usage of the ORM connection pool
+
+    A checkout is a hit when an already opened connection is reused and a
+    miss when a new connection has to be opened (and configured).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.wait_count = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record_connect(self):
+        with self.lock:
+            self.connects += 1
+
+    def record_checkout(self):
+        with self.lock:
+            self.checkouts += 1
+
+    def record_wait(self, wait):
+        with self.lock:
+            self.wait_count += 1
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+
+    def dict(self):
+        with self.lock:
+            return {
+                'hits': max(self.checkouts - self.connects, 0),
+                'misses': self.connects,
+                'checkouts': self.checkouts,
+                'checkout_wait_mean': self.wait_total / self.wait_count if self.wait_count else 0.0,
+                'checkout_wait_max': self.wait_max
+            }
+
+
+class LockStats(object):
+    """
+    Counters describing the contention on the database lock
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.retries = 0
+            self.failures = 0
+            self.wait_total = 0.0
+
+    def record_retry(self, delay):
+        with self.lock:
+            self.retries += 1
+            self.wait_total += delay
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+    def dict(self):
+        with self.lock:
+            return {
+                'retries': self.retries,
+                'failures': self.failures,
+                'wait_total': self.wait_total
+            }
+
+
+class TransactionStats(object):
+    """
+    Counters of the read only and read/write transactions executed,
+    indexed by the name of the transaction function
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+
+    def record(self, name, readonly):
+        with self.lock:
+            counter = self.counters.setdefault(name, {'reads': 0, 'writes': 0})
+            counter['reads' if readonly else 'writes'] += 1
+
+    def dict(self):
+        with self.lock:
+            return {name: dict(counter) for name, counter in self.counters.items()}
+
+
+pool_stats = PoolStats()
+lock_stats = LockStats()
+transaction_stats = TransactionStats()
 
 
 def make_db_uri(db_file):
@@ -36,28 +157,133 @@ def set_db_uri(db_uri):
     global __DB_URI
     __DB_URI = db_uri
 
+    # the database file may have been replaced; never reuse old connections
+    dispose_engines()
+
 
 def get_db_uri():
     global __DB_URI
     return __DB_URI
 
 
-def get_engine(db_uri=None, foreign_keys=True):
+def get_engine(db_uri=None, foreign_keys=True, pool_size=None):
+    """
+    Create a new engine.
+
+    When pool_size is specified the engine keeps up to pool_size connections
+    open, and the pragmas are executed only once per connection.
+    """
     if db_uri is None:
         db_uri = get_db_uri()
 
-    engine = create_engine(db_uri, connect_args={'timeout': 30})
+    if pool_size is None:
+        engine = create_engine(db_uri, connect_args={'timeout': 30})
+    else:
+        engine = create_engine(db_uri,
+                               connect_args={'timeout': 30, 'check_same_thread': False},
+                               poolclass=QueuePool,
+                               pool_size=pool_size,
+                               max_overflow=pool_size,
+                               pool_timeout=30)
 
-    if foreign_keys:
+        event.listen(engine, 'connect', lambda conn, record: pool_stats.record_connect())
+        event.listen(engine, 'checkout', lambda conn, record, proxy: pool_stats.record_checkout())
+
+    pragmas = get_db_pragmas(foreign_keys) if pool_size is not None else []
+
+    if foreign_keys and pool_size is None:
+        pragmas.append('pragma foreign_keys=ON')
+
+    if pragmas:
         def on_connect(conn, record):
-            conn.execute('pragma foreign_keys=ON')
+            for pragma in pragmas:
+                conn.execute(pragma)
 
         event.listen(engine, 'connect', on_connect)
 
     return engine
 
 
+def get_db_pragmas(foreign_keys=True):
+    """
+    Return the pragmas used to tune the connections of the pooled engine
+    """
+    from globaleaks.settings import Settings
+
+    pragmas = [
+        'pragma journal_mode=%s' % Settings.db_journal_mode,
+        'pragma synchronous=%s' % Settings.db_synchronous,
+        'pragma cache_size=%d' % Settings.db_cache_size,
+        'pragma mmap_size=%d' % Settings.db_mmap_size
+    ]
+
+    if foreign_keys:
+        pragmas.append('pragma foreign_keys=ON')
+
+    return pragmas
+
+
+def get_pool_size():
+    # one connection for each reader thread plus one for the writer thread
+    return getattr(get_thread_pool(), 'max', DEFAULT_POOL_SIZE) + 1
+
+
+def get_pooled_engine(db_uri=None):
+    """
+    Return the process wide engine associated to the db_uri creating it if needed.
+
+    The size of the pool matches the size of the ORM thread pool so that
+    every thread can keep its connection open.
+    """
+    if db_uri is None:
+        db_uri = get_db_uri()
+
+    with __ENGINES_LOCK:
+        if db_uri not in __ENGINES:
+            engine = get_engine(db_uri, pool_size=get_pool_size())
+            __ENGINES[db_uri] = (engine, sessionmaker(bind=engine))
+
+        return __ENGINES[db_uri]
+
+
+def dispose_engines():
+    """
+    Close all the pooled connections and forget the process wide engines
+    """
+    with __ENGINES_LOCK:
+        engines = list(__ENGINES.values())
+        __ENGINES.clear()
+
+    for engine, _ in engines:
+        engine.dispose()
+
+
+def get_lock_stats():
+    return lock_stats.dict()
+
+
+def get_transaction_stats():
+    return transaction_stats.dict()
+
+
+def get_pool_stats():
+    ret = pool_stats.dict()
+    ret['pool_size'] = get_pool_size()
+    ret['checkedout'] = sum(engine.pool.checkedout() for engine, _ in list(__ENGINES.values()))
+    return ret
+
+
 def get_session(db_uri=None, foreign_keys=True):
+    """
+    Return a new session.
+
+    Sessions on the configured database are bound to the pooled engine,
+    while sessions on other databases (e.g. the ones used during the
+    migrations) use a dedicated engine.
+    """
+    if db_uri is None and foreign_keys:
+        return get_pooled_engine()[1]()
+
     return sessionmaker(bind=get_engine(db_uri, foreign_keys))()
 
 
@@ -65,19 +291,61 @@ def set_thread_pool(thread_pool):
     global __THREAD_POOL
     __THREAD_POOL = thread_pool
 
+    # the size of the connection pool depends on the size of the thread pool
+    dispose_engines()
+
 
 def get_thread_pool():
     global __THREAD_POOL
     return __THREAD_POOL
 
 
+def set_writer_thread_pool(thread_pool):
+    global __WRITER_THREAD_POOL
+    __WRITER_THREAD_POOL = thread_pool
+
+
+def get_writer_thread_pool():
+    """
+    Return the thread pool used to serialize the write transactions.
+
+    When no writer pool is configured writes share the ORM thread pool.
+    """
+    global __WRITER_THREAD_POOL
+    if __WRITER_THREAD_POOL is None:
+        return get_thread_pool()
+
+    return __WRITER_THREAD_POOL
+
+
+def after_commit(session, function, *args):
+    """
+    Schedule a call in the reactor thread to be executed only after the
+    commit of the transaction of the session
+    """
+    session.info.setdefault('after_commit', []).append((function, args))
+
+
+def get_lock_retry_delay(attempt):
+    delay = min(LOCK_RETRY_BASE_DELAY * (2 ** attempt), LOCK_RETRY_MAX_DELAY)
+
+    # jitter avoids that concurrent transactions retry in lockstep
+    return delay * random.uniform(0.5, 1.0)
+
+
 class transact(object):
     """
     Class decorator for managing transactions.
+
+    Write transactions are serialized on the writer thread while read only
+    transactions run concurrently on the ORM thread pool.
     """
+    readonly = False
+
     def __init__(self, method):
         self.method = method
         self.instance = None
+        self.name = '%s.%s' % (method.__module__, method.__name__)
 
     def __get__(self, instance, owner):
         self.instance = instance
@@ -87,8 +355,10 @@ class transact(object):
         return self.run(self._wrap, self.method, *args, **kwargs)
 
     def run(self, function, *args, **kwargs):
+        thread_pool = get_thread_pool() if self.readonly else get_writer_thread_pool()
+
         return deferToThreadPool(reactor,
-                                 get_thread_pool(),
+                                 thread_pool,
                                  function,
                                  *args,
                                  **kwargs)
@@ -98,9 +368,16 @@ class transact(object):
         Wrap provided function calling it inside a thread and
         passing the store to it.
         """
+        transaction_stats.record(self.name, self.readonly)
+
         session = get_session()
 
         try:
+            start = time.time()
+            session.connection()
+            pool_stats.record_wait(time.time() - start)
+
+            attempt = 0
             while True:
                 try:
                     if self.instance:
@@ -108,14 +385,32 @@ class transact(object):
                     else:
                         result = function(session, *args, **kwargs)
 
-                    session.commit()
+                    if not self.readonly:
+                        session.commit()
+
+                        for f, f_args in session.info.pop('after_commit', []):
+                            reactor.callFromThread(f, *f_args)
+                    elif session.new or session.dirty or session.deleted:
+                        raise RuntimeError("Attempt to write within the read only transaction %s" % self.name)
+                    else:
+                        session.rollback()
                 except OperationalError as e:
                     session.rollback()
+                    session.info.pop('after_commit', None)
 
                     if "database is locked" not in str(e):
                         raise
 
-                    time.sleep(0.1)
+                    if attempt >= LOCK_RETRY_ATTEMPTS:
+                        lock_stats.record_failure()
+                        log.err("Transaction failed after %d attempts: database is locked", attempt + 1)
+                        raise
+
+                    delay = get_lock_retry_delay(attempt)
+                    lock_stats.record_retry(delay)
+                    attempt += 1
+
+                    time.sleep(delay)
                 except:
                     session.rollback()
                     raise
@@ -125,6 +420,17 @@ class transact(object):
             session.close()
 
 
+class transact_ro(transact):
+    """
+    Class decorator for managing read only transactions.
+
+    The transaction is never committed and so it never acquires the
+    database write lock; being routed to the ORM thread pool it runs
+    concurrently with the other readers without waiting for the writer.
+    """
+    readonly = True
+
+
 class transact_sync(transact):
     def run(self, function, *args, **kwargs):
         return function(*args, **kwargs)
@@ -21,6 +21,7 @@ from globaleaks.handlers import custodian, \
                                 email_validation, \
                                 exception, \
                                 file, \
+                                modelimgs, \
                                 receiver, \
                                 password_reset, \
                                 public, \
@@ -56,6 +57,7 @@ from globaleaks.handlers.admin import tenant as admin_tenant
 from globaleaks.handlers.admin import user as admin_user
 from globaleaks.handlers.admin import submission_statuses as admin_submission_statuses
 from globaleaks.rest import apicache, requests, errors
+from globaleaks.sessions import Sessions
 from globaleaks.settings import Settings
 from globaleaks.state import State, extract_exception_traceback_and_schedule_email
 
@@ -151,6 +153,7 @@ api_spec = [
     (r'/admin/activities/(summary|details)', admin_statistics.RecentEventsCollection),
     (r'/admin/anomalies', admin_statistics.AnomalyCollection),
     (r'/admin/jobs', admin_statistics.JobsTiming),
+    (r'/admin/metrics', admin_statistics.MetricsCollection),
     (r'/admin/l10n/(' + '|'.join(LANGUAGES_SUPPORTED_CODES) + ')', admin_l10n.AdminL10NHandler),
     (r'/admin/files/(logo|favicon|css|homepage|script)', admin_file.FileInstance),
     (r'/admin/config', admin_operation.AdminOperationHandler),
@@ -180,6 +183,7 @@ api_spec = [
     (r'/robots.txt', robots.RobotstxtHandler),
     (r'/sitemap.xml', sitemap.SitemapHandler),
     (r'/s/(.+)', file.FileHandler),
+    (r'/(users|contexts)/' + uuid_regexp + r'/img/([a-f0-9]{64})', modelimgs.ModelImgHandler),
     (r'(/u/.{1,255})', shorturl.ShortURL),
     (r'/l10n/(' + '|'.join(LANGUAGES_SUPPORTED_CODES) + ')', l10n.L10NHandler),
 
@@ -214,16 +218,104 @@ def decorate_method(h, method):
     setattr(h, method, f)
 
 
+class APIRouter(object):
+    """
+    Resolve a path to the first route of a specification matching it
+
+    Literal paths are resolved with a dictionary lookup while the other routes
+    are indexed in a trie on the path segments preceding their first parameter,
+    so that a path is only matched against the routes sharing its prefix.
+    """
+    metachars = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
+    def __init__(self, routes):
+        self.routes = []
+        self.static = {}
+        self.trie = ({}, [])
+
+        literals = []
+
+        for pattern, handler, args in routes:
+            if pattern.startswith('^'):
+                pattern = pattern[1:]
+
+            if pattern.endswith('$'):
+                pattern = pattern[:-1]
+
+            self.routes.append((re.compile('^' + pattern + '$'), handler, args))
+
+            match = self.metachars.search(pattern)
+            if match is None:
+                literals.append(pattern)
+                continue
+
+            node = self.trie
+            prefix = pattern[:match.start()]
+            if prefix.startswith('/'):
+                for segment in prefix.split('/')[1:-1]:
+                    node = node[0].setdefault(segment, ({}, []))
+
+            node[1].append(len(self.routes) - 1)
+
+        for path in literals:
+            # a literal path could be shadowed by a previous pattern
+            if path not in self.static:
+                self.static[path] = next(route for route in self.routes if route[0].match(path))
+
+        self.compile_trie(self.trie, [])
+
+    def compile_trie(self, node, candidates):
+        """
+        Replace the indexes of the routes of each node of the trie with the
+        routes that may match the paths reaching it, in specification order
+        """
+        candidates = sorted(candidates + node[1])
+
+        for child in node[0].values():
+            self.compile_trie(child, candidates)
+
+        node[1][:] = [self.routes[i] for i in candidates]
+
+    def get_candidates(self, path):
+        node = self.trie
+
+        if path.startswith('/'):
+            for segment in path.split('/')[1:-1]:
+                child = node[0].get(segment)
+                if child is None:
+                    break
+
+                node = child
+
+        return node[1]
+
+    def match(self, path):
+        """
+        Return the handler, the handler arguments and the parameters of the
+        route matching the path or None if the path is not routed
+        """
+        route = self.static.get(path)
+        if route is not None:
+            match = route[0].match(path)
+            return route[1], route[2], match.groups()
+
+        for regexp, handler, args in self.get_candidates(path):
+            match = regexp.match(path)
+            if match is not None:
+                return handler, args, match.groups()
+
+
 class APIResourceWrapper(Resource):
-    _registry = None
+    router = None
     isLeaf = True
     method_map = {'get': 200, 'post': 201, 'put': 202, 'delete': 200}
 
     def __init__(self):
         Resource.__init__(self)
-        self._registry = []
         self.handler = None
 
+        routes = []
+
         for tup in api_spec:
             args = {}
             if len(tup) == 2:
@@ -231,19 +323,15 @@ class APIResourceWrapper(Resource):
             else:
                 pattern, handler, args = tup
 
-            if not pattern.startswith("^"):
-                pattern = "^" + pattern
-
-            if not pattern.endswith("$"):
-                pattern += "$"
-
             if not hasattr(handler, '_decorated'):
                 handler._decorated = True
                 for m in ['get', 'put', 'post', 'delete']:
                     if hasattr(handler, m):
                         decorate_method(handler, m)
 
-            self._registry.append((re.compile(pattern), handler, args))
+            routes.append((pattern, handler, args))
+
+        self.router = APIRouter(routes)
 
     def should_redirect_https(self, request):
         hostname = request.hostname
@@ -392,19 +480,17 @@ class APIResourceWrapper(Resource):
             self.redirect_https(request)
             return b''
 
-        match = None
-        for regexp, handler, args in self._registry:
-            try:
-                match = regexp.match(request.path.decode('utf-8'))
-            except UnicodeDecodeError:
-                match = None
-            if match:
-                break
+        try:
+            route = self.router.match(request.path.decode('utf-8'))
+        except UnicodeDecodeError:
+            route = None
 
-        if match is None:
+        if route is None:
             self.handle_exception(errors.ResourceNotFound(), request)
             return b''
 
+        handler, args, groups = route
+
         method = request.method.lower().decode('utf-8')
 
         if method == 'head':
@@ -418,7 +504,7 @@ class APIResourceWrapper(Resource):
             return b''
 
         f = getattr(handler, method)
-        groups = [text_type(g) for g in match.groups()]
+        groups = [text_type(g) for g in groups]
 
         self.handler = handler(State, request, **args)
 
@@ -428,14 +514,10 @@ class APIResourceWrapper(Resource):
             self.handle_exception(errors.ForbiddenOperation(), request)
             return b''
 
-        if self.handler.upload_handler and method == 'post':
-            self.handler.process_file_upload()
-            if self.handler.uploaded_file is None:
-               return b''
-
         @defer.inlineCallbacks
         def concludeHandlerFailure(err):
             yield self.handler.execution_check()
+            yield Sessions.flush()
 
             self.handle_exception(err, request)
 
@@ -451,6 +533,10 @@ class APIResourceWrapper(Resource):
             """
             yield self.handler.execution_check()
 
+            # the sessions changed by the handler have to be visible to
+            # the other processes before the client can use them
+            yield Sessions.flush()
+
             if not request_finished[0]:
                 if ret is not None:
                    if isinstance(ret, (dict, list)):
@@ -464,7 +550,26 @@ class APIResourceWrapper(Resource):
 
                 request.finish()
 
-        defer.maybeDeferred(f, self.handler, *groups).addCallbacks(concludeHandlerSuccess, concludeHandlerFailure)
+        def concludeUploadFailure(err):
+            self.handle_exception(err, request)
+
+            if not request_finished[0]:
+                request.finish()
+
+        def concludeUploadSuccess(ret):
+            # the handler is executed only once the last chunk of the file is received
+            if self.handler.uploaded_file is None:
+                if not request_finished[0]:
+                    request.finish()
+
+                return
+
+            defer.maybeDeferred(f, self.handler, *groups).addCallbacks(concludeHandlerSuccess, concludeHandlerFailure)
+
+        if self.handler.upload_handler and method == 'post':
+            self.handler.process_file_upload().addCallbacks(concludeUploadSuccess, concludeUploadFailure)
+        else:
+            defer.maybeDeferred(f, self.handler, *groups).addCallbacks(concludeHandlerSuccess, concludeHandlerFailure)
 
         return NOT_DONE_YET
 
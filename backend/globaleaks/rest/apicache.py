@@ -3,93 +3,342 @@ import io
 import gzip
 import json
 
+from collections import OrderedDict
+
 from six import text_type
 
 from twisted.internet import defer
 
+from globaleaks.settings import Settings
+from globaleaks.utils.security import sha256
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# The entities of the root tenant that are part of the resources of every
+# tenant, e.g. the footer, the logo and the shared questionnaires
+ROOT_TENANT_TAGS = {'node', 'files', 'questionnaires', 'l10n'}
+
+
+def get_cache_tags(tid, tags):
+    """
+    Return the set of (tid, tag) pairs a resource of the tenant tid built
+    from the entities described by tags depends on
+    """
+    ret = set((tid, tag) for tag in tags)
+
+    if tid != 1:
+        ret.update((1, tag) for tag in tags if tag in ROOT_TENANT_TAGS)
+
+    return ret
+
 
 def gzipdata(data):
     if isinstance(data, text_type):
         data = data.encode()
 
     fgz = io.BytesIO()
-    gzip_obj = gzip.GzipFile(mode='wb', fileobj=fgz)
+
+    # the mtime is fixed in order to produce the same output for the same data
+    gzip_obj = gzip.GzipFile(mode='wb', fileobj=fgz, mtime=0)
     gzip_obj.write(data)
     gzip_obj.close()
 
     return fgz.getvalue()
 
 
+def parse_accept_encoding(header):
+    """
+    Return the set of the content codings accepted by the client
+    """
+    ret = set()
+
+    for coding in (header or b'').decode('utf-8', 'ignore').split(','):
+        parts = coding.strip().lower().split(';')
+        q = 1.0
+        for param in parts[1:]:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+
+        if parts[0] and q > 0:
+            ret.add(parts[0])
+
+    return ret
+
+
+class ApiCacheEntry(object):
+    """
+    A cached resource stored together with its pre-compressed variants
+    """
+    def __init__(self, content_type, data, tags=(), compress=True):
+        if isinstance(data, text_type):
+            data = data.encode()
+
+        self.content_type = content_type
+        self.tags = set(tags)
+        self.variants = OrderedDict()
+
+        if compress:
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(data)
+
+            self.variants['gzip'] = gzipdata(data)
+
+        self.variants['identity'] = data
+
+        self.etag = sha256(data)[:32]
+        if not isinstance(self.etag, text_type):
+            self.etag = self.etag.decode()
+
+        self.size = sum(len(variant) for variant in self.variants.values())
+        self.hits = 0
+        self.misses = 0
+
+    def get_variant(self, accept_encoding):
+        """
+        Return the encoding, the etag and the data of the smallest variant accepted by the client
+        """
+        codings = parse_accept_encoding(accept_encoding)
+
+        for encoding, data in self.variants.items():
+            if encoding in codings or '*' in codings or encoding == 'identity':
+                etag = self.etag if encoding == 'identity' else '%s-%s' % (self.etag, encoding)
+                return encoding, ('"%s"' % etag).encode(), data
+
+
 class ApiCache(object):
     memory_cache_dict = {}
 
+    # (tid, resource, language) -> entry, in least recently used order
+    lru = OrderedDict()
+    size = 0
+
+    # (tid, resource, language) -> number of misses of the entries not yet
+    # built; the counter is moved to the entry when it is built
+    misses = {}
+    total_misses = 0
+
+    # (tid, tag) -> set of (tid, resource, language) of the entries depending on it
+    tags = {}
+
+    # (tid, resource, language) -> list of deferreds of the requests waiting
+    # for the resource being built; the list is dropped on every invalidation
+    # so that the result of a build started before it is not cached
+    pending = {}
+
     @classmethod
     def get(cls, tid, resource, language):
-        if tid in cls.memory_cache_dict \
-           and resource in cls.memory_cache_dict[tid] \
-           and language in cls.memory_cache_dict[tid][resource]:
-            return cls.memory_cache_dict[tid][resource][language]
+        key = (tid, resource, language)
+
+        entry = cls.lru.get(key)
+        if entry is None:
+            cls.misses[key] = cls.misses.get(key, 0) + 1
+            cls.total_misses += 1
+            return None
+
+        entry.hits += 1
+        cls.lru.pop(key)
+        cls.lru[key] = entry
+
+        return entry
 
     @classmethod
-    def set(cls, tid, resource, language, content_type, data):
-        data = gzipdata(data)
+    def set(cls, tid, resource, language, content_type, data, tags=()):
+        key = (tid, resource, language)
 
-        if tid not in ApiCache.memory_cache_dict:
-            cls.memory_cache_dict[tid] = {}
+        cls.remove(tid, resource, language)
 
-        if resource not in ApiCache.memory_cache_dict[tid]:
-            cls.memory_cache_dict[tid][resource] = {}
+        entry = ApiCacheEntry(content_type, data, tags)
+        entry.misses = cls.misses.pop(key, 0)
 
-        entry = (content_type, data)
+        cls.memory_cache_dict.setdefault(tid, {}).setdefault(resource, {})[language] = entry
 
-        cls.memory_cache_dict[tid][resource][language] = entry
+        cls.lru[key] = entry
+        cls.size += entry.size
+
+        for tag in entry.tags:
+            cls.tags.setdefault(tag, set()).add(key)
+
+        while cls.size > Settings.api_cache_memory_limit and len(cls.lru) > 1:
+            cls.remove(*next(iter(cls.lru)))
 
         return entry
 
     @classmethod
-    def invalidate(cls, tid=None):
+    def remove(cls, tid, resource, language):
+        entry = cls.lru.pop((tid, resource, language), None)
+        if entry is None:
+            return
+
+        cls.size -= entry.size
+
+        for tag in entry.tags:
+            keys = cls.tags[tag]
+            keys.discard((tid, resource, language))
+            if not keys:
+                del cls.tags[tag]
+
+        resources = cls.memory_cache_dict[tid]
+        del resources[resource][language]
+        if not resources[resource]:
+            del resources[resource]
+            if not resources:
+                del cls.memory_cache_dict[tid]
+
+    @classmethod
+    def invalidate(cls, tid=None, tags=None):
+        """
+        Invalidate the entries of the tenant tid, or of all the tenants if
+        tid is None, restricting to the entries depending on tags if specified
+        """
+        cls.pending = {}
+
         if tid is not None:
-            cls.memory_cache_dict.pop(tid, None)
+            cls.misses = {key: n for key, n in cls.misses.items() if key[0] != tid}
+        else:
+            cls.misses.clear()
+
+        if tags is not None:
+            if tid is not None:
+                tags = [(tid, tag) for tag in tags]
+            else:
+                tags = [x for x in cls.tags if x[1] in tags]
+
+            for tag in tags:
+                for key in list(cls.tags.get(tag, [])):
+                    cls.remove(*key)
+
+        elif tid is not None:
+            for resource, languages in list(cls.memory_cache_dict.get(tid, {}).items()):
+                for language in list(languages):
+                    cls.remove(tid, resource, language)
+
         else:
             cls.memory_cache_dict.clear()
+            cls.lru.clear()
+            cls.tags.clear()
+            cls.size = 0
+
+    @classmethod
+    def get_stats(cls):
+        return {
+            'entries': len(cls.lru),
+            'size': cls.size,
+            'hits': sum(entry.hits for entry in cls.lru.values()),
+            'misses': cls.total_misses
+        }
+
+
+def serve_cache_entry(handler, entry):
+    """
+    Write the headers of the variant of the entry accepted by the client
+    and return its body, or an empty body if the client holds it already
+    """
+    request = handler.request
+
+    encoding, etag, data = entry.get_variant(request.getHeader(b'accept-encoding'))
+
+    request.setHeader(b'Content-type', entry.content_type)
+    request.setHeader(b'ETag', etag)
+    request.setHeader(b'Vary', b'Accept-Encoding')
+
+    if encoding != 'identity':
+        request.setHeader(b'Content-encoding', encoding.encode())
+
+    if handler.check_roles == '*':
+        # public resources may be stored by the client provided that
+        # they are revalidated at every use
+        request.setHeader(b'Cache-control', b'no-cache')
+
+    if_none_match = request.getHeader(b'if-none-match')
+    if if_none_match is not None and \
+       (if_none_match.strip() == b'*' or etag in [x.strip().replace(b'W/', b'') for x in if_none_match.split(b',')]):
+        request.setResponseCode(304)
+        return b''
+
+    return data
 
 
 def decorator_cache_get(f):
     def decorator_cache_get_wrapper(self, *args, **kwargs):
-        c = ApiCache.get(self.request.tid, self.request.path, self.request.language)
-        if c is None:
-            d = defer.maybeDeferred(f, self, *args, **kwargs)
+        tid, path, language = self.request.tid, self.request.path, self.request.language
 
-            def callback(data):
-                if isinstance(data, (dict, list)):
-                    self.request.setHeader(b'content-type', b'application/json')
-                    data = json.dumps(data)
+        c = ApiCache.get(tid, path, language)
+        if c is not None:
+            return serve_cache_entry(self, c)
 
-                self.request.setHeader(b'Content-encoding', b'gzip')
+        key = (tid, path, language)
 
-                c = self.request.responseHeaders.getRawHeaders(b'Content-type', [b'application/json'])[0]
-                return ApiCache.set(self.request.tid, self.request.path, self.request.language, c, data)[1]
+        # concurrent misses on the same resource wait for a single build
+        if key in ApiCache.pending:
+            d = defer.Deferred()
+            ApiCache.pending[key].append(d)
+            return d.addCallback(lambda entry: serve_cache_entry(self, entry))
 
-            d.addCallback(callback)
+        waiting = ApiCache.pending[key] = []
 
-            return d
+        def callback(data):
+            if isinstance(data, (dict, list)):
+                self.request.setHeader(b'content-type', b'application/json')
+                data = json.dumps(data)
 
-        else:
-            self.request.setHeader(b'Content-encoding', b'gzip')
-            self.request.setHeader(b'Content-type', c[0])
+            c = self.request.responseHeaders.getRawHeaders(b'Content-type', [b'application/json'])[0]
 
-        return c[1]
+            if ApiCache.pending.get(key) is waiting:
+                del ApiCache.pending[key]
+                entry = ApiCache.set(tid, path, language, c, data, get_cache_tags(tid, self.cache_tags))
+            else:
+                # the cache has been invalidated while building the resource
+                entry = ApiCacheEntry(c, data)
+
+            for d in waiting:
+                d.callback(entry)
+
+            return serve_cache_entry(self, entry)
+
+        def errback(failure):
+            if ApiCache.pending.get(key) is waiting:
+                del ApiCache.pending[key]
+
+            for d in waiting:
+                d.errback(failure)
+
+            return failure
+
+        return defer.maybeDeferred(f, self, *args, **kwargs).addCallbacks(callback, errback)
 
     return decorator_cache_get_wrapper
 
 
 def decorator_cache_invalidate(f):
     def decorator_cache_invalidate_wrapper(self, *args, **kwargs):
-        if self.invalidate_cache and self.request.tid != 1:
-            ApiCache.invalidate(self.request.tid)
+        if self.invalidate_global_cache:
+            tid, tags = None, None
+        elif self.cache_tags:
+            tid = None if self.cache_tags_all_tenants else self.request.tid
+            tags = self.cache_tags
+        elif self.request.tid != 1:
+            tid, tags = self.request.tid, None
         else:
-            ApiCache.invalidate()
+            tid, tags = None, None
+
+        ApiCache.invalidate(tid, tags)
+
+        def callback(data):
+            # the resources cached while the write was in progress could
+            # reflect the previous state and the other processes are
+            # notified only after the commit
+            ApiCache.invalidate(tid, tags)
+            self.state.publish({'type': 'invalidate_cache', 'tid': tid, 'tags': tags})
+            return data
 
-        return f(self, *args, **kwargs)
+        return defer.maybeDeferred(f, self, *args, **kwargs).addCallback(callback)
 
     return decorator_cache_invalidate_wrapper
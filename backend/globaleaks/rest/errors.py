@@ -178,3 +178,9 @@ class AccessLocationInvalid(GLException):
     reason = "IP Address not allows to login from this location"
     error_code = 17
     status_code = 401
+
+
+class ServiceOverloaded(GLException):
+    reason = "The service is overloaded, please retry later"
+    error_code = 18
+    status_code = 503 # Service not available
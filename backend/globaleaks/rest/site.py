@@ -0,0 +1,57 @@
+# -*- coding: utf-8
+#   Site
+#   ****
+#
+#   This file defines the twisted.web site serving the GlobaLeaks API
+#   shared by the main process and by the API worker processes
+
+import cgi
+
+from twisted.web import server
+
+from globaleaks.handlers.base import open_upload_chunk
+from globaleaks.settings import Settings
+from globaleaks.state import State
+from globaleaks.utils.log import openLogFile
+from globaleaks.utils.multipart import MultipartUpload
+
+
+class Request(server.Request):
+    current_user = None
+    log_ip_and_ua = False
+
+    def gotLength(self, length):
+        """
+        Stream the multipart bodies carrying the file uploads to an
+        encrypted temporary file while they are received; the chunk is
+        added to its upload flow only if the request is routed to an
+        upload handler
+        """
+        ctype = self.requestHeaders.getRawHeaders(b'content-type')
+        if ctype is not None:
+            key, pdict = cgi.parse_header(ctype[0].decode('latin-1'))
+            if key == 'multipart/form-data' and pdict.get('boundary'):
+                tid = State.tenant_hostname_id_map.get(self.getRequestHostname(), 1)
+                if tid not in State.tenant_cache:
+                    tid = 1
+
+                self.content = MultipartUpload(pdict['boundary'].encode('latin-1'),
+                                               lambda args: open_upload_chunk(State, tid, args),
+                                               State.tenant_cache[tid].maximum_filesize * 1024 * 1024)
+                return
+
+        server.Request.gotLength(self, length)
+
+    def process(self):
+        if isinstance(self.content, MultipartUpload):
+            # the fields of the body have been parsed while it was received
+            self.args.update(self.content.args)
+
+        server.Request.process(self)
+
+
+class Site(server.Site):
+    requestFactory = Request
+
+    def _openLogFile(self, path):
+        return openLogFile(path, Settings.log_file_size, Settings.num_log_files)
@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
+import sqlite3
+
+from twisted.internet import defer, reactor
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
 
 from globaleaks.settings import Settings
-from globaleaks.utils.crypto import generateRandomKey
-from globaleaks.utils.tempdict import TempDict
+from globaleaks.utils.crypto import GCE, generateRandomKey
+from globaleaks.utils.log import log
+
 
 class Session(object):
     def __init__(self, tid, user_id, user_role, pcn, cc):
@@ -12,10 +18,10 @@ class Session(object):
         self.user_role = user_role
         self.pcn = pcn
         self.cc = cc
-        self.expireCall = None
+        self.expiration = 0
 
     def getTime(self):
-        return self.expireCall.getTime() if self.expireCall else 0
+        return self.expiration
 
     def serialize(self):
         return {
@@ -27,24 +33,307 @@ class Session(object):
         }
 
 
-class SessionsFactory(TempDict):
-    """Extends TempDict to provide session management functions ontop of temp session keys"""
+class MemorySessionStore(object):
+    """
+    Store keeping the sessions in the memory of the process
+
+    The sessions are indexed by user in order to revoke them without
+    scanning the store and are assigned to the slots of a timer wheel
+    depending on their expiration; a session whose expiration is postponed
+    is moved to its new slot only when its old slot expires.
+    """
+    def __init__(self, resolution):
+        self.resolution = resolution
+        self.sessions = {}
+        self.users = {}
+        self.wheel = {}
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def slot(self, expiration):
+        return int(expiration // self.resolution)
+
+    def set(self, session):
+        self.sessions[session.id] = session
+        self.users.setdefault(session.user_id, set()).add(session.id)
+        self.wheel.setdefault(self.slot(session.expiration), set()).add(session.id)
+
+    def touch(self, session_id, now, expiration):
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+
+        if session.expiration <= now:
+            self.delete(session_id)
+            return
+
+        session.expiration = expiration
+
+        return session
+
+    def update(self, session):
+        pass
+
+    def flush(self):
+        return defer.succeed(None)
+
+    def delete(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+
+        ids = self.users.get(session.user_id)
+        if ids is not None:
+            ids.discard(session_id)
+            if not ids:
+                del self.users[session.user_id]
+
+    def revoke(self, user_id):
+        for session_id in list(self.users.get(user_id, [])):
+            self.delete(session_id)
+
+    def expire(self, now):
+        current = self.slot(now)
+
+        for slot in sorted(x for x in self.wheel if x <= current):
+            for session_id in self.wheel.pop(slot):
+                session = self.sessions.get(session_id)
+                if session is None:
+                    continue
+
+                if session.expiration <= now:
+                    self.delete(session_id)
+                else:
+                    self.wheel.setdefault(self.slot(session.expiration), set()).add(session_id)
+
+    def clear(self):
+        self.sessions.clear()
+        self.users.clear()
+        self.wheel.clear()
+
+
+class SQLiteSessionStore(object):
+    """
+    Store keeping the sessions in a SQLite database shared by the processes
+
+    The private keys of the users kept in the sessions are encrypted with
+    a key that is known only to the processes sharing the store.
+
+    The writes are executed in order by a dedicated thread so that the
+    reactor never waits for the locks of the other processes; until they
+    are committed the changes are kept in an overlay consulted by the
+    reads, that in WAL mode are not blocked by the writers. The expiration
+    of a session is written again only after a tenth of its lifetime.
+    """
+    schema = [
+        'CREATE TABLE IF NOT EXISTS session (id TEXT PRIMARY KEY, tid INTEGER NOT NULL, user_id TEXT NOT NULL, '
+        'user_role TEXT NOT NULL, pcn INTEGER NOT NULL, cc BLOB NOT NULL, expiration REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS session__user_id ON session(user_id)',
+        'CREATE INDEX IF NOT EXISTS session__expiration ON session(expiration)'
+    ]
+
+    touch_threshold = 0.1
+
+    def __init__(self, db_path, key):
+        self.db_path = db_path
+        self.key = key
+        self.db = self.connect()
+        self.writer = None
+        self.pending = {}
+        self.revoked = {}
+        self.queued = 0
+
+        for statement in self.schema:
+            self.db.execute(statement)
+
+        self.thread_pool = ThreadPool(1, 1, 'sessions')
+        self.thread_pool.start()
+        self.shutdown_trigger = reactor.addSystemEventTrigger('during', 'shutdown', self.thread_pool.stop)
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM session').fetchone()[0]
+
+    def connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def encrypt_cc(self, cc):
+        return sqlite3.Binary(GCE.symmetric_encrypt(self.key, cc) if cc else b'')
+
+    def decrypt_cc(self, cc):
+        cc = bytes(cc)
+        return GCE.symmetric_decrypt(self.key, cc) if cc else ''
+
+    def write(self, query, args, session_id=None, user_id=None):
+        self.queued += 1
+        self.thread_pool.callInThread(self.execute, query, args, session_id, self.pending.get(session_id), user_id)
+
+    def execute(self, query, args, session_id, session, user_id):
+        try:
+            if self.writer is None:
+                self.writer = self.connect()
+
+            self.writer.execute(query, args)
+        except Exception as e:
+            log.err("Unable to write the session store: %s", e)
+        finally:
+            reactor.callFromThread(self.committed, session_id, session, user_id)
+
+    def committed(self, session_id, session, user_id):
+        self.queued -= 1
+
+        if session_id is not None and session_id in self.pending and self.pending[session_id] is session:
+            del self.pending[session_id]
+
+        if user_id is not None:
+            self.revoked[user_id] -= 1
+            if not self.revoked[user_id]:
+                del self.revoked[user_id]
+
+    def flush(self):
+        if not self.queued:
+            return defer.succeed(None)
+
+        return deferToThreadPool(reactor, self.thread_pool, lambda: None)
+
+    def close(self):
+        reactor.removeSystemEventTrigger(self.shutdown_trigger)
+        self.thread_pool.stop()
+        self.db.close()
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def set(self, session):
+        self.pending[session.id] = session
+        self.write('INSERT OR REPLACE INTO session VALUES (?, ?, ?, ?, ?, ?, ?)',
+                   (session.id, session.tid, session.user_id, session.user_role,
+                    int(session.pcn), self.encrypt_cc(session.cc), session.expiration),
+                   session_id=session.id)
+
+    def touch(self, session_id, now, expiration):
+        if session_id in self.pending:
+            session = self.pending[session_id]
+            if session is None or session.expiration <= now:
+                return
+        else:
+            row = self.db.execute('SELECT tid, user_id, user_role, pcn, cc, expiration FROM session WHERE id = ? AND expiration > ?',
+                                  (session_id, now)).fetchone()
+            if row is None or row[1] in self.revoked:
+                return
+
+            session = Session(row[0], row[1], row[2], bool(row[3]), self.decrypt_cc(row[4]))
+            session.id = session_id
+            session.expiration = row[5]
+
+        if expiration - session.expiration >= (expiration - now) * self.touch_threshold:
+            session.expiration = expiration
+            self.pending[session_id] = session
+            self.write('UPDATE session SET expiration = ? WHERE id = ?', (expiration, session_id),
+                       session_id=session_id)
+
+        return session
+
+    def update(self, session):
+        self.pending[session.id] = session
+        self.write('UPDATE session SET pcn = ?, cc = ? WHERE id = ?',
+                   (int(session.pcn), self.encrypt_cc(session.cc), session.id),
+                   session_id=session.id)
+
+    def delete(self, session_id):
+        self.pending[session_id] = None
+        self.write('DELETE FROM session WHERE id = ?', (session_id,), session_id=session_id)
+
     def revoke(self, user_id):
-        for k, v in list(self.items()):
-            if v.user_id == user_id:
-                del self[k]
+        for session_id, session in list(self.pending.items()):
+            if session is not None and session.user_id == user_id:
+                self.pending[session_id] = None
+
+        self.revoked[user_id] = self.revoked.get(user_id, 0) + 1
+        self.write('DELETE FROM session WHERE user_id = ?', (user_id,), user_id=user_id)
+
+    def expire(self, now):
+        self.write('DELETE FROM session WHERE expiration <= ?', (now,))
+
+    def clear(self):
+        self.pending.clear()
+        self.write('DELETE FROM session', ())
+
+
+class SessionsFactory(object):
+    """
+    Session management functions on top of a pluggable session store
+
+    A single timer expires the sessions of the store every resolution
+    seconds while the store is not empty.
+    """
+    reactor = reactor
+    resolution = 10
+
+    def __init__(self, timeout, store=None):
+        self.timeout = timeout
+        self.store = store if store is not None else MemorySessionStore(self.resolution)
+        self.expireCall = None
+
+    def __len__(self):
+        return len(self.store)
+
+    def set_store(self, store):
+        self.clear()
+        self.store = store
+
+    def schedule(self):
+        if self.expireCall is None or not self.expireCall.active():
+            self.expireCall = self.reactor.callLater(self.resolution, self.expire)
+
+    def expire(self):
+        self.expireCall = None
+        self.store.expire(self.reactor.seconds())
+
+        if len(self.store):
+            self.schedule()
 
     def new(self, tid, user_id, user_role, pcn, cc):
         session = Session(tid, user_id, user_role, pcn, cc)
+        session.expiration = self.reactor.seconds() + self.timeout
         self.revoke(user_id)
-        self.set(session.id, session)
+        self.store.set(session)
+        self.schedule()
         return session
 
+    def get(self, session_id):
+        now = self.reactor.seconds()
+        return self.store.touch(session_id, now, now + self.timeout)
+
+    def update(self, session):
+        self.store.update(session)
+
+    def flush(self):
+        return self.store.flush()
+
+    def delete(self, session_id):
+        self.store.delete(session_id)
+
+    def revoke(self, user_id):
+        self.store.revoke(user_id)
+
     def regenerate(self, session_id):
-        session = self.pop(session_id)
+        session = self.get(session_id)
+        self.store.delete(session_id)
         session.id = generateRandomKey(42)
-        self.set(session.id, session)
+        self.store.set(session)
         return session
 
+    def clear(self):
+        if self.expireCall is not None and self.expireCall.active():
+            self.expireCall.cancel()
+
+        self.expireCall = None
+        self.store.clear()
+
 
 Sessions = SessionsFactory(timeout=Settings.authentication_lifetime)
@@ -4,6 +4,7 @@
 from __future__ import print_function
 
 import getpass
+import multiprocessing
 import platform
 import logging
 import os
@@ -60,6 +61,12 @@ class SettingsClass(object):
 
         self.db_type = 'sqlite'
 
+        # sqlite tuning applied to each pooled connection
+        self.db_journal_mode = 'WAL'
+        self.db_synchronous = 'NORMAL'
+        self.db_cache_size = -16384 # KiB
+        self.db_mmap_size = 64 * 1024 * 1024 # bytes
+
         # debug defaults
         self.orm_debug = False
 
@@ -80,6 +87,15 @@ class SettingsClass(object):
 
         self.authentication_lifetime = 3600
 
+        # store of the sessions: 'memory' keeps them in the process while
+        # 'sqlite' shares them among the processes serving the API
+        self.sessions_store = 'memory'
+
+        # number of worker processes serving the API behind the HTTPS workers
+        # besides the main process and local port shared by them
+        self.api_workers = 0
+        self.api_workers_port = 8084
+
         self.accept_submissions = True
 
         # statistical, referred to latest period
@@ -109,6 +125,23 @@ class SettingsClass(object):
         self.notification_limit = 30
         self.jobs_operation_limit = 20
 
+        # number of threads used to encrypt the delivered files
+        self.delivery_threads = max(multiprocessing.cpu_count(), 2)
+
+        # number of threads used to append the uploaded chunks to the files
+        self.upload_threads = max(multiprocessing.cpu_count(), 2)
+
+        # number of threads used to decrypt and compress the exported tips
+        # and the deflate level used for the files not already compressed
+        self.export_threads = max(multiprocessing.cpu_count(), 2)
+        self.export_compression_level = 6
+
+        # number of threads used to compute the password hashes and the key
+        # derivations, each one using up to 128MB, and maximum number of
+        # requests waiting for them before refusing the new ones
+        self.kdf_threads = min(max(multiprocessing.cpu_count(), 2), 4)
+        self.kdf_queue_limit = 64
+
         self.user = getpass.getuser()
         self.group = getpass.getuser()
 
@@ -148,10 +181,26 @@ class SettingsClass(object):
         self.mail_timeout = 15 # seconds
         self.mail_attempts_limit = 3 # per mail limit
 
+        # SMTP sessions opened in parallel toward the same mail server
+        self.mail_smtp_concurrency = 2
+
+        # maximum number of mails delivered within a single SMTP session
+        self.mail_session_limit = 10
+
+        # maximum delay (seconds) between two delivery attempts of a mail
+        self.mail_backoff_limit = 3600
+
+        # time (seconds) after which a mail leased for delivery and not
+        # released is considered available again for delivery
+        self.mail_lease_time = 600
+
         self.acme_directory_url = 'https://acme-v02.api.letsencrypt.org/directory'
 
         self.enable_api_cache = True
 
+        # upper bound (bytes) to the memory used by the api cache
+        self.api_cache_memory_limit = 32 * 1024 * 1024
+
         self.eval_paths()
 
     def eval_paths(self):
@@ -167,6 +216,7 @@ class SettingsClass(object):
 
         self.db_schema = os.path.join(self.static_db_source, 'sqlite.sql')
         self.db_file_path = os.path.abspath(os.path.join(self.working_path, 'globaleaks.db'))
+        self.sessions_db_path = os.path.abspath(os.path.join(self.working_path, 'sessions.db'))
 
         self.logfile = os.path.abspath(os.path.join(self.log_path, 'globaleaks.log'))
         self.accesslogfile = os.path.abspath(os.path.join(self.log_path, "access.log"))
@@ -233,6 +283,8 @@ class SettingsClass(object):
 
         self.orm_debug = self.cmdline_options.orm_debug
 
+        self.api_workers = self.cmdline_options.api_workers
+
         if self.cmdline_options.working_path:
             self.working_path = self.cmdline_options.working_path
 
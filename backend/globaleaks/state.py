@@ -16,11 +16,12 @@ from globaleaks import __version__, orm, models
 from globaleaks.settings import Settings
 from globaleaks.transactions import schedule_email
 from globaleaks.utils.agent import get_tor_agent, get_web_agent
+from globaleaks.utils import kdf
 from globaleaks.utils.crypto import sha256
 from globaleaks.utils.log import log
-from globaleaks.utils.mail import sendmail
+from globaleaks.utils.mail import sendmails
 from globaleaks.utils.objectdict import ObjectDict
-from globaleaks.utils.pgp import PGPContext
+from globaleaks.utils.pgp import PGPKeyring
 from globaleaks.utils.security import sha256
 from globaleaks.utils.singleton import Singleton
 from globaleaks.utils.tempdict import TempDict
@@ -55,10 +56,15 @@ class StateClass(ObjectDict):
         self.settings = Settings
 
         self.process_supervisor = None
+
+        # channel broadcasting the changes of the state to the other
+        # processes serving the API, if any
+        self.bus = None
         self.tor_exit_set = TorExitSet()
 
         self.https_socks = []
         self.http_socks = []
+        self.api_sock = None
 
         self.jobs = []
         self.jobs_monitor = None
@@ -79,6 +85,11 @@ class StateClass(ObjectDict):
         self.tenant_hostname_id_map = {}
 
         self.set_orm_tp(ThreadPool(4, 16))
+        self.set_orm_writer_tp(ThreadPool(1, 1, 'orm-writer'))
+        self.delivery_tp = ThreadPool(0, self.settings.delivery_threads, 'delivery')
+        self.export_tp = ThreadPool(0, self.settings.export_threads, 'export')
+        self.upload_tp = ThreadPool(0, self.settings.upload_threads, 'upload')
+        self.set_kdf_tp(ThreadPool(0, self.settings.kdf_threads, 'kdf'))
         self.TempUploadFiles = TempDict(timeout=3600)
 
         self.shutdown = False
@@ -91,10 +102,20 @@ class StateClass(ObjectDict):
 
         self.tokens = TokenList(self.settings.tmp_path)
 
+        self.pgp_keyring = PGPKeyring(self.settings.tmp_path)
+
     def set_orm_tp(self, orm_tp):
         self.orm_tp = orm_tp
         orm.set_thread_pool(orm_tp)
 
+    def set_orm_writer_tp(self, orm_writer_tp):
+        self.orm_writer_tp = orm_writer_tp
+        orm.set_writer_thread_pool(orm_writer_tp)
+
+    def set_kdf_tp(self, kdf_tp):
+        self.kdf_tp = kdf_tp
+        kdf.set_thread_pool(kdf_tp)
+
     def get_agent(self):
         if self.tenant_cache[1].anonymize_outgoing_connections:
             return get_tor_agent(self.settings.socks_host, self.settings.socks_port)
@@ -184,28 +205,37 @@ class StateClass(ObjectDict):
         self.stats_collection_start_time = datetime_now()
 
     def sendmail(self, tid, to_address, subject, body):
-       if self.settings.testing:
-           # during unit testing do not try to send the mail
-           return defer.succeed(True)
-
-       if self.tenant_cache[tid].mode == u'whistleblowing.it':
-           tid = 1
-
-       return sendmail(tid,
-                       self.tenant_cache[tid].notification.smtp_server,
-                       self.tenant_cache[tid].notification.smtp_port,
-                       self.tenant_cache[tid].notification.smtp_security,
-                       self.tenant_cache[tid].notification.smtp_authentication,
-                       self.tenant_cache[tid].notification.smtp_username,
-                       self.tenant_cache[tid].notification.smtp_password,
-                       self.tenant_cache[tid].notification.smtp_source_name,
-                       self.tenant_cache[tid].notification.smtp_source_email,
-                       to_address,
-                       self.tenant_cache[tid].name + ' - ' + subject,
-                       body,
-                       self.tenant_cache[1].anonymize_outgoing_connections,
-                       self.settings.socks_host,
-                       self.settings.socks_port)
+        return self.sendmails(tid, [(to_address, subject, body)]).addCallback(lambda results: results[0])
+
+    def get_mail_tid(self, tid):
+        """
+        Return the id of the tenant whose SMTP configuration is used to send the mails of the tenant tid
+        """
+        return 1 if self.tenant_cache[tid].mode == u'whistleblowing.it' else tid
+
+    def sendmails(self, tid, mails):
+        """
+        Send a list of (to_address, subject, body) mails within a single SMTP session
+        """
+        if self.settings.testing:
+            # during unit testing do not try to send the mail
+            return defer.succeed([True] * len(mails))
+
+        tid = self.get_mail_tid(tid)
+
+        return sendmails(tid,
+                         self.tenant_cache[tid].notification.smtp_server,
+                         self.tenant_cache[tid].notification.smtp_port,
+                         self.tenant_cache[tid].notification.smtp_security,
+                         self.tenant_cache[tid].notification.smtp_authentication,
+                         self.tenant_cache[tid].notification.smtp_username,
+                         self.tenant_cache[tid].notification.smtp_password,
+                         self.tenant_cache[tid].notification.smtp_source_name,
+                         self.tenant_cache[tid].notification.smtp_source_email,
+                         [(to_address, self.tenant_cache[tid].name + ' - ' + subject, body) for to_address, subject, body in mails],
+                         self.tenant_cache[1].anonymize_outgoing_connections,
+                         self.settings.socks_host,
+                         self.settings.socks_port)
 
 
     def schedule_exception_email(self, exception_text, *args):
@@ -244,14 +274,21 @@ class StateClass(ObjectDict):
             # Opportunisticly encrypt the mail body. NOTE that mails will go out
             # unencrypted if one address in the list does not have a public key set.
             if pgp_key_public:
-               pgpctx = PGPContext(self.settings.tmp_path)
-               fingerprint = pgpctx.load_key(pgp_key_public)['fingerprint']
-               mail_body = pgpctx.encrypt_message(fingerprint, mail_body)
+               mail_body = self.pgp_keyring.encrypt_message(pgp_key_public, mail_body)
 
             # avoid waiting for the notification to send and instead rely on threads to handle it
             schedule_email(1, mail_address, mail_subject, mail_body)
 
+    def publish(self, message):
+        if self.bus is not None:
+            self.bus.publish(message)
+
     def refresh_tenant_state(self):
+        if self.process_supervisor is None:
+            # the API workers delegate it to the main process
+            self.publish({'type': 'refresh_tenant_state'})
+            return
+
         # Remove selected onion services and add missing services
         if self.onion_service_job is not None:
             def f(*args):
@@ -259,17 +296,13 @@ class StateClass(ObjectDict):
 
             self.onion_service_job.remove_unwanted_hidden_services().addBoth(f) # pylint: disable=no-member
 
-        self.process_supervisor.shutdown()
-
-        self.process_supervisor.maybe_launch_https_workers()
+        self.process_supervisor.refresh_https_workers()
 
     def format_and_send_mail(self, session, tid, user_desc, template_vars):
         subject, body = Templating().get_mail_subject_and_body(template_vars)
 
         if user_desc.get('pgp_key_public', ''):
-            pgpctx = PGPContext(self.settings.tmp_path)
-            fingerprint = pgpctx.load_key(user_desc['pgp_key_public'])['fingerprint']
-            body = pgpctx.encrypt_message(fingerprint, body)
+            body = self.pgp_keyring.encrypt_message(user_desc['pgp_key_public'], body)
 
         session.add(models.Mail({
             'address': user_desc['mail_address'],
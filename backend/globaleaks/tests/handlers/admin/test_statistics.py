@@ -4,8 +4,9 @@ from twisted.internet.defer import inlineCallbacks
 from globaleaks import anomaly
 from globaleaks.handlers.admin import statistics
 from globaleaks.jobs.anomalies import Anomalies
-from globaleaks.jobs.statistics import Statistics
+from globaleaks.jobs.statistics import Statistics, save_statistics
 from globaleaks.tests import helpers
+from globaleaks.utils.utility import datetime_now
 
 
 class TestStatsCollection(helpers.TestHandler):
@@ -30,6 +31,21 @@ class TestStatsCollection(helpers.TestHandler):
             self.assertEqual(len(response), 3)
             self.assertEqual(len(response['heatmap']), 7 * 24)
 
+    @inlineCallbacks
+    def test_get_merges_the_statistics_of_the_processes(self):
+        now = datetime_now()
+
+        # the statistics of the same hour stored by two API processes
+        yield save_statistics(now, now, {1: {u'submission': 2, u'login': 1}})
+        yield save_statistics(now, now, {1: {u'submission': 3}})
+
+        handler = self.request({}, role='admin')
+        response = yield handler.get(0)
+
+        hour = [x for x in response['heatmap'] if x['valid'] == 0]
+        self.assertEqual(len(hour), 1)
+        self.assertEqual(hour[0]['summary'], {u'submission': 5, u'login': 1})
+
 
 class TestAnomalyCollection(helpers.TestHandler):
     _handler = statistics.AnomalyCollection
@@ -84,3 +100,24 @@ class TestJobsTiming(helpers.TestHandler):
         handler = self.request({}, role='admin')
 
         yield handler.get()
+
+
+class TestMetricsCollection(helpers.TestHandler):
+    _handler = statistics.MetricsCollection
+
+    @inlineCallbacks
+    def test_get(self):
+        handler = self.request({}, role='admin')
+
+        response = yield handler.get()
+
+        for k in ['hits', 'misses', 'checkouts', 'checkout_wait_mean', 'checkout_wait_max', 'pool_size']:
+            self.assertTrue(k in response['orm_pool'])
+
+        self.assertTrue('orm_transactions' in response)
+
+        for k in ['entries', 'size', 'hits', 'misses']:
+            self.assertTrue(k in response['api_cache'])
+
+        for k in ['queue_depth', 'executions', 'rejections', 'wait_mean', 'wait_max', 'latency_mean', 'latency_max']:
+            self.assertTrue(k in response['kdf'])
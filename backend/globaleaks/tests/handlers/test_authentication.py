@@ -2,14 +2,18 @@
 from twisted.internet.address import IPv4Address
 from twisted.internet.defer import inlineCallbacks
 
+from globaleaks import models
+from globaleaks.db import refresh_memory_variables
 from globaleaks.handlers import authentication, admin
 from globaleaks.handlers.user import UserInstance
 from globaleaks.handlers.wbtip import WBTipInstance
+from globaleaks.orm import transact
 from globaleaks.rest import errors
 from globaleaks.sessions import Sessions
 from globaleaks.settings import Settings
 from globaleaks.state import State
 from globaleaks.tests import helpers
+from globaleaks.utils.crypto import GCE
 
 
 class TestAuthentication(helpers.TestHandlerWithPopulatedDB):
@@ -212,6 +216,77 @@ class TestReceiptAuth(helpers.TestHandlerWithPopulatedDB):
         self.assertTrue('session_id' in response)
         self.assertEqual(len(Sessions), 1)
 
+    @transact
+    def set_legacy_receipt_hash(self, session, receipt):
+        wbtip = session.query(models.WhistleblowerTip) \
+                       .filter(models.WhistleblowerTip.receipt_hash == GCE.hash_password(receipt, State.tenant_cache[1].receipt_salt)).one()
+
+        wbtip.hash_alg = u'SCRYPT'
+        wbtip.receipt_hash = GCE.hash_password(receipt, State.tenant_cache[1].receipt_salt, u'SCRYPT')
+
+        return wbtip.id
+
+    @transact
+    def get_receipt_hash_alg(self, session, wbtip_id):
+        return session.query(models.WhistleblowerTip.hash_alg).filter(models.WhistleblowerTip.id == wbtip_id).one()[0]
+
+    @inlineCallbacks
+    def test_whistleblower_login_rehashes_legacy_receipt(self):
+        yield self.perform_full_submission_actions()
+        wbtip_id = yield self.set_legacy_receipt_hash(self.dummySubmission['receipt'])
+        yield refresh_memory_variables([1])
+
+        self.assertTrue(u'SCRYPT' in State.tenant_cache[1].receipt_hash_algs)
+
+        handler = self.request({
+            'receipt': self.dummySubmission['receipt']
+        })
+        handler.request.client_using_tor = True
+        response = yield handler.post()
+        self.assertTrue('session_id' in response)
+
+        hash_alg = yield self.get_receipt_hash_alg(wbtip_id)
+        self.assertEqual(hash_alg, GCE.HASH)
+        self.assertEqual(State.tenant_cache[1].receipt_hash_algs, [GCE.HASH])
+
+    @inlineCallbacks
+    def test_whistleblower_login_with_empty_receipt_hash_algs(self):
+        yield self.perform_full_submission_actions()
+
+        # the cache of a process started before the first submission of the tenant
+        State.tenant_cache[1].receipt_hash_algs = []
+
+        handler = self.request({
+            'receipt': self.dummySubmission['receipt']
+        })
+        handler.request.client_using_tor = True
+        response = yield handler.post()
+        self.assertTrue('session_id' in response)
+
+    @transact
+    def rehash_receipt_and_fail(self, session, wbtip_id, receipt):
+        receipt_salt = State.tenant_cache[1].receipt_salt
+
+        authentication.rehash_receipt.method(session, 1, wbtip_id,
+                                             GCE.hash_password(receipt, receipt_salt, u'SCRYPT'),
+                                             GCE.hash_password(receipt, receipt_salt))
+
+        raise errors.InternalServerError('antani')
+
+    @inlineCallbacks
+    def test_receipt_hash_algs_are_kept_on_rollback(self):
+        yield self.perform_full_submission_actions()
+        wbtip_id = yield self.set_legacy_receipt_hash(self.dummySubmission['receipt'])
+        yield refresh_memory_variables([1])
+
+        yield self.assertFailure(self.rehash_receipt_and_fail(wbtip_id, self.dummySubmission['receipt']),
+                                 errors.InternalServerError)
+
+        self.assertTrue(u'SCRYPT' in State.tenant_cache[1].receipt_hash_algs)
+
+        hash_alg = yield self.get_receipt_hash_alg(wbtip_id)
+        self.assertEqual(hash_alg, u'SCRYPT')
+
     @inlineCallbacks
     def test_accept_whistleblower_login_in_https(self):
         yield self.perform_full_submission_actions()
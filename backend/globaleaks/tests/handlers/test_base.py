@@ -1,15 +1,33 @@
 # -*- coding: utf-8 -*-
+import copy
 import json
+import os
+import re
 
 from six import text_type
+from twisted.internet.defer import inlineCallbacks, returnValue
 
-from globaleaks.handlers.base import BaseHandler
-from globaleaks.rest.errors import InputValidationError
+from globaleaks.handlers.base import BaseHandler, FileProducer, MmapProducer, \
+    get_file_producer, open_upload_chunk, parse_range
+from globaleaks.rest import requests
+from globaleaks.rest.errors import FileTooBig, InputValidationError
+from globaleaks.settings import Settings
 from globaleaks.tests import helpers
+from globaleaks.tests.utils.test_multipart import boundary, get_multipart_body
+from globaleaks.utils.benchmark import get_validation_payloads, interpreted_validate_jmessage
+from globaleaks.utils.multipart import MultipartUpload
+from globaleaks.utils.securetempfile import SecureTemporaryFile
 
 FUTURE = 100
 
 
+def validate(f, jmessage, message_template):
+    try:
+        return f(jmessage, message_template)
+    except InputValidationError as e:
+        return e.reason
+
+
 class BaseHandlerMock(BaseHandler):
     check_roles = 'unauthenticated'
 
@@ -69,4 +87,139 @@ class TestBaseHandler(helpers.TestHandlerWithPopulatedDB):
 
     def test_validate_regexp_valid(self):
         self.assertTrue(BaseHandler.validate_regexp('Foca', '\w+'))
-        self.assertFalse(BaseHandler.validate_regexp('Foca', '\d+'))
\ No newline at end of file
+        self.assertFalse(BaseHandler.validate_regexp('Foca', '\d+'))
+
+    def test_validate_jmessage_compiled(self):
+        # the compiled validators should conform to the interpreted validation
+        field = json.loads(json.dumps(helpers.get_dummy_field()))
+
+        for key, value in [(None, None), ('x', u'antani'), ('type', u'antani'), ('options', [{}]),
+                           ('editable', u'true'), ('width', u'antani')]:
+            jmessage = copy.deepcopy(field)
+            if key is not None:
+                jmessage[key] = value
+
+            self.assertEqual(validate(BaseHandler.validate_jmessage, copy.deepcopy(jmessage), requests.AdminFieldDesc),
+                             validate(interpreted_validate_jmessage, copy.deepcopy(jmessage), requests.AdminFieldDesc))
+
+        # malformed nested objects are rejected instead of raising unexpected exceptions
+        field['options'] = u'antani'
+        self.assertRaises(InputValidationError, BaseHandler.validate_jmessage, field, requests.AdminFieldDesc)
+
+    def test_validate_jmessage_payloads(self):
+        for jmessage, message_template in get_validation_payloads():
+            self.assertTrue(BaseHandler.validate_jmessage(copy.deepcopy(jmessage), message_template))
+            self.assertEqual(validate(BaseHandler.validate_jmessage, copy.deepcopy(jmessage), message_template),
+                             validate(interpreted_validate_jmessage, copy.deepcopy(jmessage), message_template))
+
+    @inlineCallbacks
+    def upload_chunk(self, chunk_number, total_chunks, content, total_size):
+        fields = [(b'flowIdentifier', b'antani'),
+                  (b'flowFilename', b'antani.txt'),
+                  (b'flowChunkNumber', str(chunk_number).encode()),
+                  (b'flowTotalChunks', str(total_chunks).encode()),
+                  (b'flowTotalSize', str(total_size).encode())]
+
+        upload = MultipartUpload(boundary, lambda args: open_upload_chunk(self.state, 1, args), 1024 * 1024)
+        upload.write(get_multipart_body(fields, content))
+
+        handler = self.request()
+        handler.request.content = upload
+        handler.request.args.update(upload.args)
+        yield handler.process_file_upload()
+
+        returnValue(handler)
+
+    @inlineCallbacks
+    def test_process_file_upload(self):
+        handler = yield self.upload_chunk(1, 2, b'antani', 12)
+        self.assertIsNone(handler.uploaded_file)
+
+        handler = yield self.upload_chunk(2, 2, b'antani', 12)
+        self.assertEqual(handler.uploaded_file['name'], u'antani.txt')
+        self.assertEqual(handler.uploaded_file['type'], 'text/plain')
+        self.assertEqual(handler.uploaded_file['size'], 12)
+
+        with handler.uploaded_file['body'].open('r') as f:
+            self.assertEqual(f.read(), b'antaniantani')
+
+    def test_process_file_upload_too_big(self):
+        return self.assertFailure(self.upload_chunk(1, 1, b'antani', 1024 * 1024 * 1024), FileTooBig)
+
+    @inlineCallbacks
+    def test_process_file_upload_incomplete(self):
+        yield self.assertFailure(self.upload_chunk(1, 1, b'antani', 12), InputValidationError)
+        self.assertFalse(b'antani' in self.state.TempUploadFiles)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range(b'bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range(b'bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range(b'bytes=900-2000', 1000), (900, 999))
+        self.assertEqual(parse_range(b'bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range(b'bytes=-2000', 1000), (0, 999))
+
+        # unsatisfiable ranges
+        self.assertEqual(parse_range(b'bytes=1000-', 1000)[0], 1000)
+        self.assertEqual(parse_range(b'bytes=-0', 1000)[0], 1000)
+
+        # ignored ranges
+        for header in [b'items=0-99', b'bytes=0-99,200-299', b'bytes=99-0', b'bytes=a-b', b'bytes=0']:
+            self.assertIsNone(parse_range(header, 1000))
+
+
+class TestFileProducers(helpers.TestGL):
+    @inlineCallbacks
+    def setUp(self):
+        yield helpers.TestGL.setUp(self)
+
+        self.path = os.path.join(Settings.tmp_path, 'antani')
+        self.data = os.urandom(MmapProducer.chunk_size * 2 + 1000)
+
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+    @inlineCallbacks
+    def test_mmap_producer(self):
+        for start, length in [(0, len(self.data)), (1000, MmapProducer.chunk_size + 1)]:
+            request = helpers.forge_request()
+
+            fo = open(self.path, 'rb')
+            fo.seek(start)
+
+            producer = get_file_producer(request, fo, length)
+            self.assertTrue(isinstance(producer, MmapProducer))
+
+            yield producer.start()
+
+            self.assertEqual(request.getResponseBody(), self.data[start:start + length])
+            self.assertEqual(request.finished, 1)
+            self.assertTrue(fo.closed)
+
+    def test_mmap_producer_is_paused(self):
+        request = helpers.forge_request()
+        producer = MmapProducer(request, open(self.path, 'rb'), len(self.data))
+
+        # a transport with a full send buffer pauses the producer at every write
+        write = request.write
+        def paused_write(data):
+            write(data)
+            producer.pauseProducing()
+
+        request.write = paused_write
+
+        producer.start()
+        self.assertEqual(len(request.written), 1)
+
+        producer.resumeProducing()
+        self.assertEqual(len(request.written), 2)
+
+        producer.resumeProducing()
+        producer.resumeProducing()
+        self.assertEqual(request.getResponseBody(), self.data)
+        self.assertEqual(request.finished, 1)
+
+    def test_transformed_streams_are_copied(self):
+        with SecureTemporaryFile(Settings.tmp_path).open('w') as fo:
+            fo.write(self.data)
+
+        self.assertTrue(isinstance(get_file_producer(helpers.forge_request(), fo, len(self.data)), FileProducer))
@@ -1,10 +1,37 @@
 # -*- coding: utf-8 -*-
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import Deferred, inlineCallbacks
 
-from globaleaks.rest.apicache import ApiCache, gzipdata
+from globaleaks.handlers.admin import user
+from globaleaks.rest.apicache import ApiCache, decorator_cache_get, decorator_cache_invalidate, \
+    get_cache_tags, gzipdata
 from globaleaks.tests import helpers
 
 
+class CachedResource(object):
+    check_roles = '*'
+    cache_tags = ['node']
+
+    def __init__(self, request):
+        self.request = request
+        self.calls = 0
+        self.deferred = None
+
+    def get(self):
+        self.calls += 1
+
+        if self.deferred is not None:
+            return self.deferred
+
+        return {'content': 'antani'}
+
+
+def forge_public_request(tid=1):
+    request = helpers.forge_request(uri=b'https://www.globaleaks.org/public')
+    request.tid = tid
+    request.language = 'en'
+    return request
+
+
 class TestApiCache(helpers.TestGL):
     @inlineCallbacks
     def setUp(self):
@@ -26,8 +53,174 @@ class TestApiCache(helpers.TestGL):
         self.assertTrue("it" in ApiCache.memory_cache_dict[1]['passante_di_professione'])
         self.assertTrue("en" in ApiCache.memory_cache_dict[1]['passante_di_professione'])
         self.assertIsNone(ApiCache.get(1, "passante_di_professione", "ca"))
-        self.assertEqual(ApiCache.get(1, "passante_di_professione", "it")[1], gzipdata('ititit'))
-        self.assertEqual(ApiCache.get(1, "passante_di_professione", "en")[1], gzipdata('enenen'))
-        self.assertEqual(ApiCache.get(2, "passante_di_professione", "ca")[1], gzipdata('cacaca'))
+        self.assertEqual(ApiCache.get(1, "passante_di_professione", "it").variants['gzip'], gzipdata('ititit'))
+        self.assertEqual(ApiCache.get(1, "passante_di_professione", "en").variants['gzip'], gzipdata('enenen'))
+        self.assertEqual(ApiCache.get(2, "passante_di_professione", "ca").variants['identity'], b'cacaca')
+        ApiCache.invalidate(1)
+        self.assertEqual(list(ApiCache.memory_cache_dict), [2])
         ApiCache.invalidate()
         self.assertEqual(ApiCache.memory_cache_dict, {})
+        self.assertEqual(ApiCache.size, 0)
+
+    def test_counters(self):
+        self.assertIsNone(ApiCache.get(1, "passante_di_professione", "it"))
+        ApiCache.set(1, "passante_di_professione", "it", 'text/plain', 'ititit')
+        ApiCache.get(1, "passante_di_professione", "it")
+        entry = ApiCache.get(1, "passante_di_professione", "it")
+        self.assertEqual(entry.hits, 2)
+        self.assertEqual(entry.misses, 1)
+
+        stats = ApiCache.get_stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['size'], entry.size)
+
+    def test_misses_are_not_retained(self):
+        ApiCache.get(1, "a", "en")
+        ApiCache.get(2, "b", "en")
+        ApiCache.set(1, "a", "en", 'text/plain', 'a')
+        self.assertEqual(list(ApiCache.misses), [(2, "b", "en")])
+
+        ApiCache.get(1, "c", "en")
+        ApiCache.invalidate(2)
+        self.assertEqual(list(ApiCache.misses), [(1, "c", "en")])
+
+        ApiCache.invalidate()
+        self.assertEqual(ApiCache.misses, {})
+
+    def test_lru_eviction(self):
+        entry = ApiCache.set(1, "a", "en", 'text/plain', 'a' * 1000)
+        self.patch(self.state.settings, 'api_cache_memory_limit', entry.size * 2)
+
+        ApiCache.set(2, "b", "en", 'text/plain', 'b' * 1000)
+        ApiCache.get(1, "a", "en")
+        ApiCache.set(3, "c", "en", 'text/plain', 'c' * 1000)
+
+        # the least recently used entry is evicted across the tenants
+        self.assertIsNotNone(ApiCache.get(1, "a", "en"))
+        self.assertIsNone(ApiCache.get(2, "b", "en"))
+        self.assertIsNotNone(ApiCache.get(3, "c", "en"))
+        self.assertTrue(ApiCache.size <= self.state.settings.api_cache_memory_limit)
+        self.assertFalse(2 in ApiCache.memory_cache_dict)
+
+    @inlineCallbacks
+    def test_decorator_cache_get(self):
+        request = helpers.forge_request(uri=b'https://www.globaleaks.org/public',
+                                        headers={'Accept-Encoding': 'gzip, deflate'})
+        request.language = 'en'
+        handler = CachedResource(request)
+        get = decorator_cache_get(CachedResource.get)
+
+        body = yield get(handler)
+        self.assertEqual(body, gzipdata('{"content": "antani"}'))
+        self.assertEqual(request.responseHeaders.getRawHeaders(b'Content-encoding'), [b'gzip'])
+        self.assertEqual(request.responseHeaders.getRawHeaders(b'Cache-control'), [b'no-cache'])
+        etag = request.responseHeaders.getRawHeaders(b'ETag')[0]
+
+        # a client not accepting compressed content gets the identity variant
+        request = helpers.forge_request(uri=b'https://www.globaleaks.org/public')
+        request.language = 'en'
+        handler.request = request
+        body = yield get(handler)
+        self.assertEqual(body, b'{"content": "antani"}')
+        self.assertIsNone(request.responseHeaders.getRawHeaders(b'Content-encoding'))
+        self.assertNotEqual(request.responseHeaders.getRawHeaders(b'ETag')[0], etag)
+
+        # a client holding the current version gets a 304
+        request = helpers.forge_request(uri=b'https://www.globaleaks.org/public',
+                                        headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        request.language = 'en'
+        handler.request = request
+        body = yield get(handler)
+        self.assertEqual(body, b'')
+        self.assertEqual(request.responseCode, 304)
+
+        self.assertEqual(handler.calls, 1)
+
+    def test_tags_invalidation(self):
+        ApiCache.set(1, "/public", "en", 'text/plain', 'a', get_cache_tags(1, ['node', 'contexts']))
+        ApiCache.set(2, "/public", "en", 'text/plain', 'b', get_cache_tags(2, ['node', 'contexts']))
+        ApiCache.set(3, "/public", "en", 'text/plain', 'c', get_cache_tags(3, ['node', 'contexts']))
+        ApiCache.set(3, "/l10n/en", "en", 'text/plain', 'd', get_cache_tags(3, ['l10n']))
+
+        # the edit of an entity of a tenant does not affect the other tenants
+        ApiCache.invalidate(2, ['contexts'])
+        self.assertIsNotNone(ApiCache.get(1, "/public", "en"))
+        self.assertIsNone(ApiCache.get(2, "/public", "en"))
+        self.assertIsNotNone(ApiCache.get(3, "/public", "en"))
+        self.assertIsNotNone(ApiCache.get(3, "/l10n/en", "en"))
+
+        # the edit of an entity of the root tenant shared with the other
+        # tenants invalidates the resources of all the tenants depending on it
+        ApiCache.invalidate(1, ['node'])
+        self.assertIsNone(ApiCache.get(1, "/public", "en"))
+        self.assertIsNone(ApiCache.get(3, "/public", "en"))
+        self.assertIsNotNone(ApiCache.get(3, "/l10n/en", "en"))
+
+        ApiCache.invalidate(tags=['l10n'])
+        self.assertEqual(ApiCache.memory_cache_dict, {})
+        self.assertEqual(ApiCache.tags, {})
+        self.assertEqual(ApiCache.size, 0)
+
+    @inlineCallbacks
+    def test_decorator_cache_invalidate_all_tenants(self):
+        ApiCache.set(1, "/public", "en", 'text/plain', 'a', get_cache_tags(1, ['contexts', 'receivers']))
+        ApiCache.set(2, "/public", "en", 'text/plain', 'b', get_cache_tags(2, ['contexts', 'receivers']))
+
+        # the users are associated to the tenants by the root tenant
+        handler = user.UserTenantInstance(self.state, forge_public_request())
+        yield decorator_cache_invalidate(lambda self: None)(handler)
+
+        self.assertIsNone(ApiCache.get(1, "/public", "en"))
+        self.assertIsNone(ApiCache.get(2, "/public", "en"))
+
+    @inlineCallbacks
+    def test_decorator_cache_invalidate_after_write(self):
+        write = Deferred()
+
+        handler = user.UserTenantInstance(self.state, forge_public_request(tid=2))
+        d = decorator_cache_invalidate(lambda self: write)(handler)
+
+        # a resource cached while the write is in progress is invalidated at its end
+        ApiCache.set(2, "/public", "en", 'text/plain', 'a', get_cache_tags(2, ['receivers']))
+        self.assertIsNotNone(ApiCache.get(2, "/public", "en"))
+
+        write.callback(None)
+        yield d
+
+        self.assertIsNone(ApiCache.get(2, "/public", "en"))
+
+    @inlineCallbacks
+    def test_decorator_cache_get_single_flight(self):
+        get = decorator_cache_get(CachedResource.get)
+
+        handler1 = CachedResource(forge_public_request())
+        handler1.deferred = Deferred()
+        handler2 = CachedResource(forge_public_request())
+
+        d1 = get(handler1)
+        d2 = get(handler2)
+
+        handler1.deferred.callback({'content': 'antani'})
+
+        self.assertEqual((yield d1), b'{"content": "antani"}')
+        self.assertEqual((yield d2), b'{"content": "antani"}')
+        self.assertEqual(handler1.calls + handler2.calls, 1)
+        self.assertIsNotNone(ApiCache.get(1, b'/public', 'en'))
+        self.assertEqual(ApiCache.pending, {})
+
+    @inlineCallbacks
+    def test_decorator_cache_get_invalidated_while_building(self):
+        get = decorator_cache_get(CachedResource.get)
+
+        handler = CachedResource(forge_public_request())
+        handler.deferred = Deferred()
+
+        d = get(handler)
+
+        ApiCache.invalidate(1, ['node'])
+
+        handler.deferred.callback({'content': 'antani'})
+
+        # the stale resource is served to the request but it is not cached
+        self.assertEqual((yield d), b'{"content": "antani"}')
+        self.assertIsNone(ApiCache.get(1, b'/public', 'en'))
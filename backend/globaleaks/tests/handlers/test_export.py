@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
+import os
+
+from io import BytesIO
+from zipfile import ZipFile
 
 from globaleaks.handlers import export
 from globaleaks.jobs.delivery import Delivery
+from globaleaks.state import State
 from globaleaks.tests import helpers
+from globaleaks.utils.zipstream import ZipStream
+from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks
+from twisted.internet.task import deferLater
+
 
 class TestExportHandler(helpers.TestHandlerWithPopulatedDB):
     complex_field_population = True
@@ -31,3 +40,39 @@ class TestExportHandler(helpers.TestHandlerWithPopulatedDB):
 
         yield handler.get(rtips_desc[0]['id'])
         self.assertNotEqual(handler.request.getResponseBody(), b'')
+
+
+class FakeHandler(object):
+    def __init__(self):
+        self.request = helpers.forge_request()
+
+
+class TestZipStreamProducer(helpers.TestGL):
+    @inlineCallbacks
+    def test_backpressure(self):
+        content = os.urandom(1024 * 1024)
+
+        handler = FakeHandler()
+
+        producer = export.ZipStreamProducer(handler,
+                                            iter(ZipStream([{'name': 'antani.bin', 'fo': BytesIO(content)}])),
+                                            State.export_tp)
+
+        producer.pauseProducing()
+        finished = producer.start()
+
+        # while paused only a bounded number of chunks is prepared
+        while len(producer.chunks) < producer.readahead:
+            yield deferLater(reactor, 0.01, lambda: None)
+
+        yield deferLater(reactor, 0.01, lambda: None)
+        self.assertEqual(len(producer.chunks), producer.readahead)
+        self.assertFalse(producer.pending)
+        self.assertEqual(handler.request.written, [])
+
+        producer.resumeProducing()
+
+        yield finished
+
+        with ZipFile(BytesIO(handler.request.getResponseBody()), 'r') as f:
+            self.assertEqual(f.read('antani.bin'), content)
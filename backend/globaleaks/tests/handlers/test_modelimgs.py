@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from globaleaks.handlers import modelimgs, public
+from globaleaks.handlers.admin import modelimgs as admin_modelimgs
+from globaleaks.rest import errors
+from globaleaks.tests import helpers
+from globaleaks.utils.security import sha256
+from twisted.internet.defer import inlineCallbacks
+
+
+class TestModelImgHandler(helpers.TestHandlerWithPopulatedDB):
+    _handler = modelimgs.ModelImgHandler
+
+    @inlineCallbacks
+    def test_get(self):
+        user_id = self.dummyReceiverUser_1['id']
+        img_hash = sha256(b'antani').decode()
+
+        yield admin_modelimgs.add_model_img(1, 'users', user_id, b'antani')
+
+        # the public resources carry only the address of the picture
+        url = yield admin_modelimgs.get_model_img('users', user_id)
+        self.assertEqual(url, 'users/%s/img/%s' % (user_id, img_hash))
+
+        receivers = yield public.get_public_resources(1, 'en')
+        self.assertIn(url, [r['picture'] for r in receivers['receivers']])
+
+        handler = self.request()
+        data = yield handler.get('users', user_id, img_hash)
+
+        self.assertEqual(data, b'antani')
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Content-Type'), [b'image/png'])
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Cache-control'),
+                         [b'public, max-age=31536000, immutable'])
+
+        # a replaced picture is not addressed anymore by the previous hash
+        yield admin_modelimgs.add_model_img(1, 'users', user_id, b'antani2')
+
+        handler = self.request()
+        yield self.assertFailure(handler.get('users', user_id, img_hash), errors.ModelNotFound)
+
+        handler = self.request()
+        data = yield handler.get('users', user_id, sha256(b'antani2').decode())
+        self.assertEqual(data, b'antani2')
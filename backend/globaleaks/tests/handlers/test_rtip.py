@@ -185,7 +185,8 @@ class TestRTipInstance(helpers.TestHandlerWithPopulatedDB):
 
         self.assertEqual(len(rtip_descs), self.population_of_submissions * self.population_of_recipients - self.population_of_recipients)
 
-        yield self.test_model_count(models.SecureFileDelete, self.population_of_attachments * self.population_of_recipients)
+        # the attachments are encrypted once for all the receivers
+        yield self.test_model_count(models.SecureFileDelete, self.population_of_attachments)
 
 
     @inlineCallbacks
@@ -261,6 +262,40 @@ class TestReceiverFileDownload(helpers.TestHandlerWithPopulatedDB):
                 yield handler.get(rfile_desc['id'])
                 self.assertNotEqual(handler.request.getResponseBody(), '')
 
+    @inlineCallbacks
+    def test_get_range(self):
+        yield self.perform_minimal_submission()
+        yield Delivery().run()
+
+        rtip_descs = yield self.get_rtips()
+        for rtip_desc in rtip_descs:
+            rfiles_desc = yield self.get_rfiles(rtip_desc['id'])
+            for rfile_desc in rfiles_desc:
+                handler = self.request(role='receiver', user_id=rtip_desc['receiver_id'])
+                yield handler.get(rfile_desc['id'])
+                content = handler.request.getResponseBody()
+                etag = handler.request.responseHeaders.getRawHeaders(b'ETag')[0]
+
+                handler = self.request(role='receiver', user_id=rtip_desc['receiver_id'],
+                                       headers={'Range': 'bytes=3-', 'If-Range': etag})
+                yield handler.get(rfile_desc['id'])
+                self.assertEqual(handler.request.responseCode, 206)
+                self.assertEqual(handler.request.getResponseBody(), content[3:])
+                self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Content-Range')[0],
+                                 ('bytes 3-%d/%d' % (len(content) - 1, len(content))).encode())
+
+                # the range of a modified file is ignored
+                handler = self.request(role='receiver', user_id=rtip_desc['receiver_id'],
+                                       headers={'Range': 'bytes=3-', 'If-Range': '"antani"'})
+                yield handler.get(rfile_desc['id'])
+                self.assertNotEqual(handler.request.responseCode, 206)
+                self.assertEqual(handler.request.getResponseBody(), content)
+
+                handler = self.request(role='receiver', user_id=rtip_desc['receiver_id'],
+                                       headers={'Range': 'bytes=%d-' % len(content)})
+                yield handler.get(rfile_desc['id'])
+                self.assertEqual(handler.request.responseCode, 416)
+
 
 class TestIdentityAccessRequestsCollection(helpers.TestHandlerWithPopulatedDB):
     _handler = rtip.IdentityAccessRequestsCollection
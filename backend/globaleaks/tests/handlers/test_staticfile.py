@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
+import gzip
+import io
+import os
+
 from six import text_type
 from twisted.internet.defer import inlineCallbacks
 
-from globaleaks.handlers.staticfile import StaticFileHandler
+from globaleaks.handlers.staticfile import StaticAsset, StaticFileHandler, manifests
 from globaleaks.rest import errors
 from globaleaks.settings import Settings
 from globaleaks.tests import helpers
@@ -10,16 +14,146 @@ from globaleaks.tests import helpers
 FUTURE = 100
 
 
+index = b"""<!doctype html>
+<html>
+  <head>
+    <link rel="stylesheet" href="css/main.css" />
+    <link rel="stylesheet" href="css/unexistent.css" />
+  </head>
+  <body>
+    <script src="js/scripts.js"></script>
+  </body>
+</html>
+"""
+
+bundle = {
+    'index.html': index,
+    'css/main.css': b'body { color: black; }\n' * 100,
+    'js/app.js': b'var antani = 1;\n' * 1000
+}
+
+
 class TestStaticFileHandler(helpers.TestHandler):
     _handler = StaticFileHandler
 
+    @inlineCallbacks
+    def setUp(self):
+        yield helpers.TestHandler.setUp(self)
+
+        self.root = os.path.join(Settings.working_path, 'client')
+
+        for name, data in bundle.items():
+            path = os.path.join(self.root, name)
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            with open(path, 'wb') as f:
+                f.write(data)
+
+        # a file available only as a .gz twin
+        with gzip.open(os.path.join(self.root, 'js/scripts.js.gz'), 'wb') as f:
+            f.write(bundle['js/app.js'])
+
+        self.addCleanup(manifests.clear)
+
     @inlineCallbacks
     def test_get_existent(self):
         handler = self.request(kwargs={'path': Settings.client_path})
-        yield handler.get('')
-        self.assertTrue(text_type(handler.request.getResponseBody(), 'utf-8').startswith('<!doctype html>'))
+        response = yield handler.get('')
+        self.assertTrue(text_type(response, 'utf-8').startswith('<!doctype html>'))
+
+    @inlineCallbacks
+    def test_get_index(self):
+        handler = self.request(kwargs={'path': self.root})
+        response = yield handler.get('')
+
+        # the references to the files of the bundle carry their version
+        for name in ['css/main.css', 'js/scripts.js']:
+            version = handler.manifest.get(name).version
+            self.assertIn(name.encode() + b'?v=' + version + b'"', response)
+
+        self.assertIn(b'href="css/unexistent.css"', response)
+
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Cache-control'), [b'no-cache'])
+        self.assertFalse(handler.request.responseHeaders.hasHeader(b'Pragma'))
+
+    @inlineCallbacks
+    def test_get_versioned(self):
+        handler = self.request(kwargs={'path': self.root})
+        handler.request.args[b'v'] = [handler.manifest.get('css/main.css').version]
+        response = yield handler.get('css/main.css')
+
+        self.assertEqual(response, bundle['css/main.css'])
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Cache-control'),
+                         [b'public, max-age=31536000, immutable'])
+
+        # a reference to a previous version is not stored by the client
+        handler = self.request(kwargs={'path': self.root})
+        handler.request.args[b'v'] = [b'antani']
+        yield handler.get('css/main.css')
+
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Cache-control'), [b'no-cache'])
+
+    @inlineCallbacks
+    def test_get_compressed(self):
+        handler = self.request(kwargs={'path': self.root}, headers={'Accept-Encoding': 'gzip'})
+        response = yield handler.get('css/main.css')
+
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Content-encoding'), [b'gzip'])
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(response)).read(), bundle['css/main.css'])
+
+        # the files available only as a .gz twin are decompressed for the other clients
+        handler = self.request(kwargs={'path': self.root})
+        response = yield handler.get('js/scripts.js')
+
+        self.assertFalse(handler.request.responseHeaders.hasHeader(b'Content-encoding'))
+        self.assertEqual(response, bundle['js/app.js'])
+
+    @inlineCallbacks
+    def test_get_not_modified(self):
+        handler = self.request(kwargs={'path': self.root})
+        yield handler.get('css/main.css')
+        etag = handler.request.responseHeaders.getRawHeaders(b'ETag')[0]
+
+        handler = self.request(kwargs={'path': self.root}, headers={'If-None-Match': etag})
+        response = yield handler.get('css/main.css')
+
+        self.assertEqual(handler.request.responseCode, 304)
+        self.assertEqual(response, b'')
+
+    @inlineCallbacks
+    def test_get_from_disk(self):
+        self.patch(StaticAsset, 'memory_limit', 1024)
+
+        handler = self.request(kwargs={'path': self.root})
+        yield handler.get('js/app.js')
+
+        self.assertIsNone(handler.manifest.get('js/app.js').variants['identity'])
+        self.assertEqual(handler.request.getResponseBody(), bundle['js/app.js'])
+
+    @inlineCallbacks
+    def test_get_bundle_from_disk(self):
+        self.patch(StaticAsset, 'memory_limit', 0)
+
+        for root, _, filenames in os.walk(Settings.client_path):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, Settings.client_path)
+                # the empty files are kept in memory regardless of the limit
+                if name == 'index.html' or name.endswith('.gz') or not os.path.getsize(path):
+                    continue
+
+                with open(path, 'rb') as f:
+                    data = f.read()
+
+                handler = self.request(kwargs={'path': Settings.client_path})
+                yield handler.get(name)
+
+                self.assertEqual(handler.request.getResponseBody(), data)
+                self.assertEqual(handler.request.responseHeaders.getRawHeaders(b'Content-Length'),
+                                 [str(len(data)).encode()])
 
     def test_get_unexistent(self):
-        handler = self.request(kwargs={'path': Settings.client_path})
+        handler = self.request(kwargs={'path': self.root})
 
         return self.assertRaises(errors.ResourceNotFound, handler.get, u'unexistent')
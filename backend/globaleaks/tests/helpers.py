@@ -55,7 +55,7 @@ from globaleaks.rest.apicache import ApiCache
 from globaleaks.sessions import Sessions
 from globaleaks.settings import Settings
 from globaleaks.state import State
-from globaleaks.utils import tempdict, token, utility
+from globaleaks.utils import kdf, tempdict, token, utility
 from globaleaks.utils.crypto import GCE
 from globaleaks.utils.objectdict import ObjectDict
 from globaleaks.utils.securetempfile import SecureTemporaryFile
@@ -163,6 +163,12 @@ def init_state():
         dir_util.remove_tree(Settings.working_path, 0)
 
     orm.set_thread_pool(FakeThreadPool())
+    orm.set_writer_thread_pool(FakeThreadPool())
+    State.delivery_tp = FakeThreadPool()
+    State.export_tp = FakeThreadPool()
+    State.upload_tp = FakeThreadPool()
+    kdf.set_thread_pool(FakeThreadPool())
+    kdf.kdf_stats.reset()
 
     State.settings.enable_api_cache = False
     State.tenant_cache[1] = ObjectDict()
@@ -323,10 +329,10 @@ def forge_request(uri=b'https://www.globaleaks.org/',
 
     def getResponseBody():
         # Ugh, hack. Twisted returns this all as bytes, and we want it as str
-        if isinstance(request.written[0], binary_type):
-            return b''.join(request.written)
-        else:
+        if isinstance(request.written[0], text_type):
             return ''.join(request.written)
+        else:
+            return b''.join(request.written)
 
     request.getResponseBody = getResponseBody
 
@@ -345,6 +351,13 @@ def forge_request(uri=b'https://www.globaleaks.org/',
 
     request.notifyFinish = notifyFinish
 
+    def registerProducer(producer, streaming):
+        # streaming producers write on their own as with a real transport
+        if not streaming:
+            DummyRequest.registerProducer(request, producer, streaming)
+
+    request.registerProducer = registerProducer
+
     request.requestHeaders.setRawHeaders('host', [b'127.0.0.1'])
     request.requestHeaders.setRawHeaders('user-agent', [b'NSA Agent'])
 
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import os
+
+from twisted.internet.defer import inlineCallbacks
+
+from globaleaks import models
+from globaleaks.jobs.delivery import Delivery, process_receiverfile
+from globaleaks.orm import transact
+from globaleaks.settings import Settings
+from globaleaks.tests import helpers
+from globaleaks.utils.pgp import PGPContext
+from globaleaks.utils.securetempfile import SecureTemporaryFile
+
+
+@transact
+def count_new_files(session):
+    return session.query(models.InternalFile).filter(models.InternalFile.new == True).count()
+
+
+class TestDelivery(helpers.TestGLWithPopulatedDB):
+    @inlineCallbacks
+    def setUp(self):
+        yield helpers.TestGLWithPopulatedDB.setUp(self)
+        yield self.perform_full_submission_actions()
+
+    @inlineCallbacks
+    def test_delivery(self):
+        self.assertNotEqual((yield count_new_files()), 0)
+
+        delivery = Delivery()
+        yield delivery.run()
+
+        self.assertEqual((yield count_new_files()), 0)
+        self.assertEqual(delivery.queue_depth, 0)
+        self.assertEqual(delivery.backlog, 0)
+
+    @inlineCallbacks
+    def test_delivery_backpressure(self):
+        self.patch(self.state.settings, 'jobs_operation_limit', 1)
+
+        count = yield count_new_files()
+
+        delivery = Delivery()
+
+        for i in range(1, count + 1):
+            yield delivery.run()
+            self.assertEqual((yield count_new_files()), count - i)
+            self.assertEqual(delivery.backlog, count - i)
+            self.assertEqual(delivery.queue_depth, 0)
+
+
+class TestPGPDelivery(helpers.TestGL):
+    secret_content = b'0123456789' * 1000
+
+    def get_receiverfiles_map(self, keys):
+        sf = SecureTemporaryFile(Settings.tmp_path)
+        with sf.open('w') as f:
+            f.write(self.secret_content)
+            f.finalize_write()
+
+        rfiles = []
+        for i, key in enumerate(keys):
+            rfiles.append({
+                'id': u'rfile%d' % i,
+                'status': u'processing',
+                'filename': os.path.basename(sf.filepath),
+                'size': len(self.secret_content),
+                'receiver': {
+                    'name': u'receiver%d' % i,
+                    'pgp_key_public': helpers.PGPKEYS[key],
+                    'pgp_key_fingerprint': PGPContext().load_key(helpers.PGPKEYS[key])['fingerprint']
+                }
+            })
+
+        return sf, {
+            'tid': 1,
+            'crypto_tip_pub_key': b'',
+            'id': u'ifile',
+            'filename': os.path.basename(sf.filepath),
+            'plaintext_file_needed': False,
+            'rfiles': rfiles
+        }
+
+    def test_encrypt_once_for_all_receivers(self):
+        sf, receiverfiles_map = self.get_receiverfiles_map(['VALID_PGP_KEY1_PUB', 'VALID_PGP_KEY2_PUB'])
+
+        process_receiverfile(self.state, receiverfiles_map, sf)
+
+        rfiles = receiverfiles_map['rfiles']
+        self.assertEqual([rf['status'] for rf in rfiles], [u'encrypted', u'encrypted'])
+        self.assertEqual(rfiles[0]['filename'], rfiles[1]['filename'])
+        self.assertEqual(len(os.listdir(Settings.attachments_path)), 1)
+
+        for key in ['VALID_PGP_KEY1_PRV', 'VALID_PGP_KEY2_PRV']:
+            pgpctx = PGPContext()
+            pgpctx.load_key(helpers.PGPKEYS[key])
+            with open(os.path.join(Settings.attachments_path, rfiles[0]['filename']), 'rb') as f:
+                self.assertEqual(pgpctx.gnupg.decrypt_file(f).data, self.secret_content)
+
+    def test_encrypt_with_one_key_expired(self):
+        sf, receiverfiles_map = self.get_receiverfiles_map(['VALID_PGP_KEY1_PUB', 'EXPIRED_PGP_KEY_PUB'])
+
+        process_receiverfile(self.state, receiverfiles_map, sf)
+
+        rfiles = receiverfiles_map['rfiles']
+        self.assertEqual([rf['status'] for rf in rfiles], [u'encrypted', u'unavailable'])
+        self.assertEqual(os.listdir(Settings.attachments_path), [rfiles[0]['filename']])
@@ -3,8 +3,25 @@ from twisted.internet.defer import inlineCallbacks, succeed
 
 from globaleaks import models
 from globaleaks.jobs.delivery import Delivery
-from globaleaks.jobs.notification import Notification
+from globaleaks.jobs.notification import MailGenerator, Notification, fair_schedule, lease_mails
+from globaleaks.orm import transact
 from globaleaks.tests import helpers
+from globaleaks.utils.utility import datetime_now, datetime_null
+
+
+@transact
+def reschedule_mails(session, date):
+    session.query(models.Mail).update({'next_attempt_at': date})
+
+
+@transact
+def delete_comments(session):
+    session.query(models.Comment).delete(synchronize_session=False)
+
+
+@transact
+def get_mails_attempts(session):
+    return [mail.processing_attempts for mail in session.query(models.Mail)]
 
 
 class TestNotification(helpers.TestGLWithPopulatedDB):
@@ -27,6 +44,8 @@ class TestNotification(helpers.TestGLWithPopulatedDB):
 
     @inlineCallbacks
     def test_notification_failure(self):
+        self.patch(self.state.settings, 'mail_backoff_limit', 0)
+
         yield self.test_model_count(models.Mail, 0)
 
         yield Delivery().run()
@@ -34,11 +53,11 @@ class TestNotification(helpers.TestGLWithPopulatedDB):
         notification = Notification()
         notification.skip_sleep = True
 
-        def sendmail_failure(_):
+        def sendmails_failure(tid, mails):
             # simulate the failure just returning with no action
-            return succeed(None)
+            return succeed([False] * len(mails))
 
-        notification.sendmail = sendmail_failure
+        notification.sendmails = sendmails_failure
 
         for _ in range(10):
             yield notification.run()
@@ -46,4 +65,131 @@ class TestNotification(helpers.TestGLWithPopulatedDB):
 
         yield notification.run()
 
-        yield self.test_model_count(models.Mail, 0)
\ No newline at end of file
+        yield self.test_model_count(models.Mail, 0)
+
+    @inlineCallbacks
+    def test_notification_sessions(self):
+        self.patch(self.state.settings, 'mail_session_limit', 5)
+
+        yield Delivery().run()
+
+        notification = Notification()
+        notification.skip_sleep = True
+
+        sessions = []
+
+        def sendmails(tid, mails):
+            sessions.append(len(mails))
+            return succeed([True] * len(mails))
+
+        notification.sendmails = sendmails
+
+        yield notification.run()
+
+        self.assertEqual(sessions, [5, 5, 5, 5, 4])
+        yield self.test_model_count(models.Mail, 0)
+
+    @inlineCallbacks
+    def test_notification_backoff(self):
+        yield Delivery().run()
+
+        notification = Notification()
+        notification.skip_sleep = True
+
+        attempts = []
+
+        def sendmails_failure(tid, mails):
+            attempts.extend(mail['id'] for mail in mails)
+            return succeed([False] * len(mails))
+
+        notification.sendmails = sendmails_failure
+
+        yield notification.run()
+        self.assertEqual(len(attempts), 24)
+
+        # the mails that failed are not retried before their backoff expires
+        yield notification.run()
+        self.assertEqual(len(attempts), 24)
+        self.assertEqual(notification.backlog, 24)
+
+        yield reschedule_mails(datetime_null())
+
+        yield notification.run()
+        self.assertEqual(len(attempts), 48)
+
+        # only the attempts actually tried are counted
+        self.assertEqual((yield get_mails_attempts()), [2] * 24)
+
+        self.assertEqual(notification.get_backoff(0), notification.interval)
+        self.assertEqual(notification.get_backoff(1), 2 * notification.interval)
+        self.assertEqual(notification.get_backoff(20), self.state.settings.mail_backoff_limit)
+
+    @inlineCallbacks
+    def test_lease_mails(self):
+        yield Delivery().run()
+
+        yield MailGenerator(self.state).generate()
+
+        mails = yield lease_mails(u'owner1', 10, 600, datetime_now())
+        self.assertEqual(len(mails), 10)
+
+        mails = yield lease_mails(u'owner2', 100, 600, datetime_now())
+        self.assertEqual(len(mails), 14)
+
+        # the leased mails are not leased again until the lease expires
+        mails = yield lease_mails(u'owner3', 100, 600, datetime_now())
+        self.assertEqual(len(mails), 0)
+
+        yield reschedule_mails(datetime_null())
+
+        mails = yield lease_mails(u'owner3', 100, 600, datetime_now())
+        self.assertEqual(len(mails), 24)
+
+
+    @inlineCallbacks
+    def test_generate_consumes_the_outbox(self):
+        yield Delivery().run()
+
+        self.assertNotEqual((yield self.get_model_count(models.Outbox)), 0)
+
+        yield MailGenerator(self.state).generate()
+
+        yield self.test_model_count(models.Outbox, 0)
+        yield self.test_model_count(models.Mail, 24)
+
+        # the events already consumed do not generate mails again
+        yield MailGenerator(self.state).generate()
+
+        yield self.test_model_count(models.Mail, 24)
+
+    @inlineCallbacks
+    def test_generate_for_silent_tenant(self):
+        yield Delivery().run()
+
+        self.patch(self.state.tenant_cache[1].notification, 'disable_receiver_notification_emails', True)
+
+        yield MailGenerator(self.state).generate()
+
+        yield self.test_model_count(models.Outbox, 0)
+        yield self.test_model_count(models.Mail, 0)
+
+    @inlineCallbacks
+    def test_generate_for_deleted_objects(self):
+        yield Delivery().run()
+
+        yield delete_comments()
+
+        yield MailGenerator(self.state).generate()
+
+        yield self.test_model_count(models.Outbox, 0)
+        self.assertNotEqual((yield self.get_model_count(models.Mail)), 24)
+
+
+class TestFairSchedule(helpers.TestGL):
+    def test_fair_schedule(self):
+        mails = [{'id': i, 'tid': 1} for i in range(10)] + \
+                [{'id': i, 'tid': 2} for i in range(10, 12)] + \
+                [{'id': i, 'tid': 3} for i in range(12, 13)]
+
+        self.assertEqual([mail['id'] for mail in fair_schedule(mails, 6)], [0, 10, 12, 1, 11, 2])
+        self.assertEqual(len(fair_schedule(mails, 100)), 13)
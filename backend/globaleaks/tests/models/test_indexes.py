@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import re
+
+from globaleaks import models
+from globaleaks.orm import transact_ro
+from globaleaks.tests import helpers
+from globaleaks.utils.utility import datetime_now
+from twisted.internet.defer import inlineCallbacks
+
+
+def hot_queries(session):
+    """
+    Return the queries issued periodically by the jobs, by the statistics
+    handlers and by the logins together with the table they should not scan
+    """
+    now = datetime_now()
+
+    return [
+        ('internalfile', session.query(models.InternalFile).filter(models.InternalFile.new == True)),
+        ('whistleblowerfile', session.query(models.WhistleblowerFile).filter(models.WhistleblowerFile.new == True)),
+        ('internaltip', session.query(models.InternalTip.id).filter(models.InternalTip.expiration_date < now)),
+        ('internaltip', session.query(models.InternalTip.id).filter(models.InternalTip.tid == 1,
+                                                                    models.InternalTip.wb_last_access < now)),
+        ('mail', session.query(models.Mail).filter(models.Mail.creation_date < now).order_by(models.Mail.creation_date)),
+        ('mail', session.query(models.Mail.tid).filter(models.Mail.next_attempt_at <= now).distinct()),
+        ('mail', session.query(models.Mail.id).filter(models.Mail.tid == 1,
+                                                      models.Mail.next_attempt_at <= now)
+                                              .order_by(models.Mail.next_attempt_at,
+                                                        models.Mail.creation_date)),
+        ('receivertip', session.query(models.ReceiverTip).filter(models.ReceiverTip.receiver_id == u'id')),
+        ('stats', session.query(models.Stats).filter(models.Stats.tid == 1,
+                                                     models.Stats.start >= now,
+                                                     models.Stats.start <= now)),
+        ('stats', session.query(models.Stats).filter(models.Stats.start < now)),
+        ('anomalies', session.query(models.Anomalies).filter(models.Anomalies.tid == 1).order_by(models.Anomalies.date.desc())),
+        ('anomalies', session.query(models.Anomalies).filter(models.Anomalies.date < now)),
+        ('whistleblowertip', session.query(models.WhistleblowerTip).filter(models.WhistleblowerTip.receipt_hash.in_([u'hash']),
+                                                                           models.WhistleblowerTip.tid == 1))
+    ]
+
+
+class TestIndexes(helpers.TestGL):
+    initialize_test_database_using_archived_db = False
+
+    @transact_ro
+    def get_query_plans(self, session):
+        ret = []
+
+        cursor = session.connection().connection.cursor()
+
+        for table, query in hot_queries(session):
+            statement = query.statement.compile(dialect=session.bind.dialect)
+            params = [statement.params[k] for k in statement.positiontup]
+            plan = cursor.execute('EXPLAIN QUERY PLAN %s' % statement, params).fetchall()
+            ret.append((table, str(statement), [row[-1] for row in plan]))
+
+        return ret
+
+    @inlineCallbacks
+    def test_hot_queries_do_not_scan_tables(self):
+        for table, statement, plan in (yield self.get_query_plans()):
+            full_scan = re.compile(r'^SCAN (TABLE )?%s( AS \w+)?$' % table)
+            for detail in plan:
+                self.assertFalse(full_scan.match(detail),
+                                 "Full table scan on %s:\n%s\n%s" % (table, statement, '\n'.join(plan)))
+
+            self.assertTrue(any(table in detail and 'INDEX' in detail for detail in plan),
+                            "No index used on %s:\n%s\n%s" % (table, statement, '\n'.join(plan)))
@@ -1,12 +1,42 @@
 # -*- coding: utf-8 -*-
+import re
+
 from twisted.internet.address import IPv4Address
 from twisted.internet.defer import inlineCallbacks
+from twisted.trial import unittest
 
 from globaleaks.db import refresh_memory_variables
 from globaleaks.handlers.admin.node import update_enabled_languages
 from globaleaks.state import State
 from globaleaks.tests.helpers import TestGL, forge_request
 
+uuid = u'a0b1c2d3-e4f5-a6b7-c8d9-e0f1a2b3c4d5'
+token = u'a' * 42
+
+sample_paths = [
+    u'/public', u'/session', u'/token/' + token, u'/submission/' + token + u'/file',
+    u'/rtip/' + uuid, u'/rtip/' + uuid + u'/comments', u'/rtip/' + uuid + u'/export',
+    u'/rtip/rfile/' + uuid, u'/rtip/operations', u'/wbtip', u'/wbtip/messages/' + uuid,
+    u'/wbtip/' + uuid + u'/update', u'/email/validation/antani', u'/reset/password',
+    u'/reset/password/antani', u'/admin/node', u'/admin/users/' + uuid + u'/tenant_associations/2',
+    u'/admin/contexts/' + uuid + u'/img', u'/admin/users/' + uuid + u'/img',
+    u'/admin/questionnaires/duplicate', u'/admin/questionnaires/default', u'/admin/fields/' + uuid,
+    u'/admin/stats/0', u'/admin/activities/details', u'/admin/l10n/en', u'/admin/files',
+    u'/admin/files/logo', u'/admin/files/antani', u'/admin/config/tls/files/csr',
+    u'/admin/tenants/2', u'/admin/submission_statuses/' + uuid + u'/substatuses/' + uuid,
+    u'/admin/config/acme/run', u'/.well-known/acme-challenge/' + u'a' * 43, u'/robots.txt',
+    u'/sitemap.xml', u'/s/antani', u'/u/antani', u'/l10n/it', u'/admin', u'/login', u'/',
+    u'/index.html', u'/js/scripts.min.js', u'/admin/unexisting', u'/rtip/unexisting', u'/%',
+]
+
+
+def linear_match(routes, path):
+    for regexp, handler, args in routes:
+        match = regexp.match(path)
+        if match is not None:
+            return handler, args, match.groups()
+
+
 
 class TestAPI(TestGL):
     @inlineCallbacks
@@ -81,14 +111,25 @@ class TestAPI(TestGL):
 
         server_headers = [
            ('X-Content-Type-Options', 'nosniff'),
-           ('Expires', '-1'),
            ('Server', 'Globaleaks'),
-           ('Pragma', 'no-cache'),
-           ('Cache-control', 'no-cache, no-store, must-revalidate'),
            ('Referrer-Policy', 'no-referrer'),
            ('X-Frame-Options', 'deny')
 	]
 
+        # the files of the client are revalidated instead of being not stored
+        cache_headers = {
+            200: [
+                ('Cache-control', 'no-cache'),
+                ('Pragma', None),
+                ('Expires', None)
+            ],
+            501: [
+                ('Cache-control', 'no-cache, no-store, must-revalidate'),
+                ('Pragma', 'no-cache'),
+                ('Expires', '-1')
+            ]
+        }
+
         for meth, status_code in test_cases:
             request = forge_request(uri=b"https://www.globaleaks.org/", method=meth)
             self.api.render(request)
@@ -97,6 +138,41 @@ class TestAPI(TestGL):
                 returnedHeaderValue = request.responseHeaders.getRawHeaders(headerName)[0]
                 self.assertEqual(returnedHeaderValue, expectedHeaderValue)
 
+            for headerName, expectedHeaderValue in cache_headers[status_code]:
+                returnedHeaderValue = request.responseHeaders.getRawHeaders(headerName)
+                if expectedHeaderValue is None:
+                    self.assertIsNone(returnedHeaderValue)
+                else:
+                    # the value set by the handler follows the one of the API
+                    self.assertEqual(returnedHeaderValue[-1], expectedHeaderValue)
+
+    def test_static_file_headers(self):
+        request = forge_request(uri=b"https://www.globaleaks.org/")
+        self.api.render(request)
+        self.assertEqual(request.responseCode, 200)
+        self.assertEqual(request.responseHeaders.getRawHeaders('Cache-control')[-1], 'no-cache')
+        etag = request.responseHeaders.getRawHeaders('ETag')[0]
+
+        # the references of index.html to the files of the client carry their version
+        references = re.findall(br'(?:src|href)="([^"]+\?v=[^"]+)"', request.getResponseBody())
+        self.assertTrue(references)
+
+        # the files of the client are revalidated by means of their ETag
+        request = forge_request(uri=b"https://www.globaleaks.org/", headers={'If-None-Match': etag})
+        self.api.render(request)
+        self.assertEqual(request.responseCode, 304)
+        self.assertEqual(request.responseHeaders.getRawHeaders('ETag'), [etag])
+
+        # and the requests carrying the current version are stored by the client
+        name, version = references[0].split(b'?v=')
+        request = forge_request(uri=b"https://www.globaleaks.org/" + name)
+        request.args[b'v'] = [version]
+        self.api.render(request)
+        self.assertEqual(request.responseCode, 200)
+        self.assertEqual(request.responseHeaders.getRawHeaders('Cache-control'),
+                         ['public, max-age=31536000, immutable'])
+        self.assertEqual(request.responseHeaders.getRawHeaders('X-Frame-Options'), ['deny'])
+
     def test_request_state(self):
         url = b"https://www.globaleaks.org/"
 
@@ -164,3 +240,32 @@ class TestAPI(TestGL):
         self.assertEqual(request.responseCode, 301)
         location = request.responseHeaders.getRawHeaders(b'location')[0]
         self.assertEqual(b'https://www.globaleaks.org/public', location)
+
+
+class TestAPIRouter(unittest.TestCase):
+    def setUp(self):
+        from globaleaks.rest import api
+        routes = [(spec[0], spec[1], spec[2] if len(spec) > 2 else {}) for spec in api.api_spec]
+        self.routes = [(re.compile('^' + pattern.lstrip('^').rstrip('$') + '$'), handler, args)
+                       for pattern, handler, args in routes]
+        self.router = api.APIRouter(routes)
+
+    def test_match(self):
+        for path in sample_paths:
+            self.assertEqual(self.router.match(path), linear_match(self.routes, path), path)
+
+    def test_candidates(self):
+        # the routes evaluated for a path should not grow with the specification
+        for path in sample_paths:
+            self.assertTrue(len(self.router.get_candidates(path)) <= 16, path)
+
+    def test_match_handlers(self):
+        from globaleaks.handlers import public, rtip, staticfile
+        from globaleaks.handlers.admin import user
+
+        self.assertEqual(self.router.match(u'/public'), (public.PublicResource, {}, ()))
+        self.assertEqual(self.router.match(u'/rtip/' + uuid), (rtip.RTipInstance, {}, (uuid,)))
+        self.assertEqual(self.router.match(u'/admin/users/' + uuid + u'/tenant_associations/2'),
+                         (user.UserTenantInstance, {}, (uuid, u'2')))
+        self.assertEqual(self.router.match(u'/js/scripts.min.js')[0], staticfile.StaticFileHandler)
+        self.assertIsNone(self.router.match(u'/%'))
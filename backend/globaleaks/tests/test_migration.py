@@ -5,6 +5,7 @@ for each version one an empty and a populated db must be sessiond in directories
  - db/empty
  - db/populated
 """
+import base64
 import os
 import shutil
 
@@ -17,6 +18,7 @@ from globaleaks.models import config
 from globaleaks.orm import get_session, make_db_uri, set_db_uri
 from globaleaks.settings import Settings
 from globaleaks.tests import helpers
+from globaleaks.utils.security import sha256
 
 
 class TestMigrationRoutines(unittest.TestCase):
@@ -89,6 +91,21 @@ class TestMigrationRoutines(unittest.TestCase):
         self.assertEqual(saved_key, pk)
         session.close()
 
+    def preconditions_48(self):
+        session = get_session(make_db_uri(self.final_db_file))
+        self.context_id = session.query(models.Context.id).first()[0]
+        session.execute('INSERT INTO contextimg (id, data) VALUES (:id, :data)',
+                        {'id': self.context_id, 'data': base64.b64encode(b'antani').decode()})
+        session.commit()
+        session.close()
+
+    def postconditions_48(self):
+        session = get_session(make_db_uri(self.final_db_file))
+        img = session.query(models.ContextImg).filter(models.ContextImg.id == self.context_id).one()
+        self.assertEqual(img.data, b'antani')
+        self.assertEqual(img.hash, sha256(b'antani').decode())
+        session.close()
+
 
 def test(path, version):
     return lambda self: self._test(path, version)
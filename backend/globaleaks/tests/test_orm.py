@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from globaleaks.models import Tenant
-from globaleaks.orm import get_session, transact
+from globaleaks import orm
+from globaleaks.orm import get_session, transact, transact_ro
 from globaleaks.tests import helpers
+from sqlalchemy.exc import OperationalError
 from twisted.internet.defer import inlineCallbacks
 
 
@@ -14,6 +16,8 @@ class TestORM(helpers.TestGL):
         self.assertEqual(session.execute("PRAGMA foreign_keys").fetchone()[0], 1)  # ON
         self.assertEqual(session.execute("PRAGMA secure_delete").fetchone()[0], 1) # ON
         self.assertEqual(session.execute("PRAGMA auto_vacuum").fetchone()[0], 1)   # FULL
+        self.assertEqual(session.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        self.assertEqual(session.execute("PRAGMA synchronous").fetchone()[0], 1)   # NORMAL
 
     @transact
     def _transact_with_success(self, session):
@@ -24,6 +28,10 @@ class TestORM(helpers.TestGL):
         self.db_add_config(session)
         raise Exception("antani")
 
+    @transact_ro
+    def _transact_ro_with_write(self, session):
+        self.db_add_config(session)
+
     def db_add_config(self, session):
         session.add(Tenant())
 
@@ -56,3 +64,87 @@ class TestORM(helpers.TestGL):
             self.assertTrue(getattr(session, 'query'))
 
         return transaction()
+
+    @inlineCallbacks
+    def test_transact_ro_rejects_writes(self):
+        session = get_session()
+        count1 = session.query(Tenant).count()
+
+        yield self.assertFailure(self._transact_ro_with_write(), RuntimeError)
+
+        count2 = session.query(Tenant).count()
+
+        self.assertEqual(count1, count2)
+
+    @inlineCallbacks
+    def test_transaction_stats(self):
+        orm.transaction_stats.reset()
+
+        @transact_ro
+        def read(session):
+            return session.query(Tenant).count()
+
+        yield read()
+        yield read()
+        yield self._transact_with_success()
+
+        stats = orm.get_transaction_stats()
+        self.assertEqual(stats[read.name], {'reads': 2, 'writes': 0})
+        self.assertEqual(stats[self._transact_with_success.name], {'reads': 0, 'writes': 1})
+
+    @inlineCallbacks
+    def test_pooled_engine(self):
+        self.assertIs(get_session().bind, get_session().bind)
+
+        orm.pool_stats.reset()
+
+        for _ in range(3):
+            yield self._transact_with_success()
+
+        stats = orm.get_pool_stats()
+        self.assertEqual(stats['checkouts'], 3)
+        self.assertEqual(stats['misses'] + stats['hits'], 3)
+        self.assertTrue(stats['hits'] >= 2)
+
+    def test_set_db_uri_disposes_engines(self):
+        engine = get_session().bind
+
+        orm.set_db_uri(orm.get_db_uri())
+
+        self.assertIsNot(get_session().bind, engine)
+
+    @inlineCallbacks
+    def test_transact_retries_while_database_is_locked(self):
+        attempts = []
+
+        @transact
+        def transaction(session):
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OperationalError('', [], Exception('database is locked'))
+
+            return len(attempts)
+
+        orm.lock_stats.reset()
+        self.patch(orm.time, 'sleep', lambda x: None)
+
+        result = yield transaction()
+
+        self.assertEqual(result, 3)
+        self.assertEqual(orm.get_lock_stats()['retries'], 2)
+
+    def test_transact_gives_up_while_database_is_locked(self):
+        @transact
+        def transaction(session):
+            raise OperationalError('', [], Exception('database is locked'))
+
+        orm.lock_stats.reset()
+        self.patch(orm.time, 'sleep', lambda x: None)
+
+        d = self.assertFailure(transaction(), OperationalError)
+
+        def check(_):
+            self.assertEqual(orm.get_lock_stats()['retries'], orm.LOCK_RETRY_ATTEMPTS)
+            self.assertEqual(orm.get_lock_stats()['failures'], 1)
+
+        return d.addCallback(check)
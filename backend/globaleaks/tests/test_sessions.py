@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+
+from twisted.internet.defer import inlineCallbacks
+
+from globaleaks.sessions import SessionsFactory, MemorySessionStore, SQLiteSessionStore
+from globaleaks.settings import Settings
+from globaleaks.tests import helpers
+from globaleaks.utils.crypto import GCE
+
+
+class TestSessions(helpers.TestGL):
+    def get_sessions(self, store=None):
+        sessions = SessionsFactory(timeout=100, store=store)
+        sessions.reactor = self.test_reactor
+        self.addCleanup(sessions.clear)
+        return sessions
+
+    def get_sqlite_store(self, key):
+        store = SQLiteSessionStore(os.path.join(Settings.working_path, 'sessions.db'), key)
+        self.addCleanup(store.close)
+        return store
+
+    @inlineCallbacks
+    def _test_sessions(self, sessions):
+        s1 = sessions.new(1, u'user1', 'receiver', False, b'antani')
+        s2 = sessions.new(1, u'user2', 'receiver', True, '')
+        yield sessions.flush()
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual(s1.getTime(), 100)
+
+        session = sessions.get(s1.id)
+        self.assertEqual((session.tid, session.user_id, session.user_role, session.pcn, session.cc),
+                         (1, u'user1', 'receiver', False, b'antani'))
+
+        # a new session of the same user revokes the previous one
+        s3 = sessions.new(1, u'user1', 'receiver', False, b'antani')
+        self.assertIsNone(sessions.get(s1.id))
+        yield sessions.flush()
+        self.assertEqual(len(sessions), 2)
+
+        old_id = s3.id
+        session = sessions.regenerate(old_id)
+        self.assertNotEqual(session.id, old_id)
+        self.assertIsNone(sessions.get(old_id))
+        self.assertEqual(sessions.get(session.id).user_id, u'user1')
+
+        sessions.delete(session.id)
+        self.assertIsNone(sessions.get(session.id))
+        yield sessions.flush()
+        self.assertEqual(len(sessions), 1)
+
+        # the access to a session postpones its expiration
+        self.test_reactor.advance(60)
+        self.assertIsNotNone(sessions.get(s2.id))
+        self.test_reactor.advance(60)
+        self.assertIsNotNone(sessions.get(s2.id))
+        yield sessions.flush()
+        self.assertEqual(len(sessions), 1)
+
+        self.test_reactor.advance(100)
+        self.assertIsNone(sessions.get(s2.id))
+        yield sessions.flush()
+        self.assertEqual(len(sessions), 0)
+
+        # the timer is not rescheduled when there are no sessions left
+        self.test_reactor.advance(sessions.resolution)
+        self.assertIsNone(sessions.expireCall)
+
+    def test_memory_store(self):
+        return self._test_sessions(self.get_sessions())
+
+    def test_memory_store_revoke_and_expire(self):
+        store = MemorySessionStore(10)
+        sessions = self.get_sessions(store)
+
+        for i in range(100):
+            sessions.new(1, u'user%d' % (i % 10), 'receiver', False, '')
+
+        self.assertEqual(len(sessions), 10)
+        self.assertEqual(len(store.users), 10)
+
+        sessions.revoke(u'user0')
+        self.assertEqual(len(sessions), 9)
+        self.assertFalse(u'user0' in store.users)
+
+        # a single timer expires all the sessions
+        self.assertEqual([c for c in self.test_reactor.getDelayedCalls() if c.func == sessions.expire], [sessions.expireCall])
+
+        self.test_reactor.pump([10] * 11)
+        self.assertEqual(len(sessions), 0)
+        self.assertEqual(store.users, {})
+        self.assertEqual(store.wheel, {})
+        self.assertIsNone(sessions.expireCall)
+
+    def test_sqlite_store(self):
+        return self._test_sessions(self.get_sessions(self.get_sqlite_store(GCE.generate_key())))
+
+    @inlineCallbacks
+    def test_sqlite_store_is_shared(self):
+        key = GCE.generate_key()
+
+        sessions1 = self.get_sessions(self.get_sqlite_store(key))
+        sessions2 = self.get_sessions(self.get_sqlite_store(key))
+
+        session = sessions1.new(1, u'user1', 'receiver', False, b'antani')
+        yield sessions1.flush()
+
+        self.assertEqual(sessions2.get(session.id).cc, b'antani')
+
+        session.cc = b'antani2'
+        sessions1.update(session)
+        yield sessions1.flush()
+        self.assertEqual(sessions2.get(session.id).cc, b'antani2')
+
+        # the private key is not stored in clear
+        db = sqlite3.connect(os.path.join(Settings.working_path, 'sessions.db'))
+        self.assertFalse(b'antani' in bytes(db.execute('SELECT cc FROM session').fetchone()[0]))
+        db.close()
+
+        sessions2.revoke(u'user1')
+        yield sessions2.flush()
+        self.assertIsNone(sessions1.get(session.id))
+
+    @inlineCallbacks
+    def test_sqlite_store_touch_is_throttled(self):
+        store = self.get_sqlite_store(GCE.generate_key())
+        sessions = self.get_sessions(store)
+
+        session = sessions.new(1, u'user1', 'receiver', False, '')
+        yield sessions.flush()
+
+        # the expiration is written again only after a tenth of the lifetime
+        self.test_reactor.advance(5)
+        self.assertEqual(sessions.get(session.id).expiration, 100)
+        self.assertEqual(store.queued, 0)
+
+        self.test_reactor.advance(5)
+        self.assertEqual(sessions.get(session.id).expiration, 110)
+        yield sessions.flush()
+
+        db = sqlite3.connect(os.path.join(Settings.working_path, 'sessions.db'))
+        self.assertEqual(db.execute('SELECT expiration FROM session').fetchone()[0], 110)
+        db.close()
+
+    def test_sqlite_store_changes_are_visible_before_the_commit(self):
+        store = self.get_sqlite_store(GCE.generate_key())
+        sessions = self.get_sessions(store)
+
+        session = sessions.new(1, u'user1', 'receiver', False, b'antani')
+        self.assertEqual(sessions.get(session.id).cc, b'antani')
+
+        sessions.revoke(u'user1')
+        self.assertIsNone(sessions.get(session.id))
+
+        return sessions.flush()
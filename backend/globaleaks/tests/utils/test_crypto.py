@@ -71,3 +71,33 @@ class TestCryptoUtils(helpers.TestGL):
 
         self.assertFalse(filecmp.cmp(a, b, False))
         self.assertTrue(filecmp.cmp(a, c, False))
+
+    def test_seek_encrypted_file(self):
+        prv_key, pub_key = GCE.generate_keypair()
+        data = os.urandom(1000)
+        path = os.path.join(Settings.tmp_path, 'b')
+
+        # the chunks of the same size are indexed without reading all of
+        # them while the chunks of different size require reading their headers
+        for chunk_sizes in [[100] * 10, [100] * 9 + [50, 50], [1, 299, 200, 500]]:
+            with GCE.streaming_encryption_open('ENCRYPT', pub_key, path) as seo:
+                offset = 0
+                for i, chunk_size in enumerate(chunk_sizes):
+                    seo.encrypt_chunk(data[offset:offset + chunk_size], int(i == len(chunk_sizes) - 1))
+                    offset += chunk_size
+
+            for offset in [0, 1, 99, 100, 101, 550, 950, 999]:
+                with GCE.streaming_encryption_open('DECRYPT', prv_key, path) as seo:
+                    self.assertEqual(seo.get_size(), len(data))
+
+                    seo.seek(offset)
+
+                    output = b''
+                    while True:
+                        chunk = seo.read(4096)
+                        if not chunk:
+                            break
+
+                        output += chunk
+
+                    self.assertEqual(output, data[offset:])
@@ -0,0 +1,40 @@
+# -*- coding: utf-8
+from twisted.internet.defer import inlineCallbacks
+
+from globaleaks.rest import errors
+from globaleaks.settings import Settings
+from globaleaks.tests import helpers
+from globaleaks.utils import kdf
+from globaleaks.utils.crypto import GCE
+
+
+class TestKDF(helpers.TestGL):
+    @inlineCallbacks
+    def test_kdf(self):
+        password_hash = yield kdf.hash_password(helpers.VALID_PASSWORD1, helpers.VALID_SALT1)
+        self.assertEqual(password_hash, helpers.VALID_HASH1)
+
+        check = yield kdf.check_password(GCE.HASH, helpers.VALID_PASSWORD1, helpers.VALID_SALT1, helpers.VALID_HASH1)
+        self.assertTrue(check)
+
+        check = yield kdf.check_password(GCE.HASH, helpers.INVALID_PASSWORD, helpers.VALID_SALT1, helpers.VALID_HASH1)
+        self.assertFalse(check)
+
+        key = yield kdf.derive_key(helpers.VALID_PASSWORD1, helpers.VALID_SALT1)
+        self.assertEqual(key, helpers.USER_KEY)
+
+        stats = kdf.get_stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['executions'], 4)
+        self.assertEqual(stats['rejections'], 0)
+        self.assertTrue(stats['latency_max'] > 0)
+
+    @inlineCallbacks
+    def test_kdf_queue_limit(self):
+        self.patch(Settings, 'kdf_queue_limit', 0)
+
+        yield self.assertFailure(kdf.hash_password(helpers.VALID_PASSWORD1, helpers.VALID_SALT1), errors.ServiceOverloaded)
+
+        stats = kdf.get_stats()
+        self.assertEqual(stats['executions'], 0)
+        self.assertEqual(stats['rejections'], 1)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from twisted.internet import defer
+from twisted.test import proto_helpers
+from twisted.trial import unittest
+
+from globaleaks.utils.mail import ESMTPBatchSenderFactory, MIME_mail_build
+
+
+class TestESMTPBatchSender(unittest.TestCase):
+    def get_protocol(self, addresses):
+        messages = [(address, MIME_mail_build(u'from', u'from@example.org', address, address, u'subject', u'body'))
+                    for address in addresses]
+
+        d = defer.Deferred()
+        factory = ESMTPBatchSenderFactory(None, None, 'from@example.org', messages, d,
+                                          requireAuthentication=False,
+                                          requireTransportSecurity=False,
+                                          retries=0)
+
+        transport = proto_helpers.StringTransport()
+        proto = factory.buildProtocol(None)
+        proto.makeConnection(transport)
+
+        return proto, transport, d
+
+    def reply(self, proto, transport, line):
+        transport.clear()
+        proto.dataReceived(line + b'\r\n')
+
+        # pull the message data written by the FileSender producer
+        while transport.producer is not None:
+            transport.producer.resumeProducing()
+
+        return transport.value()
+
+    def test_sendmails_within_one_session(self):
+        proto, transport, d = self.get_protocol([u'a@example.org', u'b@example.org'])
+
+        self.assertTrue(self.reply(proto, transport, b'220 localhost').startswith(b'EHLO'))
+        self.assertTrue(self.reply(proto, transport, b'250 localhost').startswith(b'MAIL FROM'))
+
+        for address, rcpt_reply in [(b'a@example.org', b'250 ok'), (b'b@example.org', b'550 no such user')]:
+            self.assertEqual(self.reply(proto, transport, b'250 ok'), b'RCPT TO:<' + address + b'>\r\n')
+            sent = self.reply(proto, transport, rcpt_reply)
+            if rcpt_reply.startswith(b'250'):
+                self.assertEqual(sent, b'DATA\r\n')
+                self.assertTrue(self.reply(proto, transport, b'354 go ahead').endswith(b'\r\n.\r\n'))
+                self.assertEqual(self.reply(proto, transport, b'250 queued'), b'RSET\r\n')
+                self.assertTrue(self.reply(proto, transport, b'250 ok').startswith(b'MAIL FROM'))
+            else:
+                self.assertEqual(sent, b'RSET\r\n')
+
+        self.assertEqual(self.reply(proto, transport, b'250 ok'), b'QUIT\r\n')
+
+        results = []
+        d.addCallback(results.append)
+        self.assertEqual(results, [[True, False]])
@@ -0,0 +1,139 @@
+# -*- coding: utf-8
+from twisted.test import proto_helpers
+from twisted.web import resource
+
+from globaleaks.rest import errors
+from globaleaks.rest.site import Site
+from globaleaks.settings import Settings
+from globaleaks.state import State
+from globaleaks.tests import helpers
+from globaleaks.utils.multipart import MultipartUpload
+from globaleaks.utils.securetempfile import SecureTemporaryFile
+
+boundary = b'----WebKitFormBoundaryAntani'
+
+
+def get_multipart_body(fields, content):
+    body = b''
+
+    for name, value in fields:
+        body += b'--' + boundary + b'\r\n'
+        body += b'Content-Disposition: form-data; name="' + name + b'"\r\n\r\n'
+        body += value + b'\r\n'
+
+    body += b'--' + boundary + b'\r\n'
+    body += b'Content-Disposition: form-data; name="file"; filename="blob"\r\n'
+    body += b'Content-Type: application/octet-stream\r\n\r\n'
+    body += content + b'\r\n'
+    body += b'--' + boundary + b'--\r\n'
+
+    return body
+
+
+class TestMultipartUpload(helpers.TestGL):
+    fields = [(b'flowIdentifier', b'1234'), (b'flowFilename', b'antani.txt')]
+    content = (b'0123456789\r\n--' * 1000) + b'\r\n-'
+
+    def get_upload(self, limit=1024 * 1024):
+        self.files = []
+
+        def get_file(args):
+            self.assertEqual(args, {b'flowIdentifier': [b'1234'], b'flowFilename': [b'antani.txt']})
+            self.files.append(SecureTemporaryFile(Settings.tmp_path))
+            return self.files[-1].open('w')
+
+        return MultipartUpload(boundary, get_file, limit)
+
+    def read_file(self):
+        self.assertEqual(len(self.files), 1)
+
+        with self.files[0].open('r') as f:
+            return f.read()
+
+    def test_upload(self):
+        body = get_multipart_body(self.fields, self.content)
+
+        for chunk_size in [1, 7, 1024, len(body)]:
+            upload = self.get_upload()
+
+            for i in range(0, len(body), chunk_size):
+                upload.write(body[i:i + chunk_size])
+
+                # the data received is not accumulated in memory
+                self.assertTrue(len(upload.buffer) < len(upload.delimiter) + 1024)
+
+            upload.close()
+
+            self.assertIsNone(upload.error)
+            self.assertTrue(upload.completed)
+            self.assertEqual(upload.args[b'flowFilename'], [b'antani.txt'])
+            self.assertEqual(upload.size, len(self.content))
+            self.assertEqual(self.read_file(), self.content)
+
+    def test_upload_too_big(self):
+        upload = self.get_upload(limit=1000)
+
+        upload.write(get_multipart_body(self.fields, self.content))
+
+        self.assertTrue(isinstance(upload.error, errors.FileTooBig))
+        self.assertFalse(upload.completed)
+        self.assertTrue(self.files[0].size <= 1000)
+
+    def test_malformed_body(self):
+        upload = self.get_upload()
+
+        upload.write(b'--' + boundary + b'antani\r\n')
+
+        self.assertTrue(isinstance(upload.error, errors.InputValidationError))
+        self.assertEqual(self.files, [])
+
+    def test_too_many_fields(self):
+        upload = self.get_upload()
+
+        fields = [(b'antani', b'')] * (MultipartUpload.max_fields + 1)
+        upload.write(get_multipart_body(fields, self.content))
+
+        self.assertTrue(isinstance(upload.error, errors.InputValidationError))
+        self.assertEqual(self.files, [])
+
+    def test_fields_too_big(self):
+        upload = self.get_upload()
+
+        fields = [(b'antani', b'0' * MultipartUpload.max_field_size)] * (MultipartUpload.max_fields // 2)
+        upload.write(get_multipart_body(fields, self.content))
+
+        self.assertTrue(isinstance(upload.error, errors.InputValidationError))
+        self.assertTrue(len(upload.args[b'antani']) < MultipartUpload.max_fields // 2)
+        self.assertEqual(self.files, [])
+
+
+class UploadResource(resource.Resource):
+    isLeaf = True
+    request = upload = None
+
+    def render_POST(self, request):
+        self.request, self.upload = request, request.content
+        return b''
+
+
+class TestMultipartRequest(helpers.TestGL):
+    def test_request(self):
+        res = UploadResource()
+
+        channel = Site(res, timeout=None).buildProtocol(None)
+        channel.makeConnection(proto_helpers.StringTransport())
+
+        body = get_multipart_body([(b'flowIdentifier', b'antani'), (b'flowTotalSize', b'6')], b'antani')
+
+        channel.dataReceived(b'POST /upload?x=1 HTTP/1.1\r\n'
+                             b'Host: www.globaleaks.org\r\n'
+                             b'Content-Type: multipart/form-data; boundary=' + boundary + b'\r\n'
+                             b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+
+        self.assertEqual(res.request.args, {b'x': [b'1'], b'flowIdentifier': [b'antani'], b'flowTotalSize': [b'6']})
+
+        # the chunk is added to its upload flow only by the upload handlers
+        self.assertNotIn(b'antani', State.TempUploadFiles)
+
+        with res.upload.file.open('r') as f:
+            self.assertEqual(f.read(), b'antani')
@@ -2,7 +2,7 @@
 import os
 from datetime import datetime
 
-from globaleaks.utils.pgp import PGPContext
+from globaleaks.utils.pgp import PGPContext, PGPKeyring
 from globaleaks.tests import helpers
 
 
@@ -55,3 +55,61 @@ class TestPGP(helpers.TestGL):
 
         self.assertEqual(pgpctx.load_key(helpers.PGPKEYS['EXPIRED_PGP_KEY_PUB'])['expiration'],
                          datetime.utcfromtimestamp(1391012793))
+
+
+class TestPGPKeyring(helpers.TestGL):
+    secret_content = u'antani'
+
+    def count_imports(self, keyring):
+        keyring.imports = 0
+        import_keys = keyring.pgpctx.gnupg.import_keys
+
+        def counted_import_keys(key):
+            keyring.imports += 1
+            return import_keys(key)
+
+        keyring.pgpctx.gnupg.import_keys = counted_import_keys
+
+    def decrypt(self, key, message):
+        pgpctx = PGPContext()
+        pgpctx.load_key(key)
+        return str(pgpctx.gnupg.decrypt(message))
+
+    def test_encrypt_message(self):
+        keyring = PGPKeyring()
+
+        encrypted_body = keyring.encrypt_message(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'], self.secret_content)
+        self.assertEqual(self.decrypt(helpers.PGPKEYS['VALID_PGP_KEY1_PRV'], encrypted_body), self.secret_content)
+
+        self.count_imports(keyring)
+
+        for _ in range(3):
+            encrypted_body = keyring.encrypt_message(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'], self.secret_content)
+            self.assertEqual(self.decrypt(helpers.PGPKEYS['VALID_PGP_KEY1_PRV'], encrypted_body), self.secret_content)
+
+        self.assertEqual(keyring.imports, 0)
+
+    def test_lru_eviction(self):
+        keyring = PGPKeyring(size=1)
+
+        keyring.encrypt_message(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'], self.secret_content)
+        fingerprint = list(keyring.keys)[0]
+
+        keyring.encrypt_message(helpers.PGPKEYS['VALID_PGP_KEY2_PUB'], self.secret_content)
+        self.assertEqual(len(keyring.keys), 1)
+        self.assertFalse(fingerprint in keyring.keys)
+        self.assertEqual(len(keyring.pgpctx.gnupg.list_keys()), 1)
+
+    def test_invalidate(self):
+        keyring = PGPKeyring()
+
+        keyring.encrypt_message(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'], self.secret_content)
+        fingerprint = list(keyring.keys)[0]
+
+        keyring.invalidate(fingerprint)
+        self.assertEqual(len(keyring.keys), 0)
+        self.assertEqual(keyring.pgpctx.gnupg.list_keys(), [])
+
+        self.count_imports(keyring)
+        keyring.encrypt_message(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'], self.secret_content)
+        self.assertEqual(keyring.imports, 1)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from twisted.trial.unittest import TestCase
+
+from globaleaks.tests.utils import test_tls
+from globaleaks.utils.sni import SNIMap, get_sni_site_cfgs
+from globaleaks.utils.tls import TLSServerContextFactory
+
+
+def make_context_factory():
+    cfg = test_tls.get_valid_setup()
+
+    return TLSServerContextFactory(cfg['key'], cfg['cert'], cfg['chain'], cfg['dh_params'])
+
+
+class TestSNIMap(TestCase):
+    def test_set_and_remove_context(self):
+        snimap = SNIMap({'DEFAULT': make_context_factory()})
+        mapping = snimap.mapping
+
+        factory = make_context_factory()
+        snimap.set_context('antani.gl', factory)
+
+        # the mapping is swapped and not modified in place
+        self.assertNotIn('antani.gl', mapping)
+        self.assertIs(snimap.mapping['antani.gl'], factory)
+
+        snimap.remove_context('antani.gl')
+        self.assertNotIn('antani.gl', snimap.mapping)
+
+        # the DEFAULT context could be replaced but not removed
+        context = snimap.context
+        factory = make_context_factory()
+        snimap.set_context('DEFAULT', factory)
+        self.assertIsNot(snimap.context, context)
+        self.assertIs(snimap.context, factory.getContext())
+
+        snimap.remove_context('DEFAULT')
+        self.assertIs(snimap.mapping['DEFAULT'], factory)
+
+    def test_get_sni_site_cfgs(self):
+        site_cfgs = [{'hostname': 'www.globaleaks.org'}, {'hostname': 'antani.gl'}]
+
+        self.assertEqual(get_sni_site_cfgs(site_cfgs), {
+            'DEFAULT': site_cfgs[0],
+            'antani.gl': site_cfgs[1]
+        })
@@ -8,7 +8,7 @@ from twisted.internet.defer import inlineCallbacks
 from zipfile import ZipFile
 
 from globaleaks.tests import helpers
-from globaleaks.utils.zipstream import ZipStream
+from globaleaks.utils.zipstream import ZipStream, ZIP_DEFLATED, ZIP_STORED
 
 
 class TestZipStream(helpers.TestGL):
@@ -41,3 +41,28 @@ class TestZipStream(helpers.TestGL):
                     self.assertTrue(ff.file_size == len(self.unicode_seq.encode()))
                 else:
                     self.assertTrue(ff.file_size == os.stat(os.path.abspath(__file__)).st_size)
+
+    def test_zipstream_compression(self):
+        content = b'antani' * 10000
+
+        files = [
+          {'name': 'antani.txt', 'fo': BytesIO(content)},
+          {'name': 'antani.jpg', 'fo': BytesIO(content)},
+          {'name': 'antani', 'type': 'video/mp4', 'fo': BytesIO(content)}
+        ]
+
+        output = BytesIO()
+
+        for data in ZipStream(files, 9):
+            output.write(data)
+
+        with ZipFile(output, 'r') as f:
+            self.assertIsNone(f.testzip())
+
+            infolist = f.infolist()
+            self.assertEqual([ff.compress_type for ff in infolist], [ZIP_DEFLATED, ZIP_STORED, ZIP_STORED])
+            self.assertTrue(infolist[0].compress_size < len(content))
+
+            for ff in infolist:
+                self.assertEqual(ff.file_size, len(content))
+                self.assertEqual(f.read(ff), content)
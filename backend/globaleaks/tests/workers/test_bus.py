@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from twisted.internet import reactor, task
+from twisted.internet.defer import inlineCallbacks
+
+from globaleaks.db import refresh_memory_variables, update_receipt_hash_algs
+from globaleaks.handlers.admin import node
+from globaleaks.models.config import ConfigFactory
+from globaleaks.orm import transact
+from globaleaks.rest.apicache import ApiCache, decorator_cache_invalidate
+from globaleaks.state import State
+from globaleaks.tests import helpers
+from globaleaks.workers.bus import handle_message
+
+
+class FakeBus(object):
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, message):
+        self.messages.append(message)
+
+
+@transact
+def set_node_name(session, tid, name):
+    ConfigFactory(session, tid, 'node').set_val(u'name', name)
+
+
+def wait_after_commit():
+    # the messages are published by the reactor after the commit
+    return task.deferLater(reactor, 0, lambda: None)
+
+
+class TestBus(helpers.TestGL):
+    def setUp(self):
+        self.bus = FakeBus()
+        self.addCleanup(setattr, State, 'bus', None)
+
+        return helpers.TestGL.setUp(self)
+
+    @inlineCallbacks
+    def test_refresh_memory_variables_is_published_after_commit(self):
+        yield refresh_memory_variables([1])
+        yield wait_after_commit()
+        self.assertEqual(self.bus.messages, [])
+
+        State.bus = self.bus
+        yield refresh_memory_variables([1])
+        yield wait_after_commit()
+        self.assertEqual(self.bus.messages, [{'type': 'refresh_memory_variables', 'tids': [1]}])
+
+    @inlineCallbacks
+    def test_handle_refresh_memory_variables(self):
+        yield set_node_name(1, u'antani')
+        self.assertNotEqual(State.tenant_cache[1].name, u'antani')
+
+        State.bus = self.bus
+        yield handle_message({'type': 'refresh_memory_variables', 'tids': [1]})
+        yield wait_after_commit()
+
+        self.assertEqual(State.tenant_cache[1].name, u'antani')
+
+        # the changes received are not published again
+        self.assertEqual(self.bus.messages, [])
+
+    def test_handle_invalidate_cache(self):
+        ApiCache.set(1, '/public', 'en', b'application/json', b'{}', [(1, 'node')])
+        ApiCache.set(1, '/api/l10n', 'en', b'application/json', b'{}', [(1, 'l10n')])
+
+        handle_message({'type': 'invalidate_cache', 'tid': 1, 'tags': ['node']})
+
+        self.assertIsNone(ApiCache.get(1, '/public', 'en'))
+        self.assertIsNotNone(ApiCache.get(1, '/api/l10n', 'en'))
+
+    def test_receipt_hash_algs(self):
+        State.bus = self.bus
+        State.tenant_cache[1].receipt_hash_algs = []
+
+        update_receipt_hash_algs(1, u'ARGON2')
+        self.assertEqual(self.bus.messages, [{'type': 'receipt_hash_algs', 'tid': 1, 'added': u'ARGON2', 'removed': None}])
+
+        # the process receiving the change applies it without publishing it again
+        State.tenant_cache[1].receipt_hash_algs = []
+        handle_message(self.bus.messages[0])
+        self.assertEqual(State.tenant_cache[1].receipt_hash_algs, [u'ARGON2'])
+        self.assertEqual(len(self.bus.messages), 1)
+
+        handle_message({'type': 'receipt_hash_algs', 'tid': 1, 'added': None, 'removed': u'ARGON2'})
+        self.assertEqual(State.tenant_cache[1].receipt_hash_algs, [])
+
+    def test_handle_state(self):
+        handle_message({'type': 'accept_submissions', 'value': False})
+        self.assertFalse(State.accept_submissions)
+
+        handle_message({'type': 'accept_submissions', 'value': True})
+        self.assertTrue(State.accept_submissions)
+
+        handle_message({'type': 'tor_exit_set', 'ips': ['1.2.3.4', '5.6.7.8']})
+        self.assertEqual(set(State.tor_exit_set), {'1.2.3.4', '5.6.7.8'})
+
+
+class TestCacheInvalidation(helpers.TestHandlerWithPopulatedDB):
+    _handler = node.NodeInstance
+
+    @inlineCallbacks
+    def test_put_publishes_the_invalidation(self):
+        bus = FakeBus()
+        State.bus = bus
+        self.addCleanup(setattr, State, 'bus', None)
+
+        self.dummyNode['name'] = u'antani'
+
+        handler = self.request(self.dummyNode, role='admin')
+        yield decorator_cache_invalidate(node.NodeInstance.put)(handler)
+        yield wait_after_commit()
+
+        self.assertIn({'type': 'invalidate_cache', 'tid': 1, 'tags': ['node']}, bus.messages)
+        self.assertIn({'type': 'refresh_memory_variables', 'tids': [1]}, bus.messages)
@@ -7,11 +7,14 @@ from six.moves import urllib
 from twisted.internet import threads, reactor
 from twisted.internet.defer import inlineCallbacks
 
+from globaleaks import models
 from globaleaks.handlers.admin.https import load_tls_dict_list
+from globaleaks.handlers.admin.tenant import create as create_tenant
 from globaleaks.models.config import ConfigFactory
 from globaleaks.orm import transact
 from globaleaks.tests import helpers
 from globaleaks.tests.utils import test_tls
+from globaleaks.utils.httpsproxy import HTTPStreamFactory
 from globaleaks.utils.sock import reserve_port_for_ip
 from globaleaks.workers import supervisor
 from globaleaks.workers.worker_https import HTTPSProcess
@@ -21,6 +24,11 @@ from globaleaks.workers.worker_https import HTTPSProcess
 def toggle_https(session, enabled):
     ConfigFactory(session, 1, 'node').set_val(u'https_enabled', enabled)
 
+
+@transact
+def deactivate_tenant(session, tid):
+    session.query(models.Tenant).filter(models.Tenant.id == tid).update({'active': False})
+
 class TestProcessSupervisor(helpers.TestGL):
     @inlineCallbacks
     def setUp(self):
@@ -46,6 +54,89 @@ class TestProcessSupervisor(helpers.TestGL):
         self.assertFalse(p_s.is_running())
 
 
+@transact
+def commit_valid_config_for_tenant(session, tid, hostname):
+    cfg = test_tls.get_valid_setup()
+
+    node = ConfigFactory(session, tid, 'node')
+    node.set_val(u'https_dh_params', cfg['dh_params'])
+    node.set_val(u'https_priv_key', cfg['key'])
+    node.set_val(u'https_cert', cfg['cert'])
+    node.set_val(u'https_chain', cfg['chain'])
+    node.set_val(u'https_enabled', True)
+    node.set_val(u'hostname', hostname)
+
+
+class FakeTransport(object):
+    def signalProcess(self, signal):
+        pass
+
+
+class FakeHTTPSWorker(object):
+    def __init__(self):
+        self.messages = []
+        self.transport = FakeTransport()
+
+    def send(self, message):
+        self.messages.append(message)
+
+
+class TestRefreshHTTPSWorkers(helpers.TestGL):
+    @inlineCallbacks
+    def setUp(self):
+        super(TestRefreshHTTPSWorkers, self).setUp()
+        yield test_tls.commit_valid_config()
+
+        self.p_s = supervisor.ProcessSupervisor([], '127.0.0.1', 43435)
+        self.p_s.tls_cfg['site_cfgs'], _ = yield self.p_s.load_site_cfgs()
+
+        self.worker = FakeHTTPSWorker()
+        self.p_s.tls_process_pool.append(self.worker)
+
+    @inlineCallbacks
+    def test_refresh_https_workers(self):
+        yield self.p_s.refresh_https_workers()
+        self.assertEqual(self.worker.messages, [])
+
+        t = yield create_tenant({'mode': 'default', 'label': 'tenant-2', 'active': True, 'subdomain': 'tenant-2'})
+        yield commit_valid_config_for_tenant(t['id'], u'antani.gl')
+        yield self.p_s.refresh_https_workers()
+
+        self.assertEqual(len(self.worker.messages), 1)
+        self.assertEqual(self.worker.messages[0]['type'], 'set_site_cfg')
+        self.assertEqual(self.worker.messages[0]['name'], u'antani.gl')
+
+        del self.worker.messages[:]
+        yield deactivate_tenant(t['id'])
+        yield self.p_s.refresh_https_workers()
+
+        self.assertEqual(self.worker.messages, [{'type': 'remove_site_cfg', 'name': u'antani.gl'}])
+
+        # the pool is stopped only when https gets disabled
+        self.assertTrue(self.p_s.is_running())
+
+        yield toggle_https(enabled=False)
+        yield self.p_s.refresh_https_workers()
+
+        self.assertFalse(self.p_s.is_running())
+        self.assertEqual(self.p_s.tls_cfg['site_cfgs'], [])
+
+
+class TestHTTPStreamFactory(helpers.TestGL):
+    def test_get_proxy_url(self):
+        main_url, api_url = 'http://127.0.0.1:8082', 'http://127.0.0.1:8084'
+
+        factory = HTTPStreamFactory(main_url)
+        self.assertEqual(factory.get_proxy_url('/public', None), main_url)
+
+        factory = HTTPStreamFactory(main_url, api_url, supervisor.MAIN_PROCESS_PATHS)
+        self.assertEqual(factory.get_proxy_url('/public', None), api_url)
+        self.assertEqual(factory.get_proxy_url('/rtip/x/export', None), api_url)
+        self.assertEqual(factory.get_proxy_url('/token', b'application/json'), main_url)
+        self.assertEqual(factory.get_proxy_url('/submission/x', b'application/json'), main_url)
+        self.assertEqual(factory.get_proxy_url('/wbtip/upload', b'multipart/form-data; boundary=x'), main_url)
+
+
 @transact
 def wrap_db_tx(session, f, *args, **kwargs):
     return f(session, *args, **kwargs)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Baselines and payloads used to measure the optimized code paths
+import collections
+import json
+
+from globaleaks.handlers.base import BaseHandler
+from globaleaks.rest import requests
+from globaleaks.rest.errors import InputValidationError
+
+
+def interpreted_validate_type(value, type):
+    """
+    The validation interpreting the request templates at every
+    request used as a baseline for the compiled validators
+    """
+    if value is None:
+        return False
+    elif callable(type):
+        return BaseHandler.validate_python_type(value, type)
+    elif isinstance(type, collections.Mapping):
+        return interpreted_validate_jmessage(value, type)
+    elif isinstance(type, str):
+        return BaseHandler.validate_regexp(value, type)
+    elif isinstance(type, collections.Iterable):
+        return not value or all(interpreted_validate_type(x, type[0]) for x in value)
+
+    return False
+
+
+def interpreted_validate_jmessage(jmessage, message_template):
+    if isinstance(message_template, dict):
+        for key in [key for key in jmessage if key not in message_template]:
+            del jmessage[key]
+
+        for key, value in jmessage.items():
+            if not interpreted_validate_type(value, message_template[key]):
+                raise InputValidationError("Key (%s) type validation failure" % key)
+
+        for key, value in message_template.items():
+            if key not in jmessage:
+                raise InputValidationError("Missing key %s" % key)
+
+            if not interpreted_validate_type(jmessage[key], value):
+                raise InputValidationError("Key (%s) double validation failure" % key)
+
+            if isinstance(value, (dict, list)) and value:
+                interpreted_validate_jmessage(jmessage[key], value)
+
+        return True
+
+    if not all(interpreted_validate_type(x, message_template[0]) for x in jmessage):
+        raise InputValidationError("Not every element in %s is %s" % (jmessage, message_template[0]))
+
+    return True
+
+
+def get_validation_payloads():
+    """
+    Return a list of (jmessage, message_template) with large requests
+    """
+    options = [{
+        'id': u'beefcafe-beef-cafe-beef-cafebeefcafe',
+        'label': u'option %d' % i,
+        'presentation_order': i,
+        'score_points': 100,
+        'trigger_field': ''
+    } for i in range(200)]
+
+    field = {
+        'id': '',
+        'instance': 'template',
+        'editable': True,
+        'template_id': '',
+        'step_id': '',
+        'fieldgroup_id': '',
+        'label': u'antani',
+        'type': u'multichoice',
+        'preview': False,
+        'description': u'field description',
+        'hint': u'field hint',
+        'multi_entry': False,
+        'multi_entry_hint': '',
+        'encrypt': False,
+        'required': False,
+        'attrs': {},
+        'options': options,
+        'children': [],
+        'y': 1,
+        'x': 1,
+        'width': 0,
+        'triggered_by_score': 0
+    }
+
+    submission = {
+        'context_id': u'beefcafe-beef-cafe-beef-cafebeefcafe',
+        'receivers': [u'feefbead-feef-bead-feef-feeffeefbead'] * 10,
+        'identity_provided': False,
+        'answers': {u'%d' % i: [{'value': u'antani'}] for i in range(100)},
+        'total_score': 0
+    }
+
+    # the payloads are decoded as they would be received by the handlers
+    return [(json.loads(json.dumps(field)), requests.AdminFieldDesc),
+            (json.loads(json.dumps(submission)), requests.SubmissionDesc)]
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import base64
 import binascii
+import bisect
 import os
 import random
 import string
@@ -88,6 +89,14 @@ if V(nacl.__version__) >= V('1.2'):
 
 
     class _StreamingEncryptionObject(object):
+        """
+        Encrypted file made of a header followed by a sequence of chunks,
+        each one made of a flag marking the last chunk, the length of the
+        plaintext and the ciphertext including its MAC
+        """
+        chunk_header_size = 5
+        chunk_overhead = chunk_header_size + 16
+
         def __init__(self, mode, user_key, filepath):
             self.mode = mode
             self.user_key = user_key
@@ -97,6 +106,13 @@ if V(nacl.__version__) >= V('1.2'):
 
             self.index = 0
 
+            # index of the chunks loaded to seek within the file
+            self.chunk_size = None
+            self.chunks_count = 0
+            self.chunks_offsets = None
+            self.size = None
+            self.skip = 0
+
             if self.mode =='ENCRYPT':
                 self.fd = open(filepath, 'wb')
                 self.key = nacl_random(32)
@@ -109,6 +125,7 @@ if V(nacl.__version__) >= V('1.2'):
                 x = self.fd.read(80)
                 self.key = GCE.asymmetric_decrypt(self.user_key, x)
                 self.partial_nonce = self.fd.read(16)
+                self.data_offset = self.fd.tell()
 
             self.box = SecretBox(self.key)
 
@@ -144,9 +161,86 @@ if V(nacl.__version__) >= V('1.2'):
             chunk = self.fd.read(chunkLen + 16)
             return last, self.box.decrypt(chunk, chunkNonce)
 
+        def read_chunk_header(self, position):
+            self.fd.seek(position)
+            return struct.unpack('>BI', self.fd.read(self.chunk_header_size))
+
+        def load_index(self):
+            """
+            Load the index of the chunks reading only their headers
+
+            The files are written with chunks of the same size but the last
+            one, so the position of a chunk is computed from the size of the
+            first; all the headers are read only for the files written in a
+            different way.
+            """
+            if self.size is not None:
+                return
+
+            position = self.fd.tell()
+            file_size = os.fstat(self.fd.fileno()).st_size
+
+            last, length = self.read_chunk_header(self.data_offset)
+            if last:
+                self.chunk_size, self.chunks_count, self.size = length, 1, length
+            elif length:
+                step = length + self.chunk_overhead
+                count = (file_size - self.data_offset - self.chunk_overhead) // step + 1
+                last_position = self.data_offset + (count - 1) * step
+                last, last_length = self.read_chunk_header(last_position)
+                if last and last_position + last_length + self.chunk_overhead == file_size:
+                    self.chunk_size, self.chunks_count = length, count
+                    self.size = (count - 1) * length + last_length
+
+            if self.size is None:
+                self.chunks_offsets, self.chunks_positions = [], []
+                self.size, last, chunk_position = 0, 0, self.data_offset
+                while not last:
+                    last, length = self.read_chunk_header(chunk_position)
+                    self.chunks_offsets.append(self.size)
+                    self.chunks_positions.append(chunk_position)
+                    self.size += length
+                    chunk_position += length + self.chunk_overhead
+
+            self.fd.seek(position)
+
+        def get_size(self):
+            """
+            Return the size of the plaintext
+            """
+            self.load_index()
+            return self.size
+
+        def seek(self, offset):
+            """
+            Move to the plaintext offset decrypting only the chunk including it
+            """
+            self.load_index()
+
+            if self.chunks_offsets is None:
+                index = min(offset // self.chunk_size, self.chunks_count - 1) if self.chunk_size else 0
+                chunk_offset = index * self.chunk_size
+                chunk_position = self.data_offset + index * (self.chunk_size + self.chunk_overhead)
+            else:
+                index = max(bisect.bisect_right(self.chunks_offsets, offset) - 1, 0)
+                chunk_offset = self.chunks_offsets[index]
+                chunk_position = self.chunks_positions[index]
+
+            self.fd.seek(chunk_position)
+            self.index = index
+            self.skip = offset - chunk_offset
+            self.EOF = False
+
         def read(self, a):
             if not self.EOF:
-                return self.decrypt_chunk()[1]
+                data = self.decrypt_chunk()[1]
+                if self.skip:
+                    data, self.skip = data[self.skip:], 0
+
+                return data
+
+        def fileno(self):
+            return self.fd.fileno()
 
         def close(self):
             if self.fd is not None:
@@ -92,7 +92,9 @@ class HTTPStreamProxyRequest(http.Request):
         split = urllib.parse.urlsplit(self.uri.decode('utf-8'))
         self.uri = urllib.parse.urlunsplit(('', '', split[2], split[3], ''))
 
-        joined_url = urllib.parse.urljoin(self.channel.proxy_url.encode('utf-8'), self.uri.encode('utf-8'))
+        proxy_url = self.channel.factory.get_proxy_url(split[2], self.getHeader(b'Content-Type'))
+
+        joined_url = urllib.parse.urljoin(proxy_url.encode('utf-8'), self.uri.encode('utf-8'))
 
         hdrs = self.requestHeaders
         hdrs.setRawHeaders(b'GL-Forwarded-For', [self.getClientIP()])
@@ -154,13 +156,33 @@ class HTTPStreamChannel(http.HTTPChannel):
 
 
 class HTTPStreamFactory(http.HTTPFactory):
-    def __init__(self, proxy_url, *args, **kwargs):
+    """
+    Factory of the channels forwarding the requests to the main process
+    or, if configured, to the API workers
+
+    The requests bound to the state of the main process, i.e. the ones
+    to main_paths and the file uploads, are always forwarded to it while
+    the others are distributed by the kernel among the API workers
+    accepting the connections on their shared socket.
+    """
+    def __init__(self, proxy_url, api_proxy_url=None, main_paths=(), *args, **kwargs):
         http.HTTPFactory.__init__(self, *args, **kwargs)
         self.proxy_url = proxy_url
+        self.api_proxy_url = api_proxy_url
+        self.main_paths = tuple(main_paths)
         self.active_connections = 0
 
+    def get_proxy_url(self, path, content_type):
+        if self.api_proxy_url is None or \
+           path.startswith(self.main_paths) or \
+           (content_type is not None and content_type.lower().startswith(b'multipart/form-data')):
+            return self.proxy_url
+
+        return self.api_proxy_url
+
     def buildProtocol(self, addr):
         proto = HTTPStreamChannel(self.proxy_url)
+        proto.factory = self
         _connectionMade = proto.connectionMade
         _connectionLost = proto.connectionLost
 
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# Thread pool dedicated to the password hashing and key derivation functions
+#
+# Argon2 and scrypt cost hundreds of milliseconds and up to MEMLIMIT bytes of
+# memory for each call; they are run outside of the ORM transactions on
+# their own bounded pool so that a burst of logins can not hold the database
+# sessions and the ORM threads needed by the rest of the application.
+import threading
+import time
+
+from twisted.internet import defer, reactor
+from twisted.internet.threads import deferToThreadPool
+
+from globaleaks.rest import errors
+from globaleaks.settings import Settings
+from globaleaks.utils.crypto import GCE
+
+__THREAD_POOL = None
+
+
+class KDFStats(object):
+    """
+    Counters describing the usage of the KDF pool
+
+    The wait is the time spent by a request in the queue and the latency
+    the time spent computing the function.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.queue_depth = 0
+            self.executions = 0
+            self.rejections = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.latency_total = 0.0
+            self.latency_max = 0.0
+
+    def record_execution(self, wait, latency):
+        with self.lock:
+            self.executions += 1
+            self.wait_total += wait
+            self.latency_total += latency
+            if wait > self.wait_max:
+                self.wait_max = wait
+            if latency > self.latency_max:
+                self.latency_max = latency
+
+    def record_rejection(self):
+        with self.lock:
+            self.rejections += 1
+
+    def dict(self):
+        with self.lock:
+            return {
+                'queue_depth': self.queue_depth,
+                'executions': self.executions,
+                'rejections': self.rejections,
+                'wait_mean': self.wait_total / self.executions if self.executions else 0.0,
+                'wait_max': self.wait_max,
+                'latency_mean': self.latency_total / self.executions if self.executions else 0.0,
+                'latency_max': self.latency_max
+            }
+
+
+kdf_stats = KDFStats()
+
+
+def set_thread_pool(thread_pool):
+    global __THREAD_POOL
+    __THREAD_POOL = thread_pool
+
+
+def get_thread_pool():
+    global __THREAD_POOL
+    return __THREAD_POOL
+
+
+def get_stats():
+    return kdf_stats.dict()
+
+
+def run(function, *args):
+    """
+    Run a KDF function on the KDF pool
+
+    The requests exceeding Settings.kdf_queue_limit are refused
+    without being queued.
+    """
+    if kdf_stats.queue_depth >= Settings.kdf_queue_limit:
+        kdf_stats.record_rejection()
+        return defer.fail(errors.ServiceOverloaded())
+
+    kdf_stats.queue_depth += 1
+    queued = time.time()
+
+    def execute():
+        start = time.time()
+        try:
+            return function(*args)
+        finally:
+            kdf_stats.record_execution(start - queued, time.time() - start)
+
+    def release(result):
+        kdf_stats.queue_depth -= 1
+        return result
+
+    return deferToThreadPool(reactor, get_thread_pool(), execute).addBoth(release)
+
+
+def hash_password(password, salt, algorithm=None):
+    return run(GCE.hash_password, password, salt, algorithm)
+
+
+def check_password(algorithm, password, salt, hash):
+    return run(GCE.check_password, algorithm, password, salt, hash)
+
+
+def derive_key(password, salt):
+    return run(GCE.derive_key, password, salt)
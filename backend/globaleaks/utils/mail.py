@@ -11,7 +11,7 @@ from email.mime.text import MIMEText
 
 from twisted.internet import reactor, defer
 from twisted.internet.endpoints import TCP4ClientEndpoint
-from twisted.mail.smtp import ESMTPSenderFactory
+from twisted.mail.smtp import ESMTPSender, ESMTPSenderFactory, SMTPClient, SUCCESS
 from twisted.protocols import tls
 
 from globaleaks.utils.socks import SOCKS5ClientEndpoint
@@ -51,29 +51,81 @@ def MIME_mail_build(src_name, src_mail, dest_name, dest_mail, title, mail_body):
     return BytesIO(multipart_as_bytes) # pylint: disable=no-member
 
 
-def sendmail(tid, smtp_host, smtp_port, security, authentication, username, password, from_name, from_address, to_address, subject, body, anonymize=True, socks_host='127.0.0.1', socks_port=9050):
+class ESMTPBatchSender(ESMTPSender):
     """
-    Send an email using SMTPS/SMTP+TLS and maybe torify the connection.
+    ESMTP client delivering all the messages of its factory within a
+    single SMTP session, issuing a RSET between each message.
+    """
+    current = None
 
-    @param to_address: the 'To:' field of the email
-    @param subject: the mail subject
-    @param body: the mail body
+    def getMailFrom(self):
+        if self.factory.messages:
+            self.current = self.factory.messages.pop(0)
+            return str(self.factory.fromEmail)
 
-    @return: a {Deferred} that returns a success {bool} if the message was passed
-             to the server.
+        self.factory.sendFinished = True
+        self.factory.result.callback(self.factory.results)
+
+    def getMailTo(self):
+        return [self.current[1]]
+
+    def getMailData(self):
+        return self.current[2]
+
+    def sendError(self, exc):
+        SMTPClient.sendError(self, exc)
+
+        if not self.factory.sendFinished:
+            self.factory.sendFinished = True
+            self.factory.result.errback(exc)
+
+    def sentMail(self, code, resp, numOk, addresses, _):
+        if code not in SUCCESS:
+            log.err("SMTP server refused the mail (Response: %d %s)", code, resp)
+
+        self.factory.results[self.current[0]] = code in SUCCESS
+
+
+class ESMTPBatchSenderFactory(ESMTPSenderFactory):
+    protocol = ESMTPBatchSender
+
+    def __init__(self, username, password, fromEmail, messages, deferred, **kwargs):
+        """
+        @param messages: a list of (to_address, file) tuples
+        """
+        ESMTPSenderFactory.__init__(self, username, password, fromEmail,
+                                    [to_address for to_address, _ in messages], None,
+                                    deferred, **kwargs)
+
+        self.messages = [(i, to_address.encode('ascii') if isinstance(to_address, six.text_type) else to_address, message)
+                         for i, (to_address, message) in enumerate(messages)]
+        self.results = [False] * len(messages)
+
+
+def sendmails(tid, smtp_host, smtp_port, security, authentication, username, password, from_name, from_address, mails, anonymize=True, socks_host='127.0.0.1', socks_port=9050):
+    """
+    Send a batch of emails reusing a single SMTPS/SMTP+TLS connection and
+    maybe torify it.
+
+    @param mails: a list of (to_address, subject, body) tuples
+
+    @return: a {Deferred} that returns a list of success {bool}, one for each
+             mail, reporting if the message was passed to the server.
     """
     try:
         timeout = 30
 
-        message = MIME_mail_build(from_name,
-                                  from_address,
-                                  to_address,
-                                  to_address,
-                                  subject,
-                                  body)
-
-        log.debug('Sending email to %s using SMTP server [%s:%d] [%s]',
-                  to_address,
+        messages = []
+        for to_address, subject, body in mails:
+            messages.append((to_address, MIME_mail_build(from_name,
+                                                         from_address,
+                                                         to_address,
+                                                         to_address,
+                                                         subject,
+                                                         body)))
+
+        log.debug('Sending %d emails using SMTP server [%s:%d] [%s]',
+                  len(messages),
                   smtp_host,
                   smtp_port,
                   security,
@@ -83,12 +135,11 @@ def sendmail(tid, smtp_host, smtp_port, security, authentication, username, pass
 
         smtp_deferred = defer.Deferred()
 
-        factory = ESMTPSenderFactory(
+        factory = ESMTPBatchSenderFactory(
             username.encode('utf-8') if authentication else None,
             password.encode('utf-8') if authentication else None,
             from_address,
-            to_address,
-            message,
+            messages,
             smtp_deferred,
             contextFactory=context_factory,
             requireAuthentication=authentication,
@@ -96,6 +147,8 @@ def sendmail(tid, smtp_host, smtp_port, security, authentication, username, pass
             retries=0,
             timeout=timeout)
 
+        results = factory.results
+
         if security == "SSL":
             factory = tls.TLSMemoryBIOFactory(context_factory, True, factory)
 
@@ -115,17 +168,34 @@ def sendmail(tid, smtp_host, smtp_port, security, authentication, username, pass
             """
             log.err("SMTP connection failed (Exception: %s)", failure.value.subFailure.value, tid=tid)
             log.debug(failure)
-            return False
 
-        def success_cb(results):
-            """
-            @param results {list of (success, return_val) tuples}
-            """
-            return True
+            # the messages sent before the failure have been delivered
+            return results
+
+        def success_cb(_):
+            return results
 
         return final.addCallbacks(success_cb, failure_cb)
 
     except Exception as excep:
         # avoids raising an exception inside email logic to avoid chained errors
         log.err("Unexpected exception in sendmail: %s", str(excep), tid=tid)
-        return defer.succeed(False)
+        return defer.succeed([False] * len(mails))
+
+
+def sendmail(tid, smtp_host, smtp_port, security, authentication, username, password, from_name, from_address, to_address, subject, body, anonymize=True, socks_host='127.0.0.1', socks_port=9050):
+    """
+    Send an email using SMTPS/SMTP+TLS and maybe torify the connection.
+
+    @param to_address: the 'To:' field of the email
+    @param subject: the mail subject
+    @param body: the mail body
+
+    @return: a {Deferred} that returns a success {bool} if the message was passed
+             to the server.
+    """
+    d = sendmails(tid, smtp_host, smtp_port, security, authentication, username, password,
+                  from_name, from_address, [(to_address, subject, body)],
+                  anonymize, socks_host, socks_port)
+
+    return d.addCallback(lambda results: results[0])
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+import cgi
+
+from globaleaks.rest import errors
+
+
+class MultipartUpload(object):
+    """
+    Incremental parser of a multipart/form-data request body
+
+    The parser is used as the content of the requests carrying the file
+    uploads: the form fields are collected in args while the content of the
+    part named 'file' is written to the file returned by get_file as soon as
+    it is received, so that the memory used does not depend on the upload size.
+    """
+    max_headers_size = 16 * 1024
+    max_field_size = 64 * 1024
+    max_fields = 32
+    max_fields_size = 256 * 1024
+
+    def __init__(self, boundary, get_file, limit):
+        """
+        @param boundary: the boundary of the multipart body
+        @param get_file: a function returning the file opened for writing the
+                         upload given the form fields preceding it
+        @param limit: the maximum size in bytes of the upload
+        """
+        self.delimiter = b'\r\n--' + boundary
+        self.get_file = get_file
+        self.limit = limit
+
+        # the first delimiter of the body is not preceded by a line break
+        self.buffer = b'\r\n'
+        self.state = 'preamble'
+
+        self.args = {}
+        self.name = None
+        self.value = []
+        self.value_size = 0
+        self.fields = 0
+        self.fields_size = 0
+
+        self.file = None
+        self.size = 0
+        self.completed = False
+        self.error = None
+
+    def write(self, data):
+        if self.error is not None:
+            return
+
+        self.buffer += data
+
+        try:
+            while self.buffer and self.parse():
+                pass
+        except errors.GLException as e:
+            self.fail(e)
+        except Exception:
+            self.fail(errors.InputValidationError("Malformed multipart body"))
+
+    def parse(self):
+        """
+        Consume the buffer and return True if the parsing could proceed
+        """
+        if self.state in ('preamble', 'body'):
+            i = self.buffer.find(self.delimiter)
+            if i == -1:
+                # the tail of the buffer could be the beginning of a delimiter
+                i = len(self.buffer) - len(self.delimiter) + 1
+                if i > 0:
+                    self.feed(self.buffer[:i])
+                    self.buffer = self.buffer[i:]
+
+                return False
+
+            self.feed(self.buffer[:i])
+            self.buffer = self.buffer[i + len(self.delimiter):]
+            self.end_part()
+            self.state = 'delimiter'
+
+        elif self.state == 'delimiter':
+            if len(self.buffer) < 2:
+                return False
+
+            if self.buffer.startswith(b'--'):
+                self.state = 'epilogue'
+                self.completed = True
+            elif self.buffer.startswith(b'\r\n'):
+                self.state = 'headers'
+            else:
+                raise ValueError
+
+            self.buffer = self.buffer[2:]
+
+        elif self.state == 'headers':
+            if self.buffer.startswith(b'\r\n'):
+                i, headers = 2, b''
+            else:
+                i = self.buffer.find(b'\r\n\r\n')
+                if i == -1:
+                    if len(self.buffer) > self.max_headers_size:
+                        raise ValueError
+
+                    return False
+
+                i, headers = i + 4, self.buffer[:i]
+
+            self.buffer = self.buffer[i:]
+            self.start_part(headers)
+            self.state = 'body'
+
+        else:
+            self.buffer = b''
+
+        return True
+
+    def start_part(self, headers):
+        params = {}
+
+        for line in headers.decode('utf-8').split(u'\r\n'):
+            key, _, value = line.partition(u':')
+            if key.strip().lower() == u'content-disposition':
+                _, params = cgi.parse_header(value.strip())
+
+        self.name = params.get('name', u'').encode('utf-8')
+
+        if self.name == b'file':
+            if self.file is not None:
+                raise ValueError
+
+            self.file = self.get_file(self.args)
+
+    def feed(self, data):
+        if self.state == 'preamble' or not data:
+            return
+
+        if self.name == b'file':
+            self.size += len(data)
+            if self.size > self.limit:
+                raise errors.FileTooBig(self.limit // (1024 * 1024))
+
+            self.file.write(data)
+        else:
+            self.value_size += len(data)
+            if self.value_size > self.max_field_size:
+                raise ValueError
+
+            self.fields_size += len(data)
+            if self.fields_size > self.max_fields_size:
+                raise errors.InputValidationError("Form fields too big")
+
+            self.value.append(data)
+
+    def end_part(self):
+        if self.state == 'preamble':
+            return
+
+        if self.name == b'file':
+            self.file.close()
+        else:
+            self.fields += 1
+            if self.fields > self.max_fields:
+                raise errors.InputValidationError("Too many form fields")
+
+            self.args.setdefault(self.name, []).append(b''.join(self.value))
+
+        self.name = None
+        self.value = []
+        self.value_size = 0
+
+    def fail(self, error):
+        self.error = error
+        self.buffer = b''
+        self.value = []
+        self.close()
+
+    def seek(self, offset, whence=0):
+        pass
+
+    def read(self, size=-1):
+        return b''
+
+    def readline(self, size=-1):
+        return b''
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import os
 import shutil
 import tempfile
+import threading
 
+from collections import OrderedDict
 from datetime import datetime
 
 from gnupg import GPG
+from six import text_type
 
 from globaleaks.rest import errors
 from globaleaks.utils.log import log
@@ -78,8 +82,16 @@ class PGPContext(object):
     def encrypt_file(self, key_fingerprint, input_file, output_path):
         """
         Encrypt a file with the specified PGP key
+
+        When a list of fingerprints is provided a single message readable
+        with any of the corresponding keys is produced.
         """
-        encrypted_obj = self.gnupg.encrypt_file(input_file, str(key_fingerprint), output=output_path)
+        if isinstance(key_fingerprint, (list, tuple)):
+            recipients = [str(x) for x in key_fingerprint]
+        else:
+            recipients = str(key_fingerprint)
+
+        encrypted_obj = self.gnupg.encrypt_file(input_file, recipients, output=output_path)
 
         if not encrypted_obj.ok:
             raise errors.InputValidationError
@@ -102,3 +114,82 @@ class PGPContext(object):
             shutil.rmtree(self.gnupg.gnupghome)
         except Exception as excep:
             log.err("Unable to clean temporary PGP environment: %s: %s", self.gnupg.gnupghome, excep)
+
+
+class PGPKeyring(object):
+    """
+    A long lived keyring caching the keys used to encrypt the mails.
+
+    Keys are imported once in a keyring kept for the whole life of the
+    process and are indexed by fingerprint; the least recently used keys
+    are removed when the keyring exceeds its size.
+    """
+    def __init__(self, tempdirprefix=None, size=256):
+        self.tempdirprefix = tempdirprefix
+        self.size = size
+        self.lock = threading.Lock()
+        self.pgpctx = None
+
+        # fingerprint -> digest of the imported key, in LRU order
+        self.keys = OrderedDict()
+
+        # digest of the imported key -> fingerprint
+        self.fingerprints = {}
+
+    @staticmethod
+    def digest(key):
+        if isinstance(key, text_type):
+            key = key.encode('utf-8')
+
+        return hashlib.sha256(key).hexdigest()
+
+    def _remove(self, fingerprint):
+        digest = self.keys.pop(fingerprint)
+        del self.fingerprints[digest]
+        self.pgpctx.gnupg.delete_keys(fingerprint)
+
+    def _import(self, key):
+        if self.pgpctx is None:
+            self.pgpctx = PGPContext(self.tempdirprefix)
+
+        digest = self.digest(key)
+
+        fingerprint = self.fingerprints.get(digest)
+        if fingerprint is not None:
+            self.keys[fingerprint] = self.keys.pop(fingerprint)
+            return fingerprint
+
+        import_result = self.pgpctx.gnupg.import_keys(key)
+        if not import_result.fingerprints:
+            raise errors.InputValidationError
+
+        fingerprint = import_result.fingerprints[0]
+
+        if fingerprint in self.keys:
+            # the key has been updated; replace the outdated copy
+            self._remove(fingerprint)
+            self.pgpctx.gnupg.import_keys(key)
+
+        self.keys[fingerprint] = digest
+        self.fingerprints[digest] = fingerprint
+
+        while len(self.keys) > self.size:
+            self._remove(next(iter(self.keys)))
+
+        return fingerprint
+
+    def invalidate(self, fingerprint):
+        """
+        Remove the key with the specified fingerprint from the keyring
+        """
+        with self.lock:
+            if fingerprint in self.keys:
+                self._remove(fingerprint)
+
+    def encrypt_message(self, key, plaintext):
+        """
+        Encrypt a text message with the specified key
+        """
+        with self.lock:
+            fingerprint = self._import(key)
+            return self.pgpctx.encrypt_message(fingerprint, plaintext)
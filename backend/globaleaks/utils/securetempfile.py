@@ -13,6 +13,7 @@ crypto_backend = default_backend()
 
 class SecureTemporaryFile(object):
     file = None
+    fd = None
 
     def __init__(self, filesdir):
         """
@@ -25,6 +26,7 @@ class SecureTemporaryFile(object):
         self.filepath = os.path.join(filesdir, "%s.aes" % self.key_id)
         self.enc = self.cipher.encryptor()
         self.dec = None
+        self.size = 0
 
     def open(self, mode):
         if self.file is None:
@@ -40,6 +42,7 @@ class SecureTemporaryFile(object):
         if isinstance(data, text_type):
             data = data.encode('utf-8')
 
+        self.size += len(data)
         self.fd.write(self.enc.update(data))
 
     def finalize_write(self):
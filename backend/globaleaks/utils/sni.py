@@ -126,11 +126,42 @@ class SNIMap(object):
             self.selectContext
         )
 
+    def set_context(self, name, factory):
+        """
+        Add or replace the context served for a hostname
+
+        The mapping is replaced as a whole so that the handshakes always see
+        a consistent map; the connections already established keep the
+        context they negotiated until they are closed.
+        """
+        mapping = dict(self.mapping)
+        mapping[name] = factory
+
+        if name == 'DEFAULT':
+            context = factory.getContext()
+            context.set_tlsext_servername_callback(self.selectContext)
+            self._negotiationDataForContext.pop(self.context, None)
+            self.context = context
+
+        self.mapping = mapping
+
+    def remove_context(self, name):
+        """
+        Stop serving a hostname that will be answered with the DEFAULT context
+        """
+        if name == 'DEFAULT' or name not in self.mapping:
+            return
+
+        mapping = dict(self.mapping)
+        del mapping[name]
+        self.mapping = mapping
+
     def selectContext(self, connection):
         common_name = connection.get_servername().decode('utf-8')
 
-        if common_name in self.mapping:
-            newContext = self.mapping[common_name].getContext()
+        factory = self.mapping.get(common_name)
+        if factory is not None:
+            newContext = factory.getContext()
 
             negotiationData = self._negotiationDataForContext[connection.get_context()]
             negotiationData.negotiateNPN(newContext)
@@ -153,3 +184,16 @@ class SNIMap(object):
 
     def _alpnProtocolsForContext(self, context, protocols):
         self._negotiationDataForContext[context].alpnProtocols = protocols
+
+
+def get_sni_site_cfgs(site_cfgs):
+    """
+    Return the site configurations keyed by the name of the entry of the
+    SNI map serving them; the first configuration is the DEFAULT one.
+    """
+    sni_site_cfgs = {}
+
+    for i, site_cfg in enumerate(site_cfgs):
+        sni_site_cfgs['DEFAULT' if i == 0 else site_cfg['hostname']] = site_cfg
+
+    return sni_site_cfgs
@@ -7,6 +7,7 @@
 # that is initially derived from zipfile.py and then changed heavily for
 # our purpose (that's the reason why is not in third party)
 import binascii
+import mimetypes
 import os
 import struct
 import time
@@ -17,8 +18,34 @@ from six import text_type
 __all__ = ["ZipStream"]
 
 ZIP64_LIMIT= (1 << 31) - 1
+ZIP_STORED = 0
 ZIP_DEFLATED = 8
 
+# content types whose data is already compressed and that are therefore
+# stored as is instead of spending time in deflating them again
+compressed_types = ('image/', 'audio/', 'video/',
+                    'application/zip', 'application/gzip', 'application/x-gzip',
+                    'application/x-bzip2', 'application/x-xz', 'application/x-7z-compressed',
+                    'application/x-rar-compressed', 'application/vnd.rar', 'application/pdf',
+                    'application/vnd.openxmlformats-officedocument', 'application/vnd.oasis.opendocument',
+                    'application/epub+zip')
+
+uncompressed_types = ('image/bmp', 'image/svg+xml', 'image/tiff', 'image/x-ms-bmp', 'audio/wav', 'audio/x-wav')
+
+
+def get_compress_type(name, content_type=None):
+    """
+    Return the compression method to be used for a file of the archive
+    """
+    if not content_type:
+        content_type, _ = mimetypes.guess_type(name)
+
+    if content_type and content_type.startswith(compressed_types) and \
+       not content_type.startswith(uncompressed_types):
+        return ZIP_STORED
+
+    return ZIP_DEFLATED
+
 # Here are some struct module formats for reading headers
 structEndArchive = b"<4s4H2lH"     # 9 items, end of archive, 22 bytes
 stringEndArchive = b"PK\005\006"   # magic number for end of archive record
@@ -138,8 +165,9 @@ class ZipInfo(object):
         return header + filename + extra
 
 class ZipStream(object):
-    def __init__(self, files):
+    def __init__(self, files, compression_level=zlib.Z_DEFAULT_COMPRESSION):
         self.files = files
+        self.compression_level = compression_level
 
         self.filelist = []  # List of ZipInfo instances for archive
         self.data_ptr = 0   # Keep track of location inside archive
@@ -158,11 +186,14 @@ class ZipStream(object):
         self.data_ptr += len(data)
         return data
 
-    def zipinfo_open(self, arcname):
-        zinfo = ZipInfo(arcname, self.time, ZIP_DEFLATED)
+    def zipinfo_open(self, arcname, compression=ZIP_DEFLATED):
+        zinfo = ZipInfo(arcname, self.time, compression)
         zinfo.header_offset = self.data_ptr
 
-        cmpr = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        if compression == ZIP_DEFLATED:
+            cmpr = zlib.compressobj(self.compression_level, zlib.DEFLATED, -15)
+        else:
+            cmpr = None
 
         header = zinfo.FileHeader()
 
@@ -176,7 +207,9 @@ class ZipStream(object):
         zinfo.file_size += len(chunk)
         zinfo.CRC = binascii.crc32(chunk, zinfo.CRC) & 0xffffffff
 
-        chunk = cmpr.compress(chunk)
+        if cmpr is not None:
+            chunk = cmpr.compress(chunk)
+
         zinfo.compress_size += len(chunk)
 
         self.update_data_ptr(chunk)
@@ -184,7 +217,7 @@ class ZipStream(object):
         return chunk
 
     def zipinfo_close(self, zinfo, cmpr):
-        buf = cmpr.flush()
+        buf = cmpr.flush() if cmpr is not None else b''
         zinfo.compress_size += len(buf)
         self.update_data_ptr(buf)
 
@@ -193,8 +226,8 @@ class ZipStream(object):
 
         return buf + trailer
 
-    def zip_fo(self, fo, arcname):
-        zipinfo, cmpr, header = self.zipinfo_open(arcname)
+    def zip_fo(self, fo, arcname, compression=ZIP_DEFLATED):
+        zipinfo, cmpr, header = self.zipinfo_open(arcname, compression)
 
         yield header
 
@@ -208,8 +241,8 @@ class ZipStream(object):
 
         yield self.zipinfo_close(zipinfo, cmpr)
 
-    def zip_file(self, filepath, arcname):
-        return self.zip_fo(open(filepath, "rb"), arcname)
+    def zip_file(self, filepath, arcname, compression=ZIP_DEFLATED):
+        return self.zip_fo(open(filepath, "rb"), arcname, compression)
 
     def archive_footer(self):
         """
@@ -301,12 +334,14 @@ class ZipStream(object):
 
     def __iter__(self):
         for f in self.files:
+            compression = get_compress_type(f['name'], f.get('type'))
+
             if 'fo' in f:
-                for data in self.zip_fo(f['fo'], f['name']):
+                for data in self.zip_fo(f['fo'], f['name'], compression):
                     yield data
 
             elif 'path' in f:
-                for data in self.zip_file(f['path'], f['name']):
+                for data in self.zip_file(f['path'], f['name'], compression):
                     yield data
 
         yield self.archive_footer()
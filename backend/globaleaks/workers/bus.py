@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+#
+# Messages exchanged by the processes serving the API in order to keep
+# consistent their copies of the state of the application
+from globaleaks.db import cache_receipt_hash_algs, load_memory_variables
+from globaleaks.rest.apicache import ApiCache
+from globaleaks.state import State
+
+
+def handle_message(message):
+    """
+    Apply to the state of the process a change broadcast by another process
+    """
+    if message['type'] == 'refresh_memory_variables':
+        return load_memory_variables(message['tids'])
+
+    elif message['type'] == 'invalidate_cache':
+        ApiCache.invalidate(message['tid'], message['tags'])
+
+    elif message['type'] == 'receipt_hash_algs':
+        cache_receipt_hash_algs(message['tid'], message['added'], message['removed'])
+
+    elif message['type'] == 'accept_submissions':
+        State.accept_submissions = message['value']
+
+    elif message['type'] == 'tor_exit_set':
+        State.tor_exit_set.clear()
+        for ip in message['ips']:
+            State.tor_exit_set.add(ip)
+
+    elif message['type'] == 'refresh_tenant_state':
+        # the tenant state is refreshed only by the main process
+        if State.process_supervisor is not None:
+            State.refresh_tenant_state()
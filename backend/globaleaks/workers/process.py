@@ -7,14 +7,34 @@ import traceback
 
 from twisted.internet import defer, reactor
 from twisted.internet.protocol import ProcessProtocol
+from twisted.internet.stdio import StandardIO
+from twisted.protocols.basic import LineOnlyReceiver
 
 from globaleaks.utils.process import set_proc_title, set_pdeathsig
 from globaleaks.utils.log import log
 
 
+class MessageProtocol(LineOnlyReceiver):
+    """
+    Protocol exchanging JSON messages, one per line
+    """
+    delimiter = b'\n'
+    MAX_LENGTH = 1024 * 1024
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def lineReceived(self, line):
+        self.handler(json.loads(line))
+
+    def send(self, message):
+        self.sendLine(json.dumps(message).encode())
+
+
 class Process(object):
     cfg = {}
     name = ''
+    channel = None
 
     def __init__(self, fd=42):
         self.pid = os.getpid()
@@ -47,6 +67,19 @@ class Process(object):
     def start(self):
         reactor.run()
 
+    def open_channel(self, fd_in=43, fd_out=44):
+        """
+        Open the channel used to exchange messages with the supervisor
+        """
+        self.channel = MessageProtocol(self.handle_message)
+        StandardIO(self.channel, stdin=fd_in, stdout=fd_out)
+
+    def send(self, message):
+        self.channel.send(message)
+
+    def handle_message(self, message):
+        pass
+
     def sigusr1(self):
         pass
 
@@ -89,9 +122,45 @@ class CfgFDProcProtocol(ProcessProtocol):
         return "<%s: %s:%s>" % (self.__class__.__name__, id(self), self.transport)
 
 
-class HTTPSProcProtocol(CfgFDProcProtocol):
-    def __init__(self, supervisor, cfg, cfg_fd=42):
+class MessageProcProtocol(CfgFDProcProtocol):
+    """
+    Protocol of the processes exchanging messages with the supervisor
+    on a couple of pipes in addition to the configuration one
+    """
+    def __init__(self, supervisor, cfg, cfg_fd=42, msg_fds=(43, 44)):
         CfgFDProcProtocol.__init__(self, supervisor, cfg, cfg_fd)
 
+        self.msg_in_fd, self.msg_out_fd = msg_fds
+        self.fd_map[self.msg_in_fd] = 'w'
+        self.fd_map[self.msg_out_fd] = 'r'
+
+        self.msg_buffer = b''
+
+    def send(self, message):
+        self.transport.writeToChild(self.msg_in_fd, json.dumps(message).encode() + b'\n')
+
+    def childDataReceived(self, childFD, data):
+        if childFD != self.msg_out_fd:
+            return CfgFDProcProtocol.childDataReceived(self, childFD, data)
+
+        lines = (self.msg_buffer + data).split(b'\n')
+        self.msg_buffer = lines.pop()
+
+        for line in lines:
+            if line:
+                self.supervisor.handle_worker_message(self, json.loads(line))
+
+
+class HTTPSProcProtocol(MessageProcProtocol):
+    def __init__(self, supervisor, cfg, cfg_fd=42):
+        MessageProcProtocol.__init__(self, supervisor, cfg, cfg_fd)
+
         for tls_socket_fd in cfg['tls_socket_fds']:
             self.fd_map[tls_socket_fd] = tls_socket_fd
+
+
+class APIProcProtocol(MessageProcProtocol):
+    def __init__(self, supervisor, cfg, cfg_fd=42):
+        MessageProcProtocol.__init__(self, supervisor, cfg, cfg_fd)
+
+        self.fd_map[cfg['api_socket_fd']] = cfg['api_socket_fd']
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import base64
 import logging
 import multiprocessing
 import os
@@ -7,12 +8,32 @@ from sys import executable
 
 from globaleaks.handlers.admin.https import load_tls_dict_list
 from globaleaks.models.config import ConfigFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
+from globaleaks.settings import Settings
+from globaleaks.state import State
 from globaleaks.utils import tls
+from globaleaks.utils.sni import get_sni_site_cfgs
 from globaleaks.utils.utility import datetime_now, datetime_to_ISO8601
 from globaleaks.utils.log import log
-from globaleaks.workers.process import HTTPSProcProtocol
+from globaleaks.workers.bus import handle_message
+from globaleaks.workers.process import APIProcProtocol, HTTPSProcProtocol
 from twisted.internet import defer, reactor
+from twisted.internet.defer import inlineCallbacks
+
+
+# Paths of the API served only by the main process that keeps the state
+# of the submission tokens, of the file uploads and of the scheduled jobs
+MAIN_PROCESS_PATHS = [
+    '/token',
+    '/submission',
+    '/signup',
+    '/admin/config',
+    '/admin/activities',
+    '/admin/anomalies',
+    '/admin/jobs',
+    '/admin/metrics',
+    '/.well-known/acme-challenge'
+]
 
 
 class ProcessSupervisor(object):
@@ -23,20 +44,27 @@ class ProcessSupervisor(object):
         log.info("Starting process monitor")
 
         self.shutting_down = False
+        self.api_shutting_down = False
 
         self.start_time = datetime_now()
         self.tls_process_pool = []
+        self.api_process_pool = []
         self.cpu_count = multiprocessing.cpu_count()
 
         self.worker_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'worker_https.py')
+        self.api_worker_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'worker_api.py')
 
         self.tls_cfg = {
           'proxy_ip': proxy_ip,
           'proxy_port': proxy_port,
+          'api_proxy_port': None,
+          'main_paths': MAIN_PROCESS_PATHS,
           'debug': log.loglevel <= logging.DEBUG,
           'site_cfgs': [],
         }
 
+        self.api_cfg = None
+
         if not net_sockets:
             log.err("No ports to bind to! Spawning processes will not work!")
 
@@ -51,6 +79,23 @@ class ProcessSupervisor(object):
             log.info("Not launching workers")
             return defer.succeed(None)
 
+        valid_cfgs, err = self.db_load_site_cfgs(session)
+
+        self.tls_cfg['site_cfgs'] = valid_cfgs
+
+        if not valid_cfgs:
+            log.info("Not launching https workers due to %s", err)
+            return defer.fail(err)
+
+        log.info("Decided to launch https workers")
+
+        return self.launch_https_workers()
+
+    @transact
+    def maybe_launch_https_workers(self, session):
+        self.db_maybe_launch_https_workers(session)
+
+    def db_load_site_cfgs(self, session):
         site_cfgs = load_tls_dict_list(session)
 
         valid_cfgs, err = [], None
@@ -61,19 +106,59 @@ class ProcessSupervisor(object):
             if ok and err is None:
                 valid_cfgs.append(db_cfg)
 
-        self.tls_cfg['site_cfgs'] = valid_cfgs
+        return valid_cfgs, err
+
+    @transact_ro
+    def load_site_cfgs(self, session):
+        if not ConfigFactory(session, 1, 'node').get_val(u'https_enabled'):
+            return [], None
+
+        return self.db_load_site_cfgs(session)
+
+    @inlineCallbacks
+    def refresh_https_workers(self):
+        """
+        Push to the running HTTPS workers the changes of the TLS configurations
+
+        Only the entries of the SNI map that changed are sent to the workers
+        so that the pool is not restarted and the established connections
+        are not dropped; the workers are launched or stopped only when HTTPS
+        gets enabled or disabled.
+        """
+        valid_cfgs, err = yield self.load_site_cfgs()
 
         if not valid_cfgs:
-            log.info("Not launching https workers due to %s", err)
-            return defer.fail(err)
+            if self.is_running():
+                log.info("Stopping https workers due to %s", err)
+                self.shutdown()
 
-        log.info("Decided to launch https workers")
+            self.tls_cfg['site_cfgs'] = []
+            return
 
-        return self.launch_https_workers()
+        old_cfgs = get_sni_site_cfgs(self.tls_cfg['site_cfgs'])
+        new_cfgs = get_sni_site_cfgs(valid_cfgs)
 
-    @transact
-    def maybe_launch_https_workers(self, session):
-        self.db_maybe_launch_https_workers(session)
+        self.tls_cfg['site_cfgs'] = valid_cfgs
+
+        if not self.is_running():
+            log.info("Decided to launch https workers")
+            self.shutting_down = False
+            yield self.launch_https_workers()
+            return
+
+        for name, site_cfg in new_cfgs.items():
+            if old_cfgs.get(name) != site_cfg:
+                self.send_https_workers({'type': 'set_site_cfg', 'name': name, 'site_cfg': site_cfg})
+
+        for name in set(old_cfgs) - set(new_cfgs):
+            self.send_https_workers({'type': 'remove_site_cfg', 'name': name})
+
+    def send_https_workers(self, message):
+        """
+        Send a message to the HTTPS workers
+        """
+        for pp in self.tls_process_pool:
+            pp.send(message)
 
     def launch_worker(self):
         pp = HTTPSProcProtocol(self, self.tls_cfg)
@@ -87,6 +172,51 @@ class ProcessSupervisor(object):
     def launch_https_workers(self):
         return defer.DeferredList([self.launch_worker() for _ in range(self.cpu_count)])
 
+    def launch_api_worker(self):
+        pp = APIProcProtocol(self, self.api_cfg)
+        reactor.spawnProcess(pp, executable, [executable, self.api_worker_path], childFDs=pp.fd_map, env=os.environ)
+        self.api_process_pool.append(pp)
+
+        # the state not stored in the database is synchronized at startup
+        pp.send({'type': 'accept_submissions', 'value': State.accept_submissions})
+        pp.send({'type': 'tor_exit_set', 'ips': list(State.tor_exit_set)})
+
+        log.info('Launched: %s', pp)
+
+        return pp.startup_promise
+
+    def launch_api_workers(self, api_socket, api_port, sessions_key):
+        """
+        Launch the API workers accepting the connections on the shared
+        api_socket and make the HTTPS workers forward them the requests
+        not bound to the state of the main process
+        """
+        self.api_cfg = {
+          'api_socket_fd': api_socket.fileno(),
+          'working_path': Settings.working_path,
+          'client_path': Settings.client_path,
+          'devel_mode': Settings.devel_mode,
+          'sessions_key': base64.b64encode(sessions_key).decode(),
+          'debug': log.loglevel <= logging.DEBUG
+        }
+
+        self.tls_cfg['api_proxy_port'] = api_port
+
+        return defer.DeferredList([self.launch_api_worker() for _ in range(Settings.api_workers)])
+
+    def publish(self, message, source=None):
+        """
+        Broadcast a message to the API workers
+        """
+        for pp in self.api_process_pool:
+            if pp is not source:
+                pp.send(message)
+
+    def handle_worker_message(self, pp, message):
+        handle_message(message)
+
+        self.publish(message, pp)
+
     def should_spawn_child(self):
         return not self.shutting_down and len(self.tls_process_pool) < self.cpu_count
 
@@ -96,6 +226,14 @@ class ProcessSupervisor(object):
     def handle_worker_death(self, pp, reason):
         log.debug("Subprocess: %s exited with: %s", pp, reason)
 
+        if pp in self.api_process_pool:
+            self.api_process_pool.remove(pp)
+
+            if not self.api_shutting_down:
+                self.launch_api_worker()
+
+            return
+
         if pp in self.tls_process_pool: self.tls_process_pool.remove(pp)
 
         if self.should_spawn_child():
@@ -137,3 +275,15 @@ class ProcessSupervisor(object):
                 pp.transport.signalProcess(signal.SIGUSR1)
             except OSError as e:
                 log.debug('Tried to signal: %d got: %s', pp.transport.pid, e)
+
+    def shutdown_api_workers(self):
+        log.debug('Starting API workers shutdown')
+
+        self.api_shutting_down = True
+
+        while self.api_process_pool:
+            try:
+                pp = self.api_process_pool.pop(0)
+                pp.transport.signalProcess(signal.SIGUSR1)
+            except OSError as e:
+                log.debug('Tried to signal: %d got: %s', pp.transport.pid, e)
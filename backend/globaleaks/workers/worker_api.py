@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import base64
+import os
+import sys
+
+if os.path.dirname(__file__) != '/usr/lib/python2.7/dist-packages/globaleaks/workers':
+    sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from twisted.internet import reactor
+
+# this import seems unused but it is required in order to load the mocks
+import globaleaks.mocks.twisted_mocks # pylint: disable=W0611
+
+from globaleaks.db import sync_refresh_memory_variables
+from globaleaks.handlers.staticfile import get_manifest
+from globaleaks.jobs.session_management import SessionManagement
+from globaleaks.jobs.statistics import Statistics
+from globaleaks.rest.api import APIResourceWrapper
+from globaleaks.rest.site import Site
+from globaleaks.sessions import Sessions, SQLiteSessionStore
+from globaleaks.settings import Settings
+from globaleaks.state import State
+from globaleaks.utils.pgp import PGPKeyring
+from globaleaks.utils.sock import listen_tcp_on_sock
+from globaleaks.utils.token import TokenList
+from globaleaks.workers.bus import handle_message
+from globaleaks.workers.process import Process
+
+
+class APIProcess(Process):
+    """
+    Process serving the API on the socket shared with the other API workers
+
+    The changes to the state of the application done by a worker are
+    broadcast to the other processes through the supervisor.
+    """
+    name = 'gl-api-worker'
+
+    def __init__(self, *args, **kwargs):
+        super(APIProcess, self).__init__(*args, **kwargs)
+
+        os.umask(0o77)
+
+        if self.cfg['devel_mode']:
+            Settings.set_devel_mode()
+
+        Settings.working_path = self.cfg['working_path']
+        Settings.client_path = self.cfg['client_path']
+        Settings.eval_paths()
+
+        State.tokens = TokenList(Settings.tmp_path)
+        State.pgp_keyring = PGPKeyring(Settings.tmp_path)
+
+        sync_refresh_memory_variables()
+
+        get_manifest(Settings.client_path)
+
+        State.orm_tp.start()
+        State.orm_writer_tp.start()
+        State.export_tp.start()
+        State.upload_tp.start()
+        State.kdf_tp.start()
+
+        Sessions.set_store(SQLiteSessionStore(Settings.sessions_db_path,
+                                              base64.b64decode(self.cfg['sessions_key'])))
+
+        # the login counters and the hourly events and statistics are kept
+        # by every process and have to be reset by each of them
+        self.jobs = [SessionManagement(), Statistics()]
+
+        self.open_channel()
+        State.bus = self
+
+        self.api_factory = Site(APIResourceWrapper())
+        if not Settings.devel_mode:
+            self.api_factory.displayTracebacks = False
+
+        self.port = listen_tcp_on_sock(reactor, self.cfg['api_socket_fd'], self.api_factory)
+
+        self.log("API worker listening on {}".format(self.port._realPortNumber))
+
+    def publish(self, message):
+        self.send(message)
+
+    def handle_message(self, message):
+        handle_message(message)
+
+    def sigusr1(self):
+        reactor.callFromThread(reactor.stop)
+
+    def shutdown(self):
+        if self.port is not None:
+            self.port.stopListening()
+            self.port = None
+
+        for job in self.jobs:
+            job.stop()
+
+        State.orm_tp.stop()
+        State.orm_writer_tp.stop()
+        State.export_tp.stop()
+        State.upload_tp.stop()
+        State.kdf_tp.stop()
+
+        Process.shutdown(self)
+
+
+if __name__ == '__main__':
+    APIProcess().start()
@@ -11,7 +11,7 @@ from twisted.internet.task import LoopingCall
 
 from globaleaks.workers.process import Process
 from globaleaks.utils.sock import listen_tls_on_sock
-from globaleaks.utils.sni import SNIMap
+from globaleaks.utils.sni import SNIMap, get_sni_site_cfgs
 from globaleaks.utils.tls import TLSServerContextFactory, ChainValidator
 from globaleaks.utils.httpsproxy import HTTPStreamFactory
 from globaleaks.utils.utility import datetime_now
@@ -33,7 +33,11 @@ class HTTPSProcess(Process):
 
         proxy_url = 'http://' + self.cfg['proxy_ip'] + ':' + str(self.cfg['proxy_port'])
 
-        self.http_proxy_factory = HTTPStreamFactory(proxy_url)
+        api_proxy_url = None
+        if self.cfg.get('api_proxy_port'):
+            api_proxy_url = 'http://' + self.cfg['proxy_ip'] + ':' + str(self.cfg['api_proxy_port'])
+
+        self.http_proxy_factory = HTTPStreamFactory(proxy_url, api_proxy_url, self.cfg.get('main_paths', []))
 
         for site_cfg in self.cfg['site_cfgs']:
             cv = ChainValidator()
@@ -41,11 +45,9 @@ class HTTPSProcess(Process):
             if not ok or not err is None:
                 raise err
 
-        default_site = self.cfg['site_cfgs'].pop(0)
-        sni_dict = {'DEFAULT': make_TLSContextFactory(default_site)}
-
-        for site_cfg in self.cfg['site_cfgs']:
-            sni_dict[site_cfg['hostname']] = make_TLSContextFactory(site_cfg)
+        sni_dict = {}
+        for name, site_cfg in get_sni_site_cfgs(self.cfg['site_cfgs']).items():
+            sni_dict[name] = make_TLSContextFactory(site_cfg)
 
         self.snimap = SNIMap(sni_dict)
 
@@ -61,6 +63,33 @@ class HTTPSProcess(Process):
             self.log("HTTPS proxy listening on {} for hostnames: {}".format(
                      port._realPortNumber, ', '.join(sni_dict.keys())))
 
+    def start(self):
+        # the channel delivering the updates of the SNI map
+        self.open_channel()
+
+        Process.start(self)
+
+    def handle_message(self, message):
+        """
+        Apply to the SNI map an update of the TLS configuration of a site
+
+        The new handshakes use the new context while the connections
+        already established are left to drain.
+        """
+        if message['type'] == 'set_site_cfg':
+            cv = ChainValidator()
+            ok, err = cv.validate(message['site_cfg'], must_be_disabled=False, check_expiration=False)
+            if not ok or not err is None:
+                self.log("Ignoring the invalid TLS configuration of {}: {}".format(message['name'], err))
+                return
+
+            self.snimap.set_context(message['name'], make_TLSContextFactory(message['site_cfg']))
+            self.log("Updated the TLS configuration of {}".format(message['name']))
+
+        elif message['type'] == 'remove_site_cfg':
+            self.snimap.remove_context(message['name'])
+            self.log("Removed the TLS configuration of {}".format(message['name']))
+
     def sigusr1(self):
         self.shutdown()
         reactor.stop()
@@ -951,6 +951,14 @@ factory('AdminUtils', ['AdminContextResource', 'AdminQuestionnaireResource', 'Ad
         return 'data:image/png;base64,' + data;
       },
 
+      imgUri: function(url) {
+        if (url === '') {
+          return this.imgDataUri('');
+        }
+
+        return url;
+      },
+
       attachCustomJS: function() {
         return angular.isDefined($rootScope.node) && angular.isDefined($rootScope.node.script);
       },